@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python
+
+"""
+响应体存储
+
+监听到的响应体在后台线程中通过 Network.getResponseBody 获取，
+小的响应体保存在内存中，大的响应体（或内存占用超出上限后）按内容的 sha256 保存到磁盘，
+相同内容只保存一份。读取时按字节偏移分页返回。
+requestId 只在同一个标签页内唯一，响应体按 (标签页id, requestId) 保存。
+条目数或磁盘占用超出上限时淘汰最久没有读写的条目，磁盘文件在没有条目引用后删除。
+"""
+
+import base64
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+TEXT_MIME_KEYWORDS = ("text/", "json", "javascript", "xml", "x-www-form-urlencoded")
+
+
+def _utf8_boundary(data: bytes, pos: int) -> int:
+    """把位置向前调整到UTF-8字符边界，避免分页时截断多字节字符"""
+    while 0 < pos < len(data) and (data[pos] & 0xC0) == 0x80:
+        pos -= 1
+    return pos
+
+
+class ResponseBodyStore():
+    """按 (标签页id, requestId) 保存响应体，小的放内存，大的按内容哈希存到磁盘"""
+
+    def __init__(self, directory: str = "", memory_threshold: int = 256 * 1024,
+                 max_memory_bytes: int = 64 * 1024 * 1024, max_disk_bytes: int = 1024 * 1024 * 1024,
+                 max_entries: int = 100000, max_workers: int = 4):
+        # 默认目录按进程区分，删除文件时不影响其他进程
+        self.directory = Path(directory) if directory else \
+            Path(tempfile.gettempdir()) / "DrissionPageMCP" / "bodies" / str(os.getpid())
+        self.memory_threshold = memory_threshold
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.max_entries = max_entries
+        self.memory_bytes = 0
+        self.disk_bytes = 0
+        self.evicted = 0
+        # (标签页id, requestId) -> 条目，按最近读写的顺序排列
+        self._index = OrderedDict()
+        # 磁盘文件 -> [引用数, 大小]，引用数包括正在写入的
+        self._files = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="DrissionPageMCP-body")
+        self.errors = 0
+
+    def fetch_later(self, tab, request_id: str, meta: dict):
+        """在后台线程中获取并保存响应体，不阻塞CDP事件回调，返回后台任务的 Future"""
+        return self._executor.submit(self._fetch, tab, request_id, meta)
+
+    def _fetch(self, tab, request_id: str, meta: dict) -> None:
+        try:
+            r = tab.run_cdp("Network.getResponseBody", requestId=request_id)
+        except Exception:
+            # 响应体可能已被浏览器从缓冲区中清除，或者是重定向等没有响应体的请求
+            self.errors += 1
+            return
+        self.put(tab.tab_id, request_id, r["body"], r.get("base64Encoded", False), meta)
+
+    def put(self, tab_id: str, request_id: str, body: str, base64_encoded: bool, meta: dict) -> dict:
+        """保存响应体，返回索引信息"""
+        data = base64.b64decode(body) if base64_encoded else body.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        entry = {"tab_id": tab_id, "request_id": request_id, "url": meta.get("url", ""),
+                 "mimeType": meta.get("mimeType", ""), "size": len(data), "sha256": digest}
+
+        path = self.directory / digest[:2] / digest
+        with self._lock:
+            in_memory = (len(data) <= self.memory_threshold
+                         and self.memory_bytes + len(data) <= self.max_memory_bytes)
+            if in_memory:
+                self.memory_bytes += len(data)
+            else:
+                # 先占一个引用，写入期间文件不会被其他线程删除
+                self._ref(path, len(data))
+        if in_memory:
+            entry["data"] = data
+        else:
+            try:
+                if not path.exists():
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    tmp = path.with_name(f"{digest}.{threading.get_ident()}.tmp")
+                    tmp.write_bytes(data)
+                    tmp.replace(path)
+            except Exception:
+                with self._lock:
+                    self._unref(path)
+                raise
+            entry["path"] = str(path)
+
+        key = (tab_id, request_id)
+        with self._lock:
+            old = self._index.pop(key, None)
+            if old is not None:
+                self._release(old)
+            self._index[key] = entry
+            self._evict()
+        return self._describe(entry)
+
+    def _ref(self, path: Path, size: int) -> None:
+        ref = self._files.get(path)
+        if ref is None:
+            ref = self._files[path] = [0, size]
+            self.disk_bytes += size
+        ref[0] += 1
+
+    def _unref(self, path: Path) -> None:
+        ref = self._files[path]
+        ref[0] -= 1
+        if ref[0] == 0:
+            del self._files[path]
+            self.disk_bytes -= ref[1]
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+    def _release(self, entry: dict) -> None:
+        """条目被删除后释放它占用的内存或磁盘文件，调用时持有锁"""
+        if "data" in entry:
+            self.memory_bytes -= entry["size"]
+        else:
+            self._unref(Path(entry["path"]))
+
+    def _evict(self) -> None:
+        """条目数或磁盘占用超出上限时，从最久没有读写的条目开始删除，调用时持有锁"""
+        while self._index and (len(self._index) > self.max_entries
+                               or (self.max_disk_bytes and self.disk_bytes > self.max_disk_bytes)):
+            if len(self._index) > self.max_entries:
+                key = next(iter(self._index))
+            else:
+                key = next((k for k, e in self._index.items() if "path" in e), None)
+                if key is None:
+                    break
+            self._release(self._index.pop(key))
+            self.evicted += 1
+
+    def _find(self, request_id: str, tab_id: str) -> tuple:
+        """不指定标签页时取最近保存的同名 requestId"""
+        if tab_id:
+            return (tab_id, request_id) if (tab_id, request_id) in self._index else None
+        return next((key for key in reversed(self._index) if key[1] == request_id), None)
+
+    def get(self, request_id: str, offset: int = 0, length: int = 65536, tab_id: str = "") -> dict:
+        """
+        分页读取响应体，tab_id 为空时读取最近保存的同名 requestId 的响应体。
+
+        返回:
+            dict: 文本类型的响应体 encoding 为 utf-8，其他为 base64；
+                  next_offset 为下一页的偏移，读完时为 None
+        """
+        with self._lock:
+            key = self._find(request_id, tab_id)
+            if key is None:
+                return None
+            self._index.move_to_end(key)
+            entry = self._index[key]
+
+        is_text = any(k in entry["mimeType"] for k in TEXT_MIME_KEYWORDS)
+        if "data" in entry:
+            data, base = entry["data"], 0
+        else:
+            try:
+                with open(entry["path"], "rb") as f:
+                    f.seek(offset)
+                    # 文本分页要向前调整到字符边界，多读几个字节
+                    data, base = f.read(length + 4), offset
+            except FileNotFoundError:
+                # 读取前刚好被淘汰
+                return None
+
+        end = min(offset + length, entry["size"])
+        if is_text and end < entry["size"]:
+            adjusted = base + _utf8_boundary(data, end - base)
+            if adjusted > offset:
+                end = adjusted
+        chunk = data[offset - base:end - base]
+        return {
+            **self._describe(entry),
+            "offset": offset,
+            "encoding": "utf-8" if is_text else "base64",
+            "data": chunk.decode("utf-8", errors="replace") if is_text else base64.b64encode(chunk).decode(),
+            "next_offset": end if end < entry["size"] else None,
+        }
+
+    def list(self) -> list:
+        """返回所有已保存响应体的索引信息"""
+        with self._lock:
+            return [self._describe(e) for e in self._index.values()]
+
+    def stats(self) -> dict:
+        """返回已保存的数量、内存和磁盘占用、淘汰的数量和获取失败的次数"""
+        with self._lock:
+            on_disk = sum(1 for e in self._index.values() if "path" in e)
+            return {"count": len(self._index), "memory_bytes": self.memory_bytes, "on_disk": on_disk,
+                    "disk_bytes": self.disk_bytes, "disk_files": len(self._files), "evicted": self.evicted,
+                    "errors": self.errors, "directory": str(self.directory)}
+
+    def discard(self, keys) -> int:
+        """删除指定 (标签页id, requestId) 的响应体，不再被引用的磁盘文件随之删除，返回删除的数量"""
+        removed = 0
+        with self._lock:
+            for key in keys:
+                entry = self._index.pop(tuple(key), None)
+                if entry is None:
+                    continue
+                removed += 1
+                self._release(entry)
+        return removed
+
+    def clear(self) -> None:
+        """清空所有响应体，删除不再被引用的磁盘文件"""
+        with self._lock:
+            for entry in self._index.values():
+                self._release(entry)
+            self._index.clear()
+
+    @staticmethod
+    def _describe(entry: dict) -> dict:
+        return {k: v for k, v in entry.items() if k != "data"}
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python
+
+"""
+浏览器池
+
+在一段连续的调试端口上启动或接管多个 Chromium 实例，缓存连接对象，
+做健康检查，并把新的工作分配给当前负载最小的健康实例，
+让吞吐量不再受单个浏览器渲染进程的限制。
+"""
+
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+from DrissionPage import Chromium, ChromiumOptions
+
+
+class BrowserPool():
+    """按调试端口缓存 Chromium 连接，并按负载分配浏览器"""
+
+    def __init__(self):
+        self._browsers = {}
+        self._load = {}
+        self._lock = threading.Lock()
+
+    def start(self, start_port: int = 9222, count: int = 2, browser_path: str = "", headless: bool = False) -> list:
+        """
+        在 start_port 开始的 count 个端口上启动或接管浏览器。
+
+        返回:
+            list: 每个浏览器的状态
+        """
+        for port in range(start_port, start_port + count):
+            self.connect(port, browser_path=browser_path, headless=headless)
+        return self.status()
+
+    def connect(self, port: int, browser_path: str = "", headless: bool = False) -> Chromium:
+        """
+        获取端口对应的浏览器连接，已缓存且健康时直接复用，否则启动或接管该端口的浏览器。
+
+        每个端口使用独立的用户文件夹，否则新启动的浏览器会并入已打开的实例。
+        """
+        with self._lock:
+            browser = self._browsers.get(port)
+        if browser is not None and self.healthy(port):
+            return browser
+
+        co = ChromiumOptions()
+        co.set_local_port(port)
+        co.set_user_data_path(Path(tempfile.gettempdir()) / "DrissionPageMCP" / f"userData_{port}")
+        if browser_path:
+            co.set_browser_path(browser_path)
+        if headless:
+            co.headless(True)
+        browser = Chromium(co)
+        with self._lock:
+            self._browsers[port] = browser
+            self._load.setdefault(port, 0)
+        return browser
+
+    def add(self, port: int, browser: Chromium) -> None:
+        """把已连接的浏览器加入浏览器池"""
+        with self._lock:
+            self._browsers[port] = browser
+            self._load.setdefault(port, 0)
+
+    def get(self, port: int) -> Chromium:
+        """获取端口对应的浏览器连接（只接管，不设置用户文件夹），连接对象会被缓存复用"""
+        with self._lock:
+            browser = self._browsers.get(port)
+        if browser is None:
+            browser = Chromium(port)
+            with self._lock:
+                self._browsers[port] = browser
+                self._load.setdefault(port, 0)
+        return browser
+
+    def healthy(self, port: int) -> bool:
+        """检查端口对应的浏览器是否还能响应 CDP 命令"""
+        with self._lock:
+            browser = self._browsers.get(port)
+        if browser is None:
+            return False
+        try:
+            browser._run_cdp("Browser.getVersion", _timeout=3)
+            return True
+        except Exception:
+            return False
+
+    @contextmanager
+    def lease(self):
+        """
+        借出当前负载最小的健康浏览器，用完自动归还。
+
+        用法:
+            with pool.lease() as browser:
+                tab = browser.new_tab(url)
+        """
+        with self._lock:
+            ports = sorted(self._browsers, key=lambda p: self._load.get(p, 0))
+        browser = None
+        for port in ports:
+            if not self.healthy(port):
+                with self._lock:
+                    self._browsers.pop(port, None)
+                    self._load.pop(port, None)
+                continue
+            # 健康检查期间浏览器可能已被其他线程移出浏览器池，借出前在锁内再确认一次
+            with self._lock:
+                browser = self._browsers.get(port)
+                if browser is not None:
+                    self._load[port] = self._load.get(port, 0) + 1
+                    break
+        if browser is None:
+            raise RuntimeError("浏览器池中没有可用的浏览器，请先调用 start_browser_pool")
+        try:
+            yield browser
+        finally:
+            with self._lock:
+                # 借出期间浏览器可能因健康检查失败被移出浏览器池
+                if self._load.get(port):
+                    self._load[port] -= 1
+
+    def status(self) -> list:
+        """返回每个浏览器的端口、地址、健康状态和正在执行的任务数"""
+        with self._lock:
+            items = list(self._browsers.items())
+        return [{"port": port, "address": browser.address, "healthy": self.healthy(port), "active": self._load.get(port, 0)}
+                for port, browser in items]
+
+    def __len__(self) -> int:
+        return len(self._browsers)
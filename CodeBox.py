@@ -1,71 +1,495 @@
-domTreeToJson = '''
+# 简化DOM树节点句柄所在的属性名
+HANDLE_ATTR = 'data-dp-id'
+
+# 简化DOM树遍历器：单次迭代遍历，只读不写布局，整棵树只触发一次样式/布局计算
+# 参数通过 arguments[0] 传入：
+#   max_nodes       最多输出的节点数
+#   max_chars       输出JSON的近似字符数上限
+#   time_budget_ms  遍历耗时上限（毫秒）
+#   text_length     叶子节点内容预览的字符数
+#   max_depth       相对根节点的最大深度
+#   root_selector   用CSS选择器指定根节点，默认 document.body
+#   root_xpath      用xpath指定根节点
+#   only_in_viewport 只输出与视口相交的元素
+#   with_handles    节点键名使用稳定句柄（tag@句柄），句柄写入元素的 data-dp-id 属性，
+#                   可直接用于 click_by_handle 等工具；为false时使用按标签计数的键名（div12）
+# 超出任一预算时提前结束，返回的树仍然合法，并在顶层附带 _truncated 说明
+domTreeWalker = f'''
+const HANDLE_ATTR = '{HANDLE_ATTR}';
+''' + r'''
+const INVISIBLE_TAGS = new Set(['script', 'style', 'meta', 'link', 'template', 'noscript']);
 
 function isVisuallyHidden(node) {
-  if (!(node instanceof Element)) return true;
+  if (INVISIBLE_TAGS.has(node.nodeName.toLowerCase())) return true;
 
-  const invisibleTags = ['script', 'style', 'meta', 'link', 'template', 'noscript'];
-  const tagName = node.nodeName.toLowerCase();
+  if (node.checkVisibility) {
+    if (!node.checkVisibility({ opacityProperty: true, visibilityProperty: true })) return true;
+  } else {
+    const style = getComputedStyle(node);
+    if (style.display === 'none' || style.visibility === 'hidden' || style.opacity === '0') return true;
+  }
+
+  return node.offsetWidth === 0 && node.offsetHeight === 0;
+}
 
-  if (invisibleTags.includes(tagName)) return true;
+// 只读取足够判断预览长度的文本，避免 textContent 对整棵子树做拼接
+function leafText(node, limit) {
+  const walker = document.createTreeWalker(node, NodeFilter.SHOW_TEXT);
+  let text = '';
+  while (walker.nextNode()) {
+    text = (text + walker.currentNode.nodeValue.slice(0, 256)).replace(/\s+/g, ' ').trimStart();
+    if (text.trimEnd().length > limit) break;
+  }
+  return text.trimEnd();
+}
+
+function nodeName(node) {
+  let name = node.nodeName.toLowerCase();
+  if (node.id) name += `#${node.id}`;
+  if (typeof node.className === 'string') {
+    const classList = node.className.trim().split(/\s+/).join('.');
+    if (classList) name += `.${classList}`;
+  }
+  return name;
+}
 
-  const style = getComputedStyle(node);
-  const hiddenByStyle = (
-    style.display === 'none' ||
-    style.visibility === 'hidden' ||
-    style.opacity === '0'
-  );
+function nodeLabel(node, textLength) {
+  const text = leafText(node, textLength);
+  const content = text ? ` content='${text.slice(0, textLength)}${text.length > textLength ? "…" : ""}'` : '';
+  return `${nodeName(node)}/` + content;
+}
 
-  const hasNoSize = node.offsetWidth === 0 && node.offsetHeight === 0;
+function inViewport(node) {
+  const rect = node.getBoundingClientRect();
+  return rect.bottom > 0 && rect.right > 0 && rect.top < innerHeight && rect.left < innerWidth;
+}
 
-  return hiddenByStyle || hasNoSize;
+function resolveRoot(options) {
+  if (options.root_xpath) {
+    return document.evaluate(options.root_xpath, document, null,
+      XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+  }
+  if (options.root_selector) return document.querySelector(options.root_selector);
+  return document.body;
 }
 
-function domTreeToJson(node = document.body, tagCounters = {}) {
-  const getNodeLabel = (node) => {
-    let name = node.nodeName.toLowerCase();
-    if (node.id) name += `#${node.id}`;
-    if (node.className && typeof node.className === 'string') {
-      const classList = node.className.trim().split(/\s+/).join('.');
-      if (classList) name += `.${classList}`;
+function buildDomJsonTree(root = document.body, options = {}) {
+  if (!root) return { _error: 'root_not_found' };
+  const maxDepth = options.max_depth || Infinity;
+  const viewportOnly = !!options.only_in_viewport;
+  const maxNodes = options.max_nodes || Infinity;
+  const maxChars = options.max_chars || Infinity;
+  const deadline = performance.now() + (options.time_budget_ms || Infinity);
+  const textLength = options.text_length || 5;
+
+  const top = {};
+  const result = { [root.nodeName.toLowerCase()]: top };
+  if (isVisuallyHidden(root) || (viewportOnly && !inViewport(root))) return result;
+
+  const withHandles = options.with_handles !== false;
+  const newHandles = [];
+  const seenHandles = new Set();
+  const tagCounters = {};
+  const containers = new Map();  // 元素 -> 它的子节点对象
+  const depths = new Map([[root, 0]]);
+  const hasChildren = new Set();
+  const entries = [];
+  let chars = 0;
+  let truncated = null;
+
+  const walker = document.createTreeWalker(root, NodeFilter.SHOW_ELEMENT, {
+    // 超出深度、不可见或不在视口内的节点整棵子树跳过，不再访问其后代
+    acceptNode: (node) => {
+      const depth = depths.get(node.parentElement) + 1;
+      if (depth > maxDepth || isVisuallyHidden(node) || (viewportOnly && !inViewport(node))) {
+        return NodeFilter.FILTER_REJECT;
+      }
+      depths.set(node, depth);
+      return NodeFilter.FILTER_ACCEPT;
+    },
+  });
+
+  for (let node = root; node; node = walker.nextNode()) {
+    const parent = node === root ? top : containers.get(node.parentElement);
+    const tagName = node.nodeName.toLowerCase();
+    let nodeKey;
+    if (withHandles) {
+      // cloneNode 复制出来的元素会带着相同的句柄，重新分配
+      let handle = node.getAttribute(HANDLE_ATTR);
+      if (!handle || seenHandles.has(handle)) {
+        handle = String(window.__dpHandleSeq = (window.__dpHandleSeq || 0) + 1);
+        newHandles.push([node, handle]);
+      }
+      seenHandles.add(handle);
+      nodeKey = `${tagName}@${handle}`;
+    } else {
+      const count = tagCounters[tagName] || 0;
+      tagCounters[tagName] = count + 1;
+      nodeKey = `${tagName}${count}`;
     }
-    const text = node.textContent?.trim().replace(/\s+/g, ' ') || '';
-    const content = text ? ` content='${text.slice(0, 5)}${text.length > 5 ? "…" : ""}'` : '';
-    return `${name}/` + content;
+
+    const children = {};
+    parent[nodeKey] = children;
+    containers.set(node, children);
+    hasChildren.add(node.parentElement);
+    entries.push([parent, nodeKey, node]);
+
+    // 按键名+节点描述+内容预览估算输出大小
+    chars += nodeKey.length + nodeName(node).length + textLength + 16;
+    if (entries.length >= maxNodes) truncated = 'max_nodes';
+    else if (chars >= maxChars) truncated = 'max_chars';
+    else if ((entries.length & 255) === 0 && performance.now() > deadline) truncated = 'time_budget_ms';
+    if (truncated) break;
+  }
+
+  // 没有可见子节点的元素输出为描述字符串
+  for (const [parent, nodeKey, node] of entries) {
+    if (!hasChildren.has(node)) parent[nodeKey] = nodeLabel(node, textLength);
+  }
+
+  // 遍历结束后再写属性，避免在读取布局的过程中使样式失效
+  for (const [node, handle] of newHandles) node.setAttribute(HANDLE_ATTR, handle);
+
+  if (truncated) result._truncated = { reason: truncated, nodes: entries.length };
+  return result;
+}
+'''
+
+domTreeToJson = domTreeWalker + r'''
+const options = arguments[0] || {};
+return JSON.stringify(buildDomJsonTree(resolveRoot(options), options));
+'''
+
+
+# 增量快照：页面内用 MutationObserver 记录 DOM 是否变化，
+# 没有变化时不再重新遍历整棵树，文档导航后 doc_id 改变，Python 端据此做全量重建
+domSnapshot = domTreeWalker + r'''
+const options = arguments[0] || {};
+let state = window.__dpSnapshot;
+if (!state) {
+  state = window.__dpSnapshot = {
+    docId: Date.now().toString(36) + Math.random().toString(36).slice(2, 8),
+    dirty: true,
   };
+  // 写入句柄属性不算页面变化
+  state.observer = new MutationObserver((records) => {
+    if (records.some((r) => r.attributeName !== HANDLE_ATTR)) state.dirty = true;
+  });
+  state.observer.observe(document.documentElement, {
+    childList: true, subtree: true, attributes: true, characterData: true,
+  });
+}
 
-  if (isVisuallyHidden(node)) {
-    return {}; // 过滤不可见节点
+// 视口过滤的结果随滚动变化，而滚动不会触发 MutationObserver
+const view = options.only_in_viewport ? `${scrollX},${scrollY},${innerWidth},${innerHeight}` : '';
+if (view !== state.view) state.dirty = true;
+state.view = view;
+
+const full = options.doc_id !== state.docId;
+if (!full && !state.dirty) {
+  return JSON.stringify({ doc_id: state.docId, full: false, changed: false });
+}
+// 先清标记再遍历，遍历期间发生的变化留给下一次快照
+state.dirty = false;
+const tree = buildDomJsonTree(resolveRoot(options), options);
+return JSON.stringify({ doc_id: state.docId, full, changed: true, tree });
+'''
+
+
+# 页面内等待条件成立：用 MutationObserver 和定时器检查条件，条件成立时立即返回，
+# 一次调用最多等待 slice_ms，页面导航会中断脚本，由 Python 端循环调用。
+# 参数通过 arguments[0] 传入：
+#   condition   dom_ready / load / element_present / element_visible / element_stable / js
+#   xpath       元素的xpath
+#   selector    元素的CSS选择器
+#   stable_ms   element_stable 要求元素位置和大小保持不变的时间（毫秒）
+#   poll_ms     没有DOM变化时的检查间隔（毫秒）
+#   slice_ms    本次调用最多等待的时间（毫秒）
+# js 条件的表达式由 Python 端替换 __PREDICATE__ 后随脚本一起发送，不受页面CSP限制
+pageWait = r'''async function() {
+const options = arguments[0] || {};
+const deadline = performance.now() + options.slice_ms;
+
+function findElement() {
+  if (options.xpath) {
+    return document.evaluate(options.xpath, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
   }
+  return options.selector ? document.querySelector(options.selector) : null;
+}
 
-  const tagName = node.nodeName.toLowerCase();
-  tagCounters[tagName] = (tagCounters[tagName] || 0);
-  const nodeKey = `${tagName}${tagCounters[tagName]++}`;
+function isVisible(el) {
+  if (el.checkVisibility && !el.checkVisibility({ opacityProperty: true, visibilityProperty: true })) return false;
+  const rect = el.getBoundingClientRect();
+  return rect.width > 0 && rect.height > 0;
+}
 
-  const children = Array.from(node.children)
-    .map(child => domTreeToJson(child, tagCounters))
-    .filter(childJson => Object.keys(childJson).length > 0); // 去掉空节点
+let lastRect = '';
+let stableSince = 0;
+function check() {
+  switch (options.condition) {
+    case 'dom_ready': return document.readyState !== 'loading';
+    case 'load': return document.readyState === 'complete';
+    case 'element_present': return !!findElement();
+    case 'element_visible': {
+      const el = findElement();
+      return !!el && isVisible(el);
+    }
+    case 'element_stable': {
+      const el = findElement();
+      if (!el || !isVisible(el)) {
+        lastRect = '';
+        return false;
+      }
+      const r = el.getBoundingClientRect();
+      const key = `${r.x},${r.y},${r.width},${r.height}`;
+      const now = performance.now();
+      if (key !== lastRect) {
+        lastRect = key;
+        stableSince = now;
+      }
+      return now - stableSince >= options.stable_ms;
+    }
+    case 'js': return !!(__PREDICATE__);
+  }
+  return false;
+}
 
-  if (children.length === 0) {
-    return { [nodeKey]: getNodeLabel(node) };
-  } else {
-    const childJson = {};
-    children.forEach(child => Object.assign(childJson, child));
-    return { [nodeKey]: childJson };
+return new Promise((resolve) => {
+  let done = false;
+  let scheduled = false;
+  const finish = (ok) => {
+    if (done) return;
+    done = true;
+    observer.disconnect();
+    clearInterval(timer);
+    document.removeEventListener('readystatechange', tick);
+    resolve(JSON.stringify({ ok }));
+  };
+  function tick() {
+    scheduled = false;
+    let ok = false;
+    try {
+      ok = check();
+    } catch (e) {}
+    if (ok) finish(true);
+    else if (performance.now() >= deadline) finish(false);
   }
+  // 一批DOM变化只检查一次
+  const observer = new MutationObserver(() => {
+    if (!scheduled) {
+      scheduled = true;
+      setTimeout(tick, 0);
+    }
+  });
+  observer.observe(document, { childList: true, subtree: true, attributes: true, characterData: true });
+  document.addEventListener('readystatechange', tick);
+  const timer = setInterval(tick, options.poll_ms);
+  tick();
+});
+}'''
+
+
+# 页面可见文本：用浏览器的 innerText 取文本，已排除 display:none 的元素和 script/style，
+# 块级元素之间保留换行；再去掉每行首尾空白和空行。
+# 参数通过 arguments[0] 传入：root_selector / root_xpath 指定根节点，max_chars 最多返回的字符数
+visibleText = domTreeWalker + r'''
+const options = arguments[0] || {};
+const root = resolveRoot(options);
+if (!root) return JSON.stringify(null);
+const lines = (root.innerText || root.textContent || '').split('\n')
+  .map((line) => line.replace(/[ \t\u00a0\u3000]+/g, ' ').trim())
+  .filter(Boolean);
+const text = lines.join('\n');
+const truncated = !!options.max_chars && text.length > options.max_chars;
+return JSON.stringify({ text: truncated ? text.slice(0, options.max_chars) : text, length: text.length, truncated });
+'''
+
+
+# 页面版本：页面内用 MutationObserver 累加变化次数，不读取文本也不触发布局，
+# 返回 "文档id:变化次数"，两次结果相同说明期间 DOM 没有变化（写入句柄属性不算变化），文档导航后文档id改变
+pageVersion = f"const HANDLE_ATTR = '{HANDLE_ATTR}';" + r'''
+let state = window.__dpVersion;
+if (!state) {
+  state = window.__dpVersion = {
+    docId: Date.now().toString(36) + Math.random().toString(36).slice(2, 8),
+    count: 0,
+  };
+  state.observer = new MutationObserver((records) => {
+    if (records.some((r) => r.attributeName !== HANDLE_ATTR)) state.count += 1;
+  });
+  state.observer.observe(document.documentElement, {
+    childList: true, subtree: true, attributes: true, characterData: true,
+  });
 }
+return `${state.docId}:${state.count}`;
+'''
 
-function buildDomJsonTree(root = document.body) {
-  const topTag = root.nodeName.toLowerCase();
-  const result = {};
-  result[topTag] = domTreeToJson(root);
-  return result;
+
+# 按文本条件查找元素：一次 run_js 在页面内检查所有元素，只返回匹配的元素的句柄和文本，
+# 代替 tab.eles('t:*') 后逐个读取 element.text（每个元素一次 CDP 往返）。
+# 参数通过 arguments[0] 传入：
+#   rules          条件列表，满足任意一条即匹配；每条条件的键都可省略，同一条中的键之间是"并且"：
+#                    starts_with   文本以其中任意一个开头（字符串或列表）
+#                    contains_any  文本包含其中任意一个
+#                    contains_all  文本包含其中所有
+#                    regex / flags 文本匹配正则表达式
+#   tags           只检查这些标签，默认所有元素
+#   visible_only   只返回可见元素，默认 true
+#   innermost      只返回最内层的匹配元素（祖先元素的文本也包含子元素的文本），默认 true
+#   max_results    最多返回的元素数
+#   max_text       返回文本的最大字符数
+#   root_selector / root_xpath  在指定元素内查找
+findByText = domTreeWalker + r'''
+const options = arguments[0] || {};
+const root = resolveRoot(options);
+if (!root) return JSON.stringify({ _error: 'root_not_found' });
+const asList = (v) => (v === undefined || v === null || v === '' ? [] : Array.isArray(v) ? v : [v]);
+const squeeze = (s) => String(s).replace(/\s+/g, '');
+const rules = asList(options.rules).map((r) => ({
+  startsWith: asList(r.starts_with),
+  containsAny: asList(r.contains_any),
+  containsAll: asList(r.contains_all),
+  regex: r.regex ? new RegExp(r.regex, r.flags || '') : null,
+  // 粗筛用的字面文本，去掉空白后比较
+  anyLiterals: asList(r.starts_with).concat(asList(r.contains_any)).map(squeeze),
+  allLiterals: asList(r.contains_all).map(squeeze),
+}));
+const tags = new Set(asList(options.tags).map((t) => t.toLowerCase()));
+const visibleOnly = options.visible_only !== false;
+const maxText = options.max_text || 200;
+
+function matches(text) {
+  return rules.some((r) =>
+    (!r.startsWith.length || r.startsWith.some((s) => text.startsWith(s))) &&
+    (!r.containsAny.length || r.containsAny.some((s) => text.includes(s))) &&
+    r.containsAll.every((s) => text.includes(s)) &&
+    (!r.regex || r.regex.test(text)));
+}
+
+// textContent 包含隐藏的文本，块级元素之间也没有空白，只能按去掉空白后是否包含字面文本粗筛：
+// starts_with 可能被隐藏的前缀挡住，regex 无法粗筛，这两种条件都交给 innerText 判断
+function mayMatch(raw) {
+  return rules.some((r) =>
+    (!r.anyLiterals.length || r.anyLiterals.some((s) => raw.includes(s))) &&
+    r.allLiterals.every((s) => raw.includes(s)));
 }
 
-// 用法示例
-const domJson = buildDomJsonTree();
+// 先用不触发布局的 textContent 粗筛，只对候选元素读取 innerText 并检查可见性
+let scanned = 0;
+let found = [];
+const walker = document.createTreeWalker(root, NodeFilter.SHOW_ELEMENT);
+for (let node = root; node; node = walker.nextNode()) {
+  const tag = node.nodeName.toLowerCase();
+  if (INVISIBLE_TAGS.has(tag)) continue;
+  scanned++;
+  if (tags.size && !tags.has(tag)) continue;
+  const raw = squeeze(node.textContent);
+  if (!raw || !mayMatch(raw)) continue;
+  if (visibleOnly && isVisuallyHidden(node)) continue;
+  const text = (node.innerText || node.textContent).replace(/\s+/g, ' ').trim();
+  if (matches(text)) found.push({ node, text });
+}
+
+if (options.innermost !== false) {
+  // 先序遍历中子树是连续的：祖先如果包含其他匹配元素，下一个匹配元素一定在它里面
+  found = found.filter((m, i) => i + 1 === found.length || !m.node.contains(found[i + 1].node));
+}
+const truncated = !!options.max_results && found.length > options.max_results;
+if (truncated) found = found.slice(0, options.max_results);
+
+const result = found.map(({ node, text }) => {
+  let handle = node.getAttribute(HANDLE_ATTR);
+  if (!handle) {
+    handle = String(window.__dpHandleSeq = (window.__dpHandleSeq || 0) + 1);
+    node.setAttribute(HANDLE_ATTR, handle);
+  }
+  return { handle: `${node.nodeName.toLowerCase()}@${handle}`, text: text.slice(0, maxText) };
+});
+return JSON.stringify({ matches: result, scanned, truncated });
+'''
+
+
+# 正文提取（参考 Readability 的打分方法）：按段落文本长度、逗号数给段落的父元素和祖父元素打分，
+# 按 class/id 关键字加减分、按链接文本占比降分，取得分最高的容器；
+# 再遍历容器，跳过导航、页眉页脚、表单和链接占比高的块，块级元素之间换行；
+# article/main 内的 header 是文章标题区，不算页眉，保留。
+# 参数通过 arguments[0] 传入：max_chars 最多返回的字符数
+readableText = domTreeWalker + r'''
+const options = arguments[0] || {};
+const POSITIVE = /article|body|content|entry|main|page|post|text|blog|story|正文|detail/i;
+const NEGATIVE = /comment|footer|footnote|header|menu|meta|nav|related|share|shoutbox|sidebar|social|sponsor|ad-|ads|banner|breadcrumb|pagination|popup|recommend/i;
+const SKIP_TAGS = new Set(['nav', 'aside', 'footer', 'form', 'button', 'select', 'input', 'textarea',
+  'iframe', 'svg', 'canvas', 'video', 'audio', 'dialog']);
+const BLOCK_TAGS = new Set(['address', 'article', 'blockquote', 'br', 'dd', 'div', 'dl', 'dt', 'figcaption', 'figure',
+  'header', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr', 'li', 'main', 'ol', 'p', 'pre', 'section', 'table', 'tr', 'ul', 'td', 'th']);
+const PARAGRAPH_TAGS = new Set(['p', 'pre', 'td', 'blockquote', 'li', 'h2', 'h3']);
+
+const squash = (s) => s.replace(/\s+/g, ' ').trim();
+function hintScore(node) {
+  const hint = `${node.id} ${typeof node.className === 'string' ? node.className : ''} ${node.getAttribute('role') || ''}`;
+  return (POSITIVE.test(hint) ? 25 : 0) - (NEGATIVE.test(hint) ? 25 : 0);
+}
+function linkDensity(node, textLength) {
+  let linkLength = 0;
+  for (const a of node.querySelectorAll('a')) linkLength += squash(a.textContent).length;
+  return textLength ? linkLength / textLength : 0;
+}
 
-// console.log(domJson)
-//console.log(JSON.stringify(domJson, null, 2));
-return JSON.stringify(domJson, null, 2)
+// 给段落的父元素和祖父元素打分
+const scores = new Map();
+for (const p of document.body.querySelectorAll('p, pre, td, blockquote, li, h2, h3')) {
+  const text = squash(p.textContent);
+  if (text.length < 25) continue;
+  const score = 1 + text.split(/[,，、。]/).length + Math.min(3, Math.floor(text.length / 100));
+  let ancestor = p.parentElement;
+  for (let level = 0; ancestor && ancestor !== document.documentElement && level < 2; level++) {
+    if (!scores.has(ancestor)) scores.set(ancestor, hintScore(ancestor));
+    scores.set(ancestor, scores.get(ancestor) + (level === 0 ? score : score / 2));
+    ancestor = ancestor.parentElement;
+  }
+}
+let top = null;
+let topScore = -Infinity;
+for (const [node, score] of scores) {
+  const adjusted = score * (1 - linkDensity(node, squash(node.textContent).length));
+  if (adjusted > topScore) {
+    top = node;
+    topScore = adjusted;
+  }
+}
+top = document.querySelector('article, main, [role=main]') && (!top || topScore < 20)
+  ? document.querySelector('article, main, [role=main]') : top || document.body;
 
-'''
\ No newline at end of file
+// 遍历正文容器，跳过样板内容
+const parts = [];
+function walk(node) {
+  for (const child of node.childNodes) {
+    if (child.nodeType === Node.TEXT_NODE) {
+      parts.push(child.nodeValue);
+      continue;
+    }
+    if (child.nodeType !== Node.ELEMENT_NODE) continue;
+    const tag = child.nodeName.toLowerCase();
+    if (SKIP_TAGS.has(tag) || INVISIBLE_TAGS.has(tag) || isVisuallyHidden(child)) continue;
+    const articleHeader = tag === 'header' && child.parentElement.closest('article, main, [role=main]');
+    if (tag === 'header' && !articleHeader) continue;
+    if (hintScore(child) < 0 && !PARAGRAPH_TAGS.has(tag) && !articleHeader) continue;
+    const block = BLOCK_TAGS.has(tag);
+    if (block && ['div', 'section', 'ul', 'ol', 'table'].includes(tag)) {
+      const length = squash(child.textContent).length;
+      if (length > 0 && length < 500 && linkDensity(child, length) > 0.5) continue;
+    }
+    if (block) parts.push('\n');
+    if (/^h[1-6]$/.test(tag)) parts.push('#'.repeat(Number(tag[1])) + ' ');
+    walk(child);
+    if (block) parts.push('\n');
+  }
+}
+walk(top);
+const text = parts.join('').split('\n').map((line) => line.replace(/[ \t\u00a0\u3000]+/g, ' ').trim())
+  .filter(Boolean).join('\n');
+const truncated = !!options.max_chars && text.length > options.max_chars;
+return JSON.stringify({
+  title: document.title, text: truncated ? text.slice(0, options.max_chars) : text, length: text.length, truncated,
+});
+'''
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python
+
+"""
+简化DOM树的增量快照
+
+按 tab_id 保存每个标签页上一次的简化DOM树，
+再次获取时只返回与上一次相比的结构差异。
+"""
+
+import json
+
+
+def diff_dom_tree(old, new, path: str = "") -> dict:
+    """
+    比较两棵简化DOM树，返回结构差异。
+
+    参数:
+        old (dict or str): 上一次的树（叶子节点是描述字符串）
+        new (dict or str): 本次的树
+        path (str): 当前节点路径，用 / 连接节点键名
+
+    返回:
+        dict: {"added": {路径: 子树}, "removed": [路径], "changed": {路径: 新值}}
+    """
+    diff = {"added": {}, "removed": [], "changed": {}}
+    if not isinstance(old, dict) or not isinstance(new, dict):
+        if old != new:
+            diff["changed"][path] = new
+        return diff
+
+    for key, value in new.items():
+        sub_path = f"{path}/{key}" if path else key
+        if key not in old:
+            diff["added"][sub_path] = value
+            continue
+        sub = diff_dom_tree(old[key], value, sub_path)
+        diff["added"].update(sub["added"])
+        diff["removed"].extend(sub["removed"])
+        diff["changed"].update(sub["changed"])
+
+    for key in old:
+        if key not in new:
+            diff["removed"].append(f"{path}/{key}" if path else key)
+    return diff
+
+
+class DomSnapshotStore():
+    """按 tab_id 保存简化DOM树快照"""
+
+    def __init__(self):
+        self._snapshots = {}
+
+    def doc_id(self, tab_id: str, scope: str = "") -> str:
+        """
+        返回标签页上一次快照对应的文档id。
+
+        没有快照，或上一次快照的过滤条件(scope)与本次不同时返回空字符串，
+        此时页面内脚本会重新全量遍历。
+        """
+        snapshot = self._snapshots.get(tab_id)
+        if not snapshot or snapshot["scope"] != scope:
+            return ""
+        return snapshot["doc_id"]
+
+    def update(self, tab_id: str, result, scope: str = "") -> dict:
+        """
+        用页面内 domSnapshot 脚本的返回结果更新快照，并生成差异。
+
+        参数:
+            tab_id (str): 标签页id
+            result (dict or str): domSnapshot 脚本的返回结果
+            scope (str): 本次快照的过滤条件（根节点、深度、视口等），不同条件的快照之间不做差异比较
+
+        返回:
+            dict: mode 为 full（文档已导航或首次快照，附带完整的树）、
+                  unchanged（页面没有变化）或 diff（附带 added/removed/changed）
+        """
+        if isinstance(result, str):
+            result = json.loads(result)
+
+        if not result["changed"]:
+            return {"mode": "unchanged", "doc_id": result["doc_id"]}
+
+        tree = result["tree"]
+        old = self._snapshots.get(tab_id)
+        self._snapshots[tab_id] = {"doc_id": result["doc_id"], "scope": scope, "tree": tree}
+        if result["full"] or old is None or old["scope"] != scope:
+            return {"mode": "full", "doc_id": result["doc_id"], "tree": tree}
+
+        diff = diff_dom_tree(old["tree"], tree)
+        return {"mode": "diff", "doc_id": result["doc_id"], **diff}
+
+    def forget(self, tab_id: str) -> None:
+        """删除标签页的快照，下一次获取时会全量同步"""
+        self._snapshots.pop(tab_id, None)
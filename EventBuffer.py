@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python
+
+"""
+监听事件的环形缓冲区
+
+每个监听器使用一个有容量上限的缓冲区保存事件，超出容量时丢弃最旧的事件并计数；
+每个事件带有递增的序号，客户端用 since 游标只读取新事件。
+"""
+
+import threading
+from collections import deque
+from itertools import islice
+
+# 最多记录多少次清空的序号范围
+MAX_CLEARED_RANGES = 100
+
+
+class EventRingBuffer():
+    """有容量上限、按序号增量读取的事件缓冲区"""
+
+    def __init__(self, capacity: int = 1000):
+        self._events = deque(maxlen=max(1, capacity))
+        self._lock = threading.Lock()
+        self._seq = 0
+        self.evicted = 0
+        # 主动清空的事件的序号范围 (first, last)，这些事件不算丢失
+        self._cleared = deque(maxlen=MAX_CLEARED_RANGES)
+
+    @property
+    def capacity(self) -> int:
+        return self._events.maxlen
+
+    def append(self, event: dict) -> int:
+        """追加一个事件，返回它的序号"""
+        with self._lock:
+            self._seq += 1
+            if len(self._events) == self._events.maxlen:
+                self.evicted += 1
+            self._events.append({"seq": self._seq, **event})
+            return self._seq
+
+    def read(self, since: int = 0, limit: int = 100) -> dict:
+        """
+        读取序号大于 since 的事件。
+
+        参数:
+            since (int): 上一次读取返回的 next_since，0 表示从最早的事件开始
+            limit (int): 最多返回的事件数，0 表示不限制
+
+        返回:
+            dict: events 事件列表；next_since 下一次读取使用的游标；
+                  missed 自上次读取以来因超出容量被丢弃、没有读到的事件数，不包括被 clear 清空的事件；
+                  cursor_reset 游标超过了已产生的事件（来自重建之前的缓冲区），已从最早的事件重新读取
+        """
+        with self._lock:
+            cursor_reset = since > self._seq
+            if cursor_reset:
+                since = 0
+            first_seq = self._seq - len(self._events) + 1
+            start = max(0, since - first_seq + 1)
+            stop = start + limit if limit else None
+            events = list(islice(self._events, start, stop))
+            missed = max(0, first_seq - since - 1)
+            for first, last in self._cleared:
+                missed -= max(0, min(last, first_seq - 1) - max(first, since + 1) + 1)
+            return {
+                "events": events,
+                "next_since": events[-1]["seq"] if events else max(since, first_seq - 1),
+                "missed": missed,
+                "remaining": max(0, len(self._events) - start - len(events)),
+                "cursor_reset": cursor_reset,
+            }
+
+    def resize(self, capacity: int) -> None:
+        """修改容量，缩小时丢弃最旧的事件"""
+        with self._lock:
+            dropped = max(0, len(self._events) - capacity)
+            self.evicted += dropped
+            self._events = deque(self._events, maxlen=max(1, capacity))
+
+    def clear(self) -> None:
+        """清空事件，序号继续递增，已有的游标仍然有效；清空的事件不计入读取时的 missed"""
+        with self._lock:
+            if self._events:
+                self._cleared.append((self._events[0]["seq"], self._seq))
+            self._events.clear()
+
+    def stats(self) -> dict:
+        """返回容量、当前事件数、累计事件数和被丢弃的事件数"""
+        with self._lock:
+            return {"capacity": self._events.maxlen, "size": len(self._events),
+                    "total": self._seq, "evicted": self.evicted}
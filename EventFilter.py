@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python
+
+"""
+监听事件的过滤表达式
+
+过滤条件用字典描述，在创建监听器时编译一次，在CDP事件回调中、写入缓冲区之前求值，
+不匹配的事件直接丢弃，不占用内存。
+
+支持的键（都可省略，多个键之间是"并且"的关系，同一个键的多个值之间是"或者"的关系）：
+    url_regex         URL正则表达式（search），字符串或列表
+    url_glob          URL通配符，如 "*://api.example.com/*"，字符串或列表
+    url_include       URL包含的关键字，字符串或列表
+    exclude_url_regex 排除URL匹配的正则表达式，字符串或列表
+    status            状态码：200、"200-299"、"2xx"，或它们的列表
+    resource_types    资源类型，如 ["XHR", "Fetch", "Document"]
+    mime              mimeType包含的关键字，字符串或列表
+    headers           响应头条件 {"content-type": "json"}，头名不区分大小写，值为正则表达式；
+                      值为空字符串时只要求存在该响应头
+    min_size/max_size 响应大小（字节）范围，在 Network.loadingFinished 时按实际传输大小判断
+"""
+
+import fnmatch
+import re
+
+
+def _as_list(value) -> list:
+    if value is None or value == "":
+        return []
+    return list(value) if isinstance(value, (list, tuple, set)) else [value]
+
+
+def _compile_any(patterns: list):
+    return re.compile("|".join(f"(?:{p})" for p in patterns)) if patterns else None
+
+
+def _parse_status(value) -> list:
+    """把状态码条件解析为 (最小值, 最大值) 区间列表"""
+    ranges = []
+    for item in _as_list(value):
+        if isinstance(item, int):
+            ranges.append((item, item))
+            continue
+        item = str(item).strip().lower()
+        if item.endswith("xx") and len(item) == 3 and item[0].isdigit():
+            base = int(item[0]) * 100
+            ranges.append((base, base + 99))
+        elif "-" in item:
+            low, high = item.split("-", 1)
+            ranges.append((int(low), int(high)))
+        else:
+            ranges.append((int(item), int(item)))
+    return ranges
+
+
+def event_fields(event: dict) -> dict:
+    """从 Network.responseReceived / requestWillBeSent 等事件中取出用于过滤的字段"""
+    response = event.get("response") or {}
+    request = event.get("request") or {}
+    return {
+        "url": response.get("url") or request.get("url") or event.get("url", ""),
+        "status": response.get("status"),
+        "type": event.get("type", ""),
+        "mimeType": response.get("mimeType", ""),
+        "headers": response.get("headers") or request.get("headers") or {},
+    }
+
+
+class EventFilter():
+    """编译后的事件过滤条件"""
+
+    def __init__(self, spec: dict = None):
+        spec = dict(spec or {})
+        self.spec = spec
+        globs = [fnmatch.translate(g) for g in _as_list(spec.get("url_glob"))]
+        self._url_regex = _compile_any(_as_list(spec.get("url_regex")))
+        self._url_glob = _compile_any(globs)
+        self._url_include = [str(k) for k in _as_list(spec.get("url_include"))]
+        self._exclude = _compile_any(_as_list(spec.get("exclude_url_regex")))
+        self._status = _parse_status(spec.get("status"))
+        self._types = {str(t).lower() for t in _as_list(spec.get("resource_types"))}
+        self._mime = [str(m) for m in _as_list(spec.get("mime"))]
+        self._headers = [(name.lower(), re.compile(pattern) if pattern else None)
+                         for name, pattern in (spec.get("headers") or {}).items()]
+        self.min_size = spec.get("min_size")
+        self.max_size = spec.get("max_size")
+
+    @property
+    def needs_size(self) -> bool:
+        """是否有大小条件，需要等到 Network.loadingFinished 才能判断"""
+        return self.min_size is not None or self.max_size is not None
+
+    def match(self, event: dict) -> bool:
+        """判断事件是否满足除大小以外的所有条件"""
+        f = event_fields(event)
+        url = f["url"]
+        if self._url_regex and not self._url_regex.search(url):
+            return False
+        if self._url_glob and not self._url_glob.match(url):
+            return False
+        if self._url_include and not any(k in url for k in self._url_include):
+            return False
+        if self._exclude and self._exclude.search(url):
+            return False
+        if self._status:
+            status = f["status"]
+            if status is None or not any(low <= status <= high for low, high in self._status):
+                return False
+        if self._types and str(f["type"]).lower() not in self._types:
+            return False
+        if self._mime and not any(m in f["mimeType"] for m in self._mime):
+            return False
+        if self._headers:
+            headers = {str(k).lower(): str(v) for k, v in f["headers"].items()}
+            for name, pattern in self._headers:
+                if name not in headers or (pattern and not pattern.search(headers[name])):
+                    return False
+        return True
+
+    def match_size(self, size: float) -> bool:
+        """判断响应大小是否在范围内"""
+        if self.min_size is not None and size < self.min_size:
+            return False
+        if self.max_size is not None and size > self.max_size:
+            return False
+        return True
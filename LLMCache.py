@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python
+
+"""
+大模型回答缓存
+
+以 (服务商, 模型, 消息, 采样参数) 的哈希为键，把回答保存在 SQLite 中，重复的输入（重新运行、重试、
+相同的页面）直接返回缓存的回答，不再请求接口。条目超过有效期后失效，总大小超过上限时淘汰最久没有使用的条目。
+"""
+
+import hashlib
+import json
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+DEFAULT_PATH = Path(tempfile.gettempdir()) / "DrissionPageMCP" / "llm_cache.sqlite3"
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+# 只影响传输方式、不影响回答内容的参数，不参与缓存键
+_TRANSPORT_PARAMS = {"stream", "timeout", "max_retries", "extra_headers", "cache"}
+
+
+def cache_key(provider: str, model: str, messages: list, params: dict = None) -> str:
+    """相同的服务商、模型、消息和采样参数得到相同的键，与字典键的顺序无关"""
+    params = {k: v for k, v in (params or {}).items() if k not in _TRANSPORT_PARAMS}
+    payload = json.dumps([provider, model, messages, params], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CompletionCache():
+    """SQLite 中的回答缓存，可以在多个线程中使用"""
+
+    def __init__(self, path: str = "", ttl: float = DEFAULT_TTL, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = Path(path) if path else DEFAULT_PATH
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evicted = 0
+        self.expired = 0
+        self._lock = threading.Lock()
+        if str(self.path) != ":memory:":
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS completions (
+            key TEXT PRIMARY KEY, provider TEXT, model TEXT, result TEXT NOT NULL, bytes INTEGER NOT NULL,
+            created_at REAL NOT NULL, accessed_at REAL NOT NULL, hits INTEGER NOT NULL DEFAULT 0)""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS completions_accessed ON completions (accessed_at)")
+
+    def get(self, key: str) -> dict:
+        """返回缓存的回答，不存在或已过期时返回 None"""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT result, created_at FROM completions WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.ttl and now - row[1] > self.ttl:
+                self._db.execute("DELETE FROM completions WHERE key = ?", (key,))
+                self.expired += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE completions SET accessed_at = ?, hits = hits + 1 WHERE key = ?", (now, key))
+            self.hits += 1
+        return {**json.loads(row[0]), "cached": True, "cache_age_s": round(now - row[1], 1)}
+
+    def put(self, key: str, result: dict) -> None:
+        """保存回答，总大小超过上限时淘汰最久没有使用的条目"""
+        data = json.dumps(result, ensure_ascii=False, default=str)
+        size = len(data.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO completions (key, provider, model, result, bytes, created_at,"
+                             " accessed_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                             (key, result.get("provider"), result.get("model"), data, size, now, now))
+            self.stores += 1
+            if self.ttl:
+                self.expired += self._db.execute("DELETE FROM completions WHERE created_at < ?",
+                                                 (now - self.ttl,)).rowcount
+            total = self._db.execute("SELECT COALESCE(SUM(bytes), 0) FROM completions").fetchone()[0]
+            if total > self.max_bytes:
+                # 从最久没有使用的条目开始累加，删除超出部分
+                rows = self._db.execute("SELECT key, bytes FROM completions ORDER BY accessed_at").fetchall()
+                keys = []
+                for old_key, old_size in rows:
+                    if total <= self.max_bytes or old_key == key:
+                        break
+                    keys.append((old_key,))
+                    total -= old_size
+                self._db.executemany("DELETE FROM completions WHERE key = ?", keys)
+                self.evicted += len(keys)
+
+    def clear(self) -> int:
+        """删除所有条目，返回删除的条目数"""
+        with self._lock:
+            return self._db.execute("DELETE FROM completions").rowcount
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM completions").fetchone()
+        lookups = self.hits + self.misses
+        return {"path": str(self.path), "entries": entries, "bytes": size, "max_bytes": self.max_bytes,
+                "ttl": self.ttl, "hits": self.hits, "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "stores": self.stores, "evicted": self.evicted, "expired": self.expired}
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
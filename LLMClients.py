@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python
+
+"""
+大模型客户端
+
+每个服务商只创建一次客户端并复用，底层的 HTTP 连接池保持长连接，
+后续请求不再重复 TLS 握手和客户端初始化。所有服务商通过同一个 complete() 调用，
+异步代码使用 acomplete()，不阻塞事件循环。
+API 密钥只从环境变量读取（见 PROVIDERS 中的 api_key_env），没有设置时创建客户端会报错。
+"""
+
+import asyncio
+import os
+import threading
+import time
+import weakref
+
+PROVIDERS = {
+    "deepseek": {
+        "kind": "openai",
+        "base_url": "https://api.deepseek.com",
+        "api_key_env": "DEEPSEEK_API_KEY",
+        "model": "deepseek-chat",
+    },
+    # 火山引擎火山方舟
+    "ark": {
+        "kind": "openai",
+        "base_url": "https://ark.cn-beijing.volces.com/api/v3",
+        "api_key_env": "ARK_API_KEY",
+        "model": "deepseek-v3-1-terminus",
+    },
+    # 智谱AI BigModel
+    "bigmodel": {
+        "kind": "zhipu",
+        "api_key_env": "ZHIPUAI_API_KEY",
+        "model": "glm-4.6",
+    },
+    # 魔搭 ModelScope
+    "modelscope": {
+        "kind": "openai",
+        "base_url": "https://api-inference.modelscope.cn/v1",
+        "api_key_env": "MODELSCOPE_API_KEY",
+        "model": "Qwen/Qwen3-Coder-30B-A3B-Instruct",
+    },
+}
+
+# 每个服务商的连接池大小，空闲连接保持的时间（秒）
+MAX_CONNECTIONS = 20
+KEEPALIVE_EXPIRY = 120
+REQUEST_TIMEOUT = 120
+
+_clients = {}
+# 异步客户端的连接绑定在事件循环上，每个事件循环各有一组客户端
+_async_clients = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def _api_key(provider: str) -> str:
+    env = PROVIDERS[provider]["api_key_env"]
+    api_key = os.environ.get(env)
+    if not api_key:
+        raise ValueError(f"没有设置服务商 {provider} 的 API 密钥，请设置环境变量 {env}")
+    return api_key
+
+
+def _create_client(provider: str, sdk_retries: bool = True):
+    config = PROVIDERS[provider]
+    api_key = _api_key(provider)
+    if config["kind"] == "zhipu":
+        from zai import ZhipuAiClient
+        if not sdk_retries:
+            return ZhipuAiClient(api_key=api_key, timeout=REQUEST_TIMEOUT, max_retries=0)
+        return ZhipuAiClient(api_key=api_key, timeout=REQUEST_TIMEOUT)
+
+    import httpx
+    from openai import DefaultHttpxClient, OpenAI
+    http_client = DefaultHttpxClient(limits=httpx.Limits(max_connections=MAX_CONNECTIONS,
+                                                         max_keepalive_connections=MAX_CONNECTIONS,
+                                                         keepalive_expiry=KEEPALIVE_EXPIRY))
+    if not sdk_retries:
+        return OpenAI(base_url=config["base_url"], api_key=api_key, timeout=REQUEST_TIMEOUT, max_retries=0,
+                      http_client=http_client)
+    return OpenAI(base_url=config["base_url"], api_key=api_key, timeout=REQUEST_TIMEOUT, http_client=http_client)
+
+
+def _create_async_client(provider: str):
+    """OpenAI 兼容的服务商使用异步客户端；SDK 不重试，由调用方（LLMDispatcher）决定重试策略"""
+    config = PROVIDERS[provider]
+    if config["kind"] != "openai":
+        return None
+    api_key = _api_key(provider)
+    import httpx
+    from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+    http_client = DefaultAsyncHttpxClient(limits=httpx.Limits(max_connections=MAX_CONNECTIONS,
+                                                              max_keepalive_connections=MAX_CONNECTIONS,
+                                                              keepalive_expiry=KEEPALIVE_EXPIRY))
+    return AsyncOpenAI(base_url=config["base_url"], api_key=api_key, timeout=REQUEST_TIMEOUT,
+                       max_retries=0, http_client=http_client)
+
+
+def get_client(provider: str, sdk_retries: bool = True):
+    """
+    获取服务商的客户端，第一次调用时创建，之后复用同一个客户端及其连接池。
+    sdk_retries 为False时返回 SDK 不重试的另一个客户端，由调用方（LLMDispatcher）决定重试策略
+    """
+    if provider not in PROVIDERS:
+        raise ValueError(f"不支持的服务商 {provider}，可选: {', '.join(PROVIDERS)}")
+    key = provider if sdk_retries else (provider, "no_retries")
+    client = _clients.get(key)
+    if client is None:
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _clients[key] = _create_client(provider, sdk_retries)
+    return client
+
+
+def _result(provider: str, model: str, response, start: float) -> dict:
+    message = response.choices[0].message
+    usage = getattr(response, "usage", None)
+    return {
+        "content": message.content or "",
+        "reasoning_content": getattr(message, "reasoning_content", None) or "",
+        "provider": provider,
+        "model": model,
+        "usage": usage.model_dump() if hasattr(usage, "model_dump") else usage,
+        "latency_ms": round((time.perf_counter() - start) * 1000),
+    }
+
+
+def complete(provider: str, messages: list, model: str = None, **params) -> dict:
+    """
+    调用服务商的对话补全接口。
+
+    参数:
+        provider (str): PROVIDERS 中的服务商名称
+        messages (list): 对话消息
+        model (str): 模型名称，默认为服务商配置的模型
+        **params: temperature、max_tokens 等其他参数，原样传给接口
+
+    返回:
+        dict: content 回答，reasoning_content 推理过程(推理模型才有)，provider、model、usage、latency_ms
+    """
+    return _complete(get_client(provider), provider, messages, model, **params)
+
+
+def _complete(client, provider: str, messages: list, model: str = None, **params) -> dict:
+    model = model or PROVIDERS[provider]["model"]
+    start = time.perf_counter()
+    response = client.chat.completions.create(model=model, messages=messages, **params)
+    return _result(provider, model, response, start)
+
+
+def get_async_client(provider: str):
+    """获取当前事件循环中服务商的异步客户端，没有异步客户端的服务商（智谱）返回 None"""
+    if provider not in PROVIDERS:
+        raise ValueError(f"不支持的服务商 {provider}，可选: {', '.join(PROVIDERS)}")
+    with _lock:
+        clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+        if provider not in clients:
+            clients[provider] = _create_async_client(provider)
+        return clients[provider]
+
+
+async def run_in_thread(func, *args, **kwargs):
+    """
+    在线程中调用同步函数。线程无法中途停止，被取消（包括 wait_for 超时）时先等线程里的请求结束再抛出
+    CancelledError，调用方在此期间一直占着并发名额，不会在旧请求还在进行时又发出新的请求
+    """
+    future = asyncio.ensure_future(asyncio.to_thread(func, *args, **kwargs))
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        while not future.done():
+            try:
+                await asyncio.shield(future)
+            except (asyncio.CancelledError, Exception):
+                pass
+        raise
+
+
+async def acomplete(provider: str, messages: list, model: str = None, **params) -> dict:
+    """
+    complete() 的异步版本。没有异步客户端的服务商（智谱）用 SDK 不重试的同步客户端在线程中调用，
+    params 中的 timeout 应不大于调用方的超时，使线程中的请求及时结束
+    """
+    client = get_async_client(provider)
+    if client is None:
+        return await run_in_thread(_complete, get_client(provider, sdk_retries=False), provider, messages, model,
+                                   **params)
+    model = model or PROVIDERS[provider]["model"]
+    start = time.perf_counter()
+    response = await client.chat.completions.create(model=model, messages=messages, **params)
+    return _result(provider, model, response, start)
+
+
+def close_clients() -> None:
+    """关闭所有客户端的连接池"""
+    with _lock:
+        clients = list(_clients.values())
+        _clients.clear()
+        # 异步客户端要在所属的事件循环中关闭，这里只是不再复用，事件循环结束时随之释放
+        _async_clients.clear()
+    for client in clients:
+        try:
+            client.close()
+        except Exception:
+            pass
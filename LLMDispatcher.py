@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python
+
+"""
+大模型请求调度
+
+在事件循环中并发发送大模型请求，等待回答时不阻塞其他协程。每个服务商有独立的并发上限（信号量）
+和令牌桶限速；遇到 429、5xx、连接错误和超时时按指数退避加随机抖动重试，服务商返回 Retry-After 时按它等待。
+配置了回答缓存时先查缓存，命中的请求不占用并发名额和令牌；空的回答和没有匹配到答案的回答不写入缓存。
+传入 answer_pattern 或 reasoning_pattern 时以流式方式请求，匹配到答案后提前结束（见 LLMStream）。
+"""
+
+import asyncio
+import random
+import time
+
+from LLMCache import CompletionCache, cache_key
+from LLMClients import PROVIDERS, acomplete
+from LLMStream import astream_complete
+
+# 每个服务商的默认限制：concurrency 同时进行的请求数，rate 每秒允许发起的请求数，burst 令牌桶容量
+DEFAULT_LIMITS = {"concurrency": 4, "rate": 2.0, "burst": 4}
+PROVIDER_LIMITS = {
+    "deepseek": {"concurrency": 8, "rate": 5.0, "burst": 8},
+    "ark": {"concurrency": 8, "rate": 5.0, "burst": 8},
+    "bigmodel": {"concurrency": 4, "rate": 2.0, "burst": 4},
+    "modelscope": {"concurrency": 2, "rate": 1.0, "burst": 2},
+}
+
+REQUEST_TIMEOUT = 60
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 20.0
+RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class TokenBucket():
+    """令牌桶：每秒补充 rate 个令牌，最多存 burst 个，每个请求取一个，没有令牌时等待"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+        self.waited = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                delay = (1 - self.tokens) / self.rate
+                self.waited += delay
+                await asyncio.sleep(delay)
+
+
+def _status_code(error: Exception) -> int:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status
+
+
+def _retry_after(error: Exception) -> float:
+    """服务商在 Retry-After 响应头中给出的等待秒数，没有时返回 None"""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def is_cacheable(result: dict, params: dict) -> bool:
+    """只缓存有效的回答：要求匹配答案时必须匹配到答案，否则 content 或 reasoning_content 不能为空"""
+    if "answer_pattern" in params or "reasoning_pattern" in params:
+        return result.get("answer") is not None
+    return bool((result.get("content") or "").strip() or (result.get("reasoning_content") or "").strip())
+
+
+def is_retryable(error: Exception) -> bool:
+    """超时、连接错误、429 和 5xx 可以重试；参数错误、认证失败等重试也不会成功"""
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    status = _status_code(error)
+    if status is not None:
+        return status in RETRY_STATUS or status >= 500
+    # openai 的 APIConnectionError / APITimeoutError 没有状态码
+    return type(error).__name__ in ("APIConnectionError", "APITimeoutError")
+
+
+class LLMDispatcher():
+    """按服务商限制并发和速率的异步请求调度器，需要在事件循环中使用"""
+
+    def __init__(self, limits: dict = None, timeout: float = REQUEST_TIMEOUT, max_retries: int = MAX_RETRIES,
+                 cache: CompletionCache = None):
+        self.limits = {name: {**DEFAULT_LIMITS, **PROVIDER_LIMITS.get(name, {}), **(limits or {}).get(name, {})}
+                       for name in PROVIDERS}
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.cache = cache
+        self._semaphores = {}
+        self._buckets = {}
+        self._stats = {}
+
+    def _provider(self, provider: str) -> tuple:
+        if provider not in self.limits:
+            raise ValueError(f"不支持的服务商 {provider}，可选: {', '.join(self.limits)}")
+        if provider not in self._semaphores:
+            limit = self.limits[provider]
+            self._semaphores[provider] = asyncio.Semaphore(limit["concurrency"])
+            self._buckets[provider] = TokenBucket(limit["rate"], limit["burst"])
+            self._stats[provider] = {"requests": 0, "succeeded": 0, "failed": 0, "retries": 0, "timeouts": 0,
+                                     "cache_hits": 0, "in_flight": 0, "total_latency_ms": 0}
+        return self._semaphores[provider], self._buckets[provider], self._stats[provider]
+
+    async def complete(self, provider: str, messages: list, model: str = None, timeout: float = None,
+                       max_retries: int = None, cache: bool = True, **params) -> dict:
+        """
+        发送一个请求，参数与 LLMClients.complete 相同。
+
+        参数:
+            timeout (float): 单次请求的超时秒数，不包括排队等待的时间
+            max_retries (int): 可重试的错误最多重试的次数
+            cache (bool): 为False时不查缓存也不写入缓存
+            **params: 包含 answer_pattern 或 reasoning_pattern 时调用 LLMStream.astream_complete
+
+        返回:
+            dict: LLMClients.complete 的结果，另有 attempts 尝试次数，命中缓存时 attempts 为 0、cached 为True；
+                  重试用尽后抛出最后一次的异常
+        """
+        semaphore, bucket, stats = self._provider(provider)
+        timeout = self.timeout if timeout is None else timeout
+        max_retries = self.max_retries if max_retries is None else max_retries
+        stats["requests"] += 1
+        key = None
+        if cache and self.cache is not None:
+            key = cache_key(provider, model or PROVIDERS[provider]["model"], messages, params)
+            cached = self.cache.get(key)
+            if cached is not None:
+                stats["cache_hits"] += 1
+                return {**cached, "attempts": 0}
+        call = astream_complete if "answer_pattern" in params or "reasoning_pattern" in params else acomplete
+        attempt = 0
+        while True:
+            attempt += 1
+            async with semaphore:
+                await bucket.acquire()
+                stats["in_flight"] += 1
+                try:
+                    # 超时也传给 SDK，使在线程中调用的服务商（智谱）的请求及时结束，线程结束前不释放并发名额
+                    result = await asyncio.wait_for(call(provider, messages, model, timeout=timeout, **params),
+                                                    timeout)
+                except Exception as e:
+                    error = e
+                else:
+                    stats["succeeded"] += 1
+                    stats["total_latency_ms"] += result["latency_ms"]
+                    if key is not None and is_cacheable(result, params):
+                        self.cache.put(key, result)
+                    return {**result, "attempts": attempt}
+                finally:
+                    stats["in_flight"] -= 1
+
+            if isinstance(error, asyncio.TimeoutError):
+                stats["timeouts"] += 1
+            if attempt > max_retries or not is_retryable(error):
+                stats["failed"] += 1
+                raise error
+            stats["retries"] += 1
+            # 等待时释放并发名额，让其他请求先发送
+            delay = _retry_after(error)
+            if delay is None:
+                delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+            await asyncio.sleep(min(delay, BACKOFF_MAX))
+
+    async def complete_many(self, requests: list, return_exceptions: bool = True) -> list:
+        """
+        并发发送多个请求，按原顺序返回结果。
+
+        参数:
+            requests (list): 每项是 complete() 的关键字参数，如 {"provider": "deepseek", "messages": [...]}
+            return_exceptions (bool): 为True时失败的请求在结果中返回异常，不影响其他请求
+        """
+        return await asyncio.gather(*(self.complete(**request) for request in requests),
+                                    return_exceptions=return_exceptions)
+
+    def stats(self) -> dict:
+        """每个服务商的请求数、成功/失败/重试/超时次数、平均耗时和令牌桶等待的总秒数"""
+        result = {}
+        for provider, stats in self._stats.items():
+            result[provider] = {**self.limits[provider], **stats,
+                                "avg_latency_ms": round(stats["total_latency_ms"] / stats["succeeded"])
+                                if stats["succeeded"] else None,
+                                "rate_limited_s": round(self._buckets[provider].waited, 3)}
+        if self.cache is not None:
+            result["cache"] = self.cache.stats()
+        return result
+
+
+_dispatchers = {}
+_default_cache = None
+
+
+def get_dispatcher() -> LLMDispatcher:
+    """当前事件循环共用的调度器，同一个事件循环中的请求共享并发和速率限制，所有调度器共用默认位置的回答缓存"""
+    global _default_cache
+    loop = asyncio.get_running_loop()
+    dispatcher = _dispatchers.get(loop)
+    if dispatcher is None:
+        if _default_cache is None:
+            _default_cache = CompletionCache()
+        _dispatchers.clear()
+        dispatcher = _dispatchers[loop] = LLMDispatcher(cache=_default_cache)
+    return dispatcher
+
+
+async def dispatch(provider: str, messages: list, model: str = None, **params) -> dict:
+    """通过当前事件循环共用的调度器发送请求"""
+    return await get_dispatcher().complete(provider, messages, model, **params)
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python
+
+"""
+多服务商路由
+
+同一个请求可以发给多个服务商：先发给当前最快的健康服务商，超过延迟阈值还没有回答时再发给下一个（对冲），
+取最先返回的有效回答并取消其他请求；请求失败时立即改发下一个服务商。
+每个服务商记录最近的耗时，按 p50 排序，对冲阈值默认为该服务商的 p95；连续失败的服务商暂时排到最后。
+被对冲请求抢先而取消的请求只知道耗时的下限，单独记录，只用于排序，不计入 p50/p95。
+"""
+
+import asyncio
+import time
+from collections import deque
+
+from LLMClients import PROVIDERS
+from LLMDispatcher import get_dispatcher
+
+# 记录最近多少次的耗时
+LATENCY_WINDOW = 100
+# 样本不足时的对冲阈值（毫秒），以及自适应阈值的下限
+DEFAULT_HEDGE_MS = 5000
+MIN_HEDGE_MS = 500
+MIN_SAMPLES = 5
+# 连续失败多少次后暂停使用多少秒
+MAX_CONSECUTIVE_FAILURES = 3
+COOLDOWN_SECONDS = 30
+
+
+def percentile(values: list, p: float) -> float:
+    """最近秩法计算百分位数，values 为空时返回 None"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, round(p / 100 * len(ordered) + 0.5) - 1))]
+
+
+def has_answer(result: dict) -> bool:
+    """默认的有效回答判断：content 或 reasoning_content 不为空"""
+    return bool((result.get("content") or "").strip() or (result.get("reasoning_content") or "").strip())
+
+
+class LLMRouter():
+    """在多个服务商之间对冲和回退，按最近的耗时选择服务商"""
+
+    def __init__(self, providers: list = None, hedge_after_ms: float = None, dispatcher=None):
+        """
+        参数:
+            providers (list): 可用的服务商，默认为 LLMClients.PROVIDERS 中的全部
+            hedge_after_ms (float): 固定的对冲阈值，默认按每个服务商的 p95 自适应
+            dispatcher: LLMDispatcher，默认为当前事件循环共用的调度器
+        """
+        self.providers = list(providers or PROVIDERS)
+        self.hedge_after_ms = hedge_after_ms
+        self.dispatcher = dispatcher
+        # latencies 完成的请求的耗时；censored 被取消的请求已等待的时间（耗时的下限）
+        self._stats = {name: {"latencies": deque(maxlen=LATENCY_WINDOW), "censored": deque(maxlen=LATENCY_WINDOW),
+                              "requests": 0, "succeeded": 0, "failed": 0, "wins": 0, "hedged": 0, "cancelled": 0,
+                              "consecutive_failures": 0, "cooldown_until": 0.0}
+                       for name in PROVIDERS}
+
+    def healthy(self, provider: str) -> bool:
+        stats = self._stats[provider]
+        return stats["consecutive_failures"] < MAX_CONSECUTIVE_FAILURES or time.time() >= stats["cooldown_until"]
+
+    def rank(self, providers: list = None) -> list:
+        """
+        按优先级排序服务商：健康的在前；还没有耗时记录的排在最前面，保证每个服务商都会被尝试；
+        其余按 ranking_latency() 从快到慢，相同时保持传入的顺序
+        """
+        providers = list(providers or self.providers)
+        for provider in providers:
+            if provider not in PROVIDERS:
+                raise ValueError(f"不支持的服务商 {provider}，可选: {', '.join(PROVIDERS)}")
+
+        def key(item):
+            index, provider = item
+            p50 = self.ranking_latency(provider)
+            return (not self.healthy(provider), p50 is not None, p50 or 0, index)
+        return [provider for _, provider in sorted(enumerate(providers), key=key)]
+
+    def ranking_latency(self, provider: str) -> float:
+        """
+        排序用的耗时：把被取消的请求当作耗时无穷大，与完成的请求一起取中位数。
+        偶尔被取消不影响排序，经常被取消的服务商排到后面；没有任何记录时返回 None
+        """
+        stats = self._stats[provider]
+        samples = list(stats["latencies"]) + [float("inf")] * len(stats["censored"])
+        return percentile(samples, 50)
+
+    def hedge_delay(self, provider: str, hedge_after_ms: float = None) -> float:
+        """等待 provider 多少秒后对冲到下一个服务商"""
+        hedge_after_ms = hedge_after_ms or self.hedge_after_ms
+        if not hedge_after_ms:
+            latencies = self._stats[provider]["latencies"]
+            hedge_after_ms = DEFAULT_HEDGE_MS
+            if len(latencies) >= MIN_SAMPLES:
+                hedge_after_ms = max(MIN_HEDGE_MS, percentile(latencies, 95))
+        return hedge_after_ms / 1000
+
+    async def _attempt(self, provider: str, messages: list, model: str, params: dict) -> dict:
+        stats = self._stats[provider]
+        stats["requests"] += 1
+        dispatcher = self.dispatcher or get_dispatcher()
+        start = time.perf_counter()
+        try:
+            result = await dispatcher.complete(provider, messages, model, **params)
+        except asyncio.CancelledError:
+            # 被对冲请求抢先时，已经等待的时间只是它耗时的下限，单独记录，避免慢的服务商一直没有记录而排在前面
+            stats["cancelled"] += 1
+            stats["censored"].append(round((time.perf_counter() - start) * 1000))
+            raise
+        except Exception:
+            stats["failed"] += 1
+            stats["consecutive_failures"] += 1
+            if stats["consecutive_failures"] >= MAX_CONSECUTIVE_FAILURES:
+                stats["cooldown_until"] = time.time() + COOLDOWN_SECONDS
+            raise
+        stats["succeeded"] += 1
+        stats["consecutive_failures"] = 0
+        # 缓存命中的耗时不代表服务商的速度
+        if not result.get("cached"):
+            stats["latencies"].append(result["latency_ms"])
+        return result
+
+    async def complete(self, messages: list, providers: list = None, models: dict = None,
+                       hedge_after_ms: float = None, max_hedges: int = 1, accept=has_answer,
+                       max_retries: int = 0, **params) -> dict:
+        """
+        发送请求，返回最先得到的有效回答。
+
+        参数:
+            providers (list): 本次可用的服务商，默认为路由器的全部服务商
+            models (dict): 服务商 -> 模型名称，没有指定的使用服务商的默认模型
+            hedge_after_ms (float): 本次的对冲阈值，默认按服务商的 p95 自适应
+            max_hedges (int): 最多同时额外发送几个对冲请求，0 表示只在失败时回退
+            accept: 判断回答是否有效的函数，无效的回答按失败处理
+            max_retries (int): 每个服务商的重试次数，默认不重试，失败时直接回退到下一个服务商
+            **params: 传给 LLMDispatcher.complete 的其他参数
+
+        返回:
+            dict: 回答，另有 router: {"tried": 依次尝试的服务商, "hedged": 对冲次数, "errors": 失败的服务商和原因}；
+                  全部失败时抛出 RuntimeError
+        """
+        candidates = self.rank(providers)
+        models = models or {}
+        params["max_retries"] = max_retries
+        pending, tried, errors = {}, [], {}
+        hedged = 0
+
+        def launch():
+            provider = candidates.pop(0)
+            tried.append(provider)
+            task = asyncio.ensure_future(self._attempt(provider, messages, models.get(provider), params))
+            pending[task] = provider
+
+        launch()
+        try:
+            while pending:
+                # 还有候选且对冲次数没有用完时，等待到对冲阈值为止
+                delay = None
+                if candidates and hedged < max_hedges:
+                    delay = self.hedge_delay(tried[-1], hedge_after_ms)
+                done, _ = await asyncio.wait(pending, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged += 1
+                    self._stats[tried[-1]]["hedged"] += 1
+                    launch()
+                    continue
+                for task in done:
+                    provider = pending.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        errors[provider] = f"{type(e).__name__}: {e}"
+                        continue
+                    if accept(result):
+                        self._stats[provider]["wins"] += 1
+                        return {**result, "router": {"tried": tried, "hedged": hedged, "errors": errors}}
+                    errors[provider] = "回答无效"
+                # 失败的请求立即回退到下一个服务商，保持同时进行的请求数不变
+                while candidates and len(pending) < 1 + hedged:
+                    launch()
+        finally:
+            # 取消落后的请求并等它们结束，连接随之关闭，也不留下没有取走的异常
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        raise RuntimeError(f"所有服务商都失败: {errors}")
+
+    def stats(self) -> dict:
+        """每个服务商完成的请求的 p50/p95 耗时、样本数、成功/失败/取消次数、胜出次数、对冲次数和是否健康"""
+        result = {}
+        for provider in self.providers:
+            stats = self._stats[provider]
+            latencies = list(stats["latencies"])
+            result[provider] = {"p50_ms": percentile(latencies, 50), "p95_ms": percentile(latencies, 95),
+                                "samples": len(latencies), "healthy": self.healthy(provider),
+                                **{k: v for k, v in stats.items() if k not in ("latencies", "censored", "cooldown_until")}}
+        return result
+
+
+_router = None
+
+
+def get_router() -> LLMRouter:
+    """进程内共用的路由器，耗时统计在多次请求之间累积"""
+    global _router
+    if _router is None:
+        _router = LLMRouter()
+    return _router
+
+
+async def route(messages: list, providers: list = None, **params) -> dict:
+    """通过共用的路由器发送请求"""
+    return await get_router().complete(messages, providers, **params)
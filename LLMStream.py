@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python
+
+"""
+流式回答与提前结束
+
+以流式方式接收回答，每收到一段就用正则匹配答案，匹配到后立即关闭连接，服务商随之停止生成，
+不必等完整的回答，也不再消耗后面的输出 token。推理模型的 reasoning_content 也可以匹配，
+在推理过程中已经得出答案时不等正式回答。
+"""
+
+import re
+import time
+
+from LLMClients import PROVIDERS, get_async_client, get_client, run_in_thread
+
+# 回答开头的选项字母，如 "B"、"A. 正确"、"答案：C"；字母后必须是标点、换行或回答结束，
+# 排除 "A Dog"、"Apple" 这样以字母开头的普通回答
+CHOICE_ANSWER = r"^\s*(?:(?:答案|Answer)\s*[:：]?\s*)?([A-D])(?=\s*[.、。:：)）\n]|$)"
+# 推理过程中明确给出的答案，如 "答案是A。"、"正确答案为：B\n"；字母后必须是句末标点、换行或回答结束，
+# 排除 "答案应该是A吗？"、"答案是A还是B" 这样还没有确定的说法
+REASONING_CHOICE_ANSWER = r"答案\s*(?:是|为|选)?\s*[:：]?\s*([A-D])(?=\s*[。.！!]|\n|$)"
+# 每次只在新收到的文本和它前面这么多个字符中匹配，避免长推理过程反复从头匹配
+LOOKBEHIND_CHARS = 200
+
+
+class AnswerWatcher():
+    """累积流式回答的 content 和 reasoning_content，匹配到答案后通知调用方停止接收"""
+
+    def __init__(self, answer_pattern: str = None, reasoning_pattern: str = None):
+        self.patterns = {"content": re.compile(answer_pattern) if answer_pattern else None,
+                         "reasoning_content": re.compile(reasoning_pattern) if reasoning_pattern else None}
+        self.text = {"content": "", "reasoning_content": ""}
+        self.answer = None
+        self.answer_source = None
+        self.usage = None
+        self.finish_reason = None
+        self.chunks = 0
+        self.first_token_at = None
+
+    def _match(self, field: str, start: int, final: bool) -> bool:
+        pattern, text = self.patterns[field], self.text[field]
+        if pattern is None:
+            return False
+        match = pattern.search(text, start)
+        # 匹配到文本末尾时还不确定，例如 "A" 后面可能还有 "BC"，等下一段文本或回答结束再确认
+        if match is None or (match.end() == len(text) and not final):
+            return False
+        self.answer = match.group("answer") if "answer" in pattern.groupindex else \
+            match.group(1) if pattern.groups else match.group(0)
+        self.answer_source = field
+        return True
+
+    def feed(self, chunk) -> bool:
+        """处理一段流式数据，匹配到答案时返回 True"""
+        self.chunks += 1
+        usage = getattr(chunk, "usage", None)
+        if usage is not None:
+            self.usage = usage.model_dump() if hasattr(usage, "model_dump") else usage
+        if not chunk.choices:
+            return False
+        choice = chunk.choices[0]
+        self.finish_reason = getattr(choice, "finish_reason", None) or self.finish_reason
+        delta = choice.delta
+        for field in ("reasoning_content", "content"):
+            piece = getattr(delta, field, None)
+            if not piece:
+                continue
+            if self.first_token_at is None:
+                self.first_token_at = time.perf_counter()
+            start = max(0, len(self.text[field]) - LOOKBEHIND_CHARS)
+            self.text[field] += piece
+            if self._match(field, start, final=False):
+                return True
+        return False
+
+    def finish(self) -> None:
+        """回答结束时再匹配一次，允许答案在文本末尾"""
+        for field in ("content", "reasoning_content"):
+            if self.answer is None:
+                self._match(field, 0, final=True)
+
+    def result(self, provider: str, model: str, start: float, stopped_early: bool) -> dict:
+        return {
+            "content": self.text["content"],
+            "reasoning_content": self.text["reasoning_content"],
+            "provider": provider,
+            "model": model,
+            "usage": self.usage,
+            "latency_ms": round((time.perf_counter() - start) * 1000),
+            "ttft_ms": round((self.first_token_at - start) * 1000) if self.first_token_at else None,
+            "answer": self.answer,
+            "answer_source": self.answer_source,
+            "stopped_early": stopped_early,
+            "finish_reason": "answer_matched" if stopped_early else self.finish_reason,
+            "chunks": self.chunks,
+        }
+
+
+def stream_complete(provider: str, messages: list, model: str = None, answer_pattern: str = None,
+                    reasoning_pattern: str = None, **params) -> dict:
+    """
+    以流式方式调用对话补全接口，匹配到答案后提前结束。
+
+    参数:
+        answer_pattern (str): 在 content 中匹配答案的正则，有名为 answer 的分组时取该分组，否则取第一个分组；
+            默认不匹配 content，选择题可以传入 CHOICE_ANSWER
+        reasoning_pattern (str): 在 reasoning_content 中匹配答案的正则，默认不匹配推理过程
+        **params: 其他参数与 LLMClients.complete 相同，stream 参数会被忽略
+
+    返回:
+        dict: LLMClients.complete 的结果，另有 answer 匹配到的答案(没有时为 None)、answer_source 答案所在字段、
+              stopped_early 是否提前结束、ttft_ms 首个 token 的耗时、chunks 收到的分段数；提前结束时 usage 为 None
+    """
+    return _stream_complete(get_client(provider), provider, messages, model, answer_pattern, reasoning_pattern,
+                            **params)
+
+
+def _stream_complete(client, provider: str, messages: list, model: str, answer_pattern: str,
+                     reasoning_pattern: str, **params) -> dict:
+    model = model or PROVIDERS[provider]["model"]
+    params.pop("stream", None)
+    watcher = AnswerWatcher(answer_pattern, reasoning_pattern)
+    start = time.perf_counter()
+    stream = client.chat.completions.create(model=model, messages=messages, stream=True, **params)
+    stopped_early = False
+    try:
+        for chunk in stream:
+            if watcher.feed(chunk):
+                stopped_early = True
+                break
+    finally:
+        # 关闭连接，服务商停止生成
+        close = getattr(stream, "close", None)
+        if close is not None:
+            close()
+    if not stopped_early:
+        watcher.finish()
+    return watcher.result(provider, model, start, stopped_early)
+
+
+async def astream_complete(provider: str, messages: list, model: str = None, answer_pattern: str = None,
+                           reasoning_pattern: str = None, **params) -> dict:
+    """stream_complete() 的异步版本。没有异步客户端的服务商（智谱）与 LLMClients.acomplete 一样在线程中调用"""
+    client = get_async_client(provider)
+    if client is None:
+        return await run_in_thread(_stream_complete, get_client(provider, sdk_retries=False), provider, messages,
+                                   model, answer_pattern, reasoning_pattern, **params)
+    model = model or PROVIDERS[provider]["model"]
+    params.pop("stream", None)
+    watcher = AnswerWatcher(answer_pattern, reasoning_pattern)
+    start = time.perf_counter()
+    stream = await client.chat.completions.create(model=model, messages=messages, stream=True, **params)
+    stopped_early = False
+    try:
+        async for chunk in stream:
+            if watcher.feed(chunk):
+                stopped_early = True
+                break
+    finally:
+        await stream.close()
+    if not stopped_early:
+        watcher.finish()
+    return watcher.result(provider, model, start, stopped_early)
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python
+
+"""
+按页面状态等待
+
+代替固定秒数的等待：条件成立时立即返回，并报告实际等待的时间。
+DOM相关的条件在页面内用 MutationObserver 判断，一次 run_js 等待一段时间，不逐次轮询；
+网络空闲通过 CDP 的 Network 事件统计进行中的请求数；开始等待之前已经发出的请求收不到 requestWillBeSent，
+同时要求页面加载完成(readyState 为 complete)且空闲期间没有新完成的资源(PerformanceObserver 计数不变)。
+URL变化在 Python 端轮询。
+"""
+
+import json
+import time
+
+from CodeBox import pageWait
+from TabEvents import TabEventHub
+
+IN_PAGE_CONDITIONS = ("dom_ready", "load", "element_present", "element_visible", "element_stable", "js")
+CONDITIONS = IN_PAGE_CONDITIONS + ("network_idle", "url_change")
+
+# 页面内一次等待的最长时间（秒），页面导航会中断脚本，分段等待才能在导航后继续
+IN_PAGE_SLICE = 2.0
+# network_idle 检查页面加载状态和已完成资源数的间隔（秒）
+PAGE_PROBE_INTERVAL = 0.1
+
+# 返回 readyState 和页面已完成的资源数；PerformanceObserver 计数不受资源缓冲区(默认250条)上限的影响
+_page_activity_js = r'''
+let counter = window.__dpResourceCount;
+if (!counter) {
+  counter = window.__dpResourceCount = { n: performance.getEntriesByType('resource').length };
+  try {
+    new PerformanceObserver(list => { counter.n += list.getEntries().length; }).observe({ type: 'resource' });
+  } catch (e) {}
+}
+return JSON.stringify({ ready: document.readyState, resources: counter.n });
+'''
+
+
+def wait_for(tab, condition: str = "dom_ready", timeout: float = 10, xpath: str = "", selector: str = "",
+             predicate: str = "", url: str = "", idle_ms: int = 500, max_inflight: int = 0,
+             stable_ms: int = 300, poll_ms: int = 100, hub: TabEventHub = None) -> dict:
+    """
+    等待标签页满足条件。
+
+    参数:
+        condition (str): 等待条件
+            dom_ready        DOMContentLoaded，document.readyState 不再是 loading
+            load             document.readyState 为 complete
+            network_idle     页面加载完成，进行中的请求数不超过 max_inflight 并保持 idle_ms 毫秒，
+                             期间没有开始等待之前发出的请求完成
+            element_present  xpath 或 selector 指定的元素存在
+            element_visible  元素存在且可见
+            element_stable   元素可见，并且位置和大小保持 stable_ms 毫秒不变
+            url_change       URL 包含 url；url 为空时等待 URL 与开始时不同
+            js               JS表达式 predicate 的值为真
+        timeout (float): 超时时间（秒）
+        hub (TabEventHub): 标签页的事件分发器，network_idle 用它订阅事件，
+            不传时新建一个，会覆盖标签页上已用 driver.set_callback 设置的 Network 事件回调
+
+    返回:
+        dict: ok 条件是否成立，waited_ms 实际等待的毫秒数
+    """
+    if condition not in CONDITIONS:
+        raise ValueError(f"不支持的等待条件 {condition}，可选: {', '.join(CONDITIONS)}")
+    if condition.startswith("element_") and not (xpath or selector):
+        raise ValueError(f"{condition} 需要 xpath 或 selector")
+    if condition == "js" and not predicate:
+        raise ValueError("js 条件需要 predicate 表达式")
+
+    start = time.perf_counter()
+    deadline = start + timeout
+    if condition == "network_idle":
+        result = _wait_network_idle(tab, deadline, idle_ms, max_inflight, hub)
+    elif condition == "url_change":
+        result = _wait_url(tab, deadline, url, poll_ms)
+    else:
+        options = {"condition": condition, "xpath": xpath, "selector": selector,
+                   "stable_ms": stable_ms, "poll_ms": poll_ms}
+        result = _wait_in_page(tab, deadline, pageWait.replace("__PREDICATE__", predicate or "false"),
+                               options, poll_ms)
+    return {"ok": result.pop("ok"), "condition": condition,
+            "waited_ms": round((time.perf_counter() - start) * 1000), **result}
+
+
+def _wait_in_page(tab, deadline: float, script: str, options: dict, poll_ms: int) -> dict:
+    error = ""
+    while True:
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            return {"ok": False, "error": error} if error else {"ok": False}
+        slice_ms = int(min(remaining, IN_PAGE_SLICE) * 1000)
+        try:
+            r = json.loads(tab.run_js(script, {**options, "slice_ms": slice_ms}, timeout=slice_ms / 1000 + 5))
+            if r["ok"]:
+                return {"ok": True}
+        except Exception as e:
+            # 页面导航时执行上下文被销毁，等新页面就绪后继续
+            error = str(e)
+            time.sleep(min(poll_ms / 1000, max(0, deadline - time.perf_counter())))
+
+
+def _wait_url(tab, deadline: float, url: str, poll_ms: int) -> dict:
+    initial = tab.url
+    while True:
+        current = tab.url
+        if (url in current) if url else (current != initial):
+            return {"ok": True, "url": current}
+        if time.perf_counter() >= deadline:
+            return {"ok": False, "url": current}
+        time.sleep(poll_ms / 1000)
+
+
+def _wait_network_idle(tab, deadline: float, idle_ms: int, max_inflight: int, hub: TabEventHub) -> dict:
+    hub = hub or TabEventHub(tab)
+    inflight = set()
+
+    def on_request(**event):
+        inflight.add(event["requestId"])
+
+    def on_done(**event):
+        inflight.discard(event["requestId"])
+
+    tokens = [hub.subscribe("Network.requestWillBeSent", on_request),
+              hub.subscribe("Network.loadingFinished", on_done),
+              hub.subscribe("Network.loadingFailed", on_done)]
+    tab.run_cdp("Network.enable")
+    try:
+        idle_since = time.perf_counter()
+        activity, probed_at = None, 0.0
+        while True:
+            now = time.perf_counter()
+            if now - probed_at >= PAGE_PROBE_INTERVAL:
+                probed_at = now
+                try:
+                    page = json.loads(tab.run_js(_page_activity_js))
+                except Exception:
+                    # 页面正在导航
+                    page = None
+                # 页面没有加载完成，或者有资源完成（可能是开始等待之前发出的请求）时重新计时
+                if page is None or page["ready"] != "complete" or page != activity:
+                    idle_since = now
+                activity = page
+            if len(inflight) > max_inflight:
+                idle_since = now
+            elif now - idle_since >= idle_ms / 1000:
+                return {"ok": True, "inflight": len(inflight)}
+            if now >= deadline:
+                return {"ok": False, "inflight": len(inflight), "ready_state": activity and activity["ready"]}
+            time.sleep(0.02)
+    finally:
+        for token in tokens:
+            hub.unsubscribe(token)
+        if not hub.has_subscribers("Network."):
+            try:
+                tab.run_cdp("Network.disable")
+            except Exception:
+                pass
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python
+
+"""
+请求拦截与资源屏蔽
+
+通过 CDP 的 Fetch 域在标签页上拦截请求，按资源类型、URL通配符和 mimeType 屏蔽
+图片、字体、广告和统计脚本等不需要的资源，加快页面加载。
+资源类型和URL条件在请求阶段拦截，浏览器只暂停匹配的请求；
+mimeType 条件需要看到响应头，只能在响应阶段拦截，开销较大，按需使用。
+"""
+
+import threading
+
+# 常见的广告和统计脚本
+AD_URL_PATTERNS = [
+    "*://*.doubleclick.net/*",
+    "*://*.googlesyndication.com/*",
+    "*://*.google-analytics.com/*",
+    "*://*.googletagmanager.com/*",
+    "*://*.googleadservices.com/*",
+    "*://*.facebook.net/*",
+    "*://hm.baidu.com/*",
+    "*://pos.baidu.com/*",
+    "*://*.cnzz.com/*",
+    "*://*.umeng.com/*",
+]
+
+BLOCK_PROFILES = {
+    "none": {},
+    "ads": {"url_patterns": AD_URL_PATTERNS},
+    "media": {"resource_types": ["Image", "Media", "Font"]},
+    "fast": {"resource_types": ["Image", "Media", "Font"], "url_patterns": AD_URL_PATTERNS},
+    "text": {"resource_types": ["Image", "Media", "Font", "Stylesheet"], "url_patterns": AD_URL_PATTERNS},
+}
+
+
+def resolve_profile(profile) -> dict:
+    """
+    把屏蔽配置解析为 {"resource_types": [...], "url_patterns": [...], "mime": [...]}。
+
+    profile 可以是 BLOCK_PROFILES 中的名称，或者字典；字典可以用 extends 在预置配置的基础上追加条件。
+    """
+    if not profile:
+        return {}
+    if isinstance(profile, str):
+        if profile not in BLOCK_PROFILES:
+            raise ValueError(f"不存在屏蔽配置 {profile}，可选: {', '.join(BLOCK_PROFILES)}")
+        return resolve_profile(dict(BLOCK_PROFILES[profile]))
+    base = resolve_profile(profile.get("extends")) if profile.get("extends") else {}
+    resolved = {}
+    for key in ("resource_types", "url_patterns", "mime"):
+        values = base.get(key, []) + list(profile.get(key) or [])
+        if values:
+            resolved[key] = list(dict.fromkeys(values))
+    return resolved
+
+
+class RequestBlocker():
+    """在一个标签页上按屏蔽配置拦截请求，并统计屏蔽的请求数和字节数"""
+
+    def __init__(self, hub, profile, follows_global: bool = False):
+        self.hub = hub
+        self.profile = resolve_profile(profile)
+        # 按全局配置创建的拦截，全局配置修改时随之更新；单独为标签页设置的保持不变
+        self.follows_global = follows_global
+        self.blocked_requests = 0
+        # 请求阶段屏蔽的请求还没有响应，大小未知；响应阶段屏蔽的按 Content-Length 计入
+        self.blocked_bytes = 0
+        self.blocked_by_type = {}
+        self.continued = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._token = None
+
+    @property
+    def tab_id(self) -> str:
+        return self.hub.tab.tab_id
+
+    def patterns(self) -> list:
+        """转换为 Fetch.enable 的 patterns，多个 pattern 之间是"或者"的关系"""
+        patterns = [{"urlPattern": "*", "resourceType": t, "requestStage": "Request"}
+                    for t in self.profile.get("resource_types", [])]
+        patterns += [{"urlPattern": p, "requestStage": "Request"} for p in self.profile.get("url_patterns", [])]
+        if self.profile.get("mime"):
+            patterns.append({"urlPattern": "*", "requestStage": "Response"})
+        return patterns
+
+    def start(self) -> None:
+        """开启 Fetch 域拦截，屏蔽配置为空时什么都不做"""
+        patterns = self.patterns()
+        if not patterns:
+            return
+        self._token = self.hub.subscribe("Fetch.requestPaused", self._on_paused)
+        self.hub.tab.run_cdp("Fetch.enable", patterns=patterns)
+
+    def update(self, profile) -> None:
+        """
+        改用新的屏蔽配置，统计数据保留。再次调用 Fetch.enable 会替换拦截条件，不需要先关闭拦截；
+        新配置为空时关闭拦截
+        """
+        resolved = resolve_profile(profile)
+        with self._lock:
+            self.profile = resolved
+        patterns = self.patterns()
+        if not patterns:
+            self.stop()
+        elif self._token is None:
+            self.start()
+        else:
+            self.hub.tab.run_cdp("Fetch.enable", patterns=patterns)
+
+    def stop(self) -> None:
+        """关闭拦截"""
+        if self._token is None:
+            return
+        self.hub.unsubscribe(self._token)
+        self._token = None
+        try:
+            self.hub.tab.run_cdp("Fetch.disable")
+        except Exception:
+            pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"tab_id": self.tab_id, "profile": self.profile, "blocked_requests": self.blocked_requests,
+                    "blocked_bytes": self.blocked_bytes, "blocked_by_type": dict(self.blocked_by_type),
+                    "continued": self.continued, "errors": self.errors}
+
+    def _on_paused(self, **event) -> None:
+        request_id = event["requestId"]
+        resource_type = event.get("resourceType", "")
+        size = 0
+        if "responseStatusCode" in event or "responseErrorReason" in event:
+            # 响应阶段：只有 mimeType 条件会走到这里，页面本身不屏蔽
+            headers = {h["name"].lower(): h["value"] for h in event.get("responseHeaders") or []}
+            content_type = headers.get("content-type", "")
+            if resource_type == "Document" or not any(m in content_type for m in self.profile.get("mime", [])):
+                self._run("Fetch.continueRequest", requestId=request_id)
+                with self._lock:
+                    self.continued += 1
+                return
+            size = int(headers.get("content-length", 0) or 0)
+
+        self._run("Fetch.failRequest", requestId=request_id, errorReason="BlockedByClient")
+        with self._lock:
+            self.blocked_requests += 1
+            self.blocked_bytes += size
+            self.blocked_by_type[resource_type] = self.blocked_by_type.get(resource_type, 0) + 1
+
+    def _run(self, cmd: str, **kwargs) -> None:
+        try:
+            self.hub.tab.run_cdp(cmd, **kwargs)
+        except Exception:
+            # 请求可能已经被取消，或者标签页已关闭
+            with self._lock:
+                self.errors += 1
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python
+
+"""
+连续画面流
+
+用 CDP 的 Page.startScreencast 让浏览器在画面变化时推送编码好的帧，只在内存中保留每个标签页的最新一帧，
+取帧不需要再截图。浏览器收到上一帧的确认(Page.screencastFrameAck)后才发送下一帧，
+按帧率延迟确认即可在源头限流，浏览器不会编码多余的帧。
+"""
+
+import base64
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+
+class Screencast():
+    """一个标签页的画面流，保存最新一帧，可以把帧序列保存到磁盘"""
+
+    def __init__(self, hub, fps: float = 5, format: str = "jpeg", quality: int = 60,
+                 max_width: int = 1280, max_height: int = 800):
+        self.hub = hub
+        self.fps = fps
+        self.format = format
+        self.quality = quality
+        self.max_width = max_width
+        self.max_height = max_height
+        self.frames = 0
+        self.latest = None
+        self.recording = None
+        self._lock = threading.Lock()
+        self._token = None
+        self._last_ack = 0.0
+        self._writer = None
+
+    @property
+    def tab_id(self) -> str:
+        return self.hub.tab.tab_id
+
+    def start(self) -> None:
+        self._token = self.hub.subscribe("Page.screencastFrame", self._on_frame)
+        params = {"format": self.format, "everyNthFrame": 1}
+        if self.format == "jpeg":
+            params["quality"] = self.quality
+        if self.max_width:
+            params["maxWidth"] = self.max_width
+        if self.max_height:
+            params["maxHeight"] = self.max_height
+        self.hub.tab.run_cdp("Page.startScreencast", **params)
+
+    def stop(self) -> dict:
+        """停止画面流和录制，返回统计"""
+        if self._token is not None:
+            self.hub.unsubscribe(self._token)
+            self._token = None
+            try:
+                self.hub.tab.run_cdp("Page.stopScreencast")
+            except Exception:
+                pass
+        self.stop_recording()
+        return self.stats()
+
+    def latest_frame(self) -> dict:
+        """
+        返回最新一帧。
+
+        返回:
+            dict: data 图片数据，format，frame 帧序号，timestamp 浏览器产生这一帧的时间，
+                  age_ms 距今的毫秒数，width/height 页面视口的CSS像素大小；还没有收到帧时返回 None
+        """
+        with self._lock:
+            latest = self.latest
+        if latest is None:
+            return None
+        return {**latest, "data": base64.b64decode(latest["data"]),
+                "age_ms": round((time.time() - latest["received_at"]) * 1000)}
+
+    def start_recording(self, directory: str, max_frames: int = 100) -> dict:
+        """把之后收到的帧依次保存为 directory 下的 frame_000001.jpeg 等文件，保存 max_frames 帧后自动停止"""
+        self.stop_recording()
+        path = Path(directory)
+        path.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            self.recording = {"directory": str(path), "max_frames": max_frames, "saved": 0, "files": []}
+            self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="DrissionPageMCP-screencast")
+        return dict(self.recording)
+
+    def stop_recording(self) -> dict:
+        """停止录制，等待已收到的帧写完"""
+        with self._lock:
+            writer, self._writer = self._writer, None
+        if writer is not None:
+            writer.shutdown(wait=True)
+        return dict(self.recording) if self.recording else None
+
+    def stats(self) -> dict:
+        with self._lock:
+            recording = dict(self.recording, files=len(self.recording["files"])) if self.recording else None
+            return {"tab_id": self.tab_id, "running": self._token is not None, "fps": self.fps,
+                    "format": self.format, "frames": self.frames,
+                    "latest_frame": self.latest["frame"] if self.latest else None, "recording": recording}
+
+    def _on_frame(self, **event) -> None:
+        metadata = event.get("metadata", {})
+        with self._lock:
+            self.frames += 1
+            # 保留base64字符串，取帧时才解码
+            self.latest = {"frame": self.frames, "format": self.format, "data": event["data"],
+                           "timestamp": metadata.get("timestamp"), "received_at": time.time(),
+                           "width": metadata.get("deviceWidth"), "height": metadata.get("deviceHeight")}
+            recording, writer = self.recording, self._writer
+            if writer is not None and recording["saved"] < recording["max_frames"]:
+                recording["saved"] += 1
+                file = Path(recording["directory"]) / f"frame_{recording['saved']:06d}.{self.format}"
+                recording["files"].append(str(file))
+                writer.submit(file.write_bytes, base64.b64decode(event["data"]))
+
+        # 按帧率延迟确认，确认之前浏览器不会发送下一帧；在定时器线程中确认，不阻塞事件分发
+        delay = max(0.0, self._last_ack + 1 / self.fps - time.time()) if self.fps else 0
+        self._last_ack = time.time() + delay
+        timer = threading.Timer(delay, self._ack, (event["sessionId"],))
+        timer.daemon = True
+        timer.start()
+
+    def _ack(self, session_id: int) -> None:
+        if self._token is None:
+            return
+        try:
+            self.hub.tab.run_cdp("Page.screencastFrameAck", sessionId=session_id)
+        except Exception:
+            pass
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python
+
+"""
+截图
+
+直接调用 CDP 的 Page.captureScreenshot，由浏览器完成区域裁剪、缩放和编码，
+Python 端不需要图片库。给定字节上限时先降低质量、再按比例缩小，直到编码后的大小不超过上限。
+"""
+
+import base64
+import json
+import math
+
+FORMATS = ("jpeg", "webp", "png")
+# 按字节上限压缩时质量不低于这个值，再小就改为缩小尺寸
+MIN_QUALITY = 40
+MAX_ATTEMPTS = 6
+
+# 返回元素在页面坐标系中的位置和大小，参数为 {xpath, selector}
+_element_rect_js = r'''
+const options = arguments[0];
+const el = options.xpath
+  ? document.evaluate(options.xpath, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue
+  : document.querySelector(options.selector);
+if (!el) return JSON.stringify(null);
+el.scrollIntoView({ block: 'nearest', inline: 'nearest' });
+const r = el.getBoundingClientRect();
+return JSON.stringify({ x: r.left + scrollX, y: r.top + scrollY, width: r.width, height: r.height });
+'''
+
+
+def page_clip(tab, xpath: str = "", selector: str = "", clip: dict = None, full_page: bool = False) -> dict:
+    """
+    计算截图区域（页面坐标，CSS像素）。
+
+    优先级：xpath/selector 指定的元素 > clip 矩形 > 整个页面(full_page) > 当前视口。
+    元素不存在时返回 None。
+    """
+    if xpath or selector:
+        return json.loads(tab.run_js(_element_rect_js, {"xpath": xpath, "selector": selector}))
+    if clip:
+        return {k: float(clip[k]) for k in ("x", "y", "width", "height")}
+    metrics = tab.run_cdp("Page.getLayoutMetrics")
+    if full_page:
+        size = metrics["cssContentSize"]
+        return {"x": 0, "y": 0, "width": size["width"], "height": size["height"]}
+    view = metrics["cssVisualViewport"]
+    return {"x": view["pageX"], "y": view["pageY"], "width": view["clientWidth"], "height": view["clientHeight"]}
+
+
+def capture(tab, xpath: str = "", selector: str = "", clip: dict = None, full_page: bool = False,
+            scale: float = 1.0, format: str = "jpeg", quality: int = 80, max_bytes: int = 0,
+            min_scale: float = 0.1, region: dict = None) -> dict:
+    """
+    截图并按字节上限压缩。
+
+    参数:
+        scale (float): 缩放比例，1 为 CSS 像素大小，2 为高清屏的两倍像素
+        format (str): jpeg / webp / png，png 没有质量参数，只能缩小尺寸
+        quality (int): jpeg/webp 的初始质量 1-100
+        max_bytes (int): 编码后的字节上限，0 表示不限制
+        min_scale (float): 缩小尺寸的下限，到达下限仍超出字节上限时返回最后一次的结果
+        region (dict): 已经用 page_clip 计算好的截图区域，传入时忽略 xpath/selector/clip/full_page
+
+    返回:
+        dict: data 图片数据，format、width、height(像素)、scale、quality、bytes、attempts(编码次数)，
+              区域不存在时返回 None
+    """
+    if format not in FORMATS:
+        raise ValueError(f"不支持的图片格式 {format}，可选: {', '.join(FORMATS)}")
+    if region is None:
+        region = page_clip(tab, xpath, selector, clip, full_page)
+    if region is None:
+        return None
+    if region["width"] <= 0 or region["height"] <= 0:
+        raise ValueError(f"截图区域为空: {region}")
+
+    quality = quality if format != "png" else None
+    attempts = 0
+    while True:
+        attempts += 1
+        params = {"format": format, "clip": {**region, "scale": scale},
+                  "captureBeyondViewport": True, "optimizeForSpeed": True}
+        if quality is not None:
+            params["quality"] = quality
+        data = base64.b64decode(tab.run_cdp("Page.captureScreenshot", **params)["data"])
+        if not max_bytes or len(data) <= max_bytes or attempts >= MAX_ATTEMPTS or scale <= min_scale:
+            break
+        if quality is not None and quality > MIN_QUALITY:
+            # 质量对大小的影响大致是线性的，先降质量，保持清晰度
+            quality = max(MIN_QUALITY, int(quality * max_bytes / len(data)))
+        else:
+            # 编码大小大致与像素数成正比，按面积比例缩小，多缩一点避免反复尝试
+            scale = max(min_scale, scale * math.sqrt(max_bytes / len(data)) * 0.9)
+
+    return {"data": data, "format": format, "width": round(region["width"] * scale),
+            "height": round(region["height"] * scale), "scale": round(scale, 3), "quality": quality,
+            "bytes": len(data), "attempts": attempts}
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python
+
+"""
+截图去重与缓存
+
+默认比较截图本身的内容哈希，与该标签页上一次相同参数的截图完全相同才认为画面没有变化，不再传输图片。
+允许近似时先截取一张很小的 PNG 缩略图（几十像素宽，浏览器编码很快），解码后计算差异哈希(dHash)，
+汉明距离不超过阈值即认为没有变化，连完整截图也不再截取；缩小后单个字符、复选框等小的变化可能看不出来。
+编码后的截图保存在有内存上限的 LRU 缓存中，可以按 capture_id 取回。
+"""
+
+import base64
+import hashlib
+import itertools
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+# 缩略图宽度（像素），计算 dHash 时再在 Python 端缩小到 9x8
+THUMBNAIL_WIDTH = 64
+_HASH_W, _HASH_H = 9, 8
+
+
+def _paeth(a: int, b: int, c: int) -> int:
+    p = a + b - c
+    pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+    if pa <= pb and pa <= pc:
+        return a
+    return b if pb <= pc else c
+
+
+def decode_png_gray(data: bytes) -> tuple:
+    """
+    解码 8 位、非隔行扫描的 PNG（浏览器截图的格式）为灰度像素。
+
+    返回:
+        tuple: (宽, 高, 按行排列的灰度值列表)
+    """
+    if data[:8] != b"\x89PNG\r\n\x1a\n":
+        raise ValueError("不是PNG数据")
+    pos, idat = 8, b""
+    while pos < len(data):
+        length, kind = struct.unpack(">I4s", data[pos:pos + 8])
+        chunk = data[pos + 8:pos + 8 + length]
+        if kind == b"IHDR":
+            width, height, depth, color, _, _, interlace = struct.unpack(">IIBBBBB", chunk)
+        elif kind == b"IDAT":
+            idat += chunk
+        pos += 12 + length
+    channels = {0: 1, 2: 3, 4: 2, 6: 4}.get(color)
+    if depth != 8 or interlace or channels is None:
+        raise ValueError("不支持的PNG格式")
+
+    raw = zlib.decompress(idat)
+    stride = width * channels
+    prev = bytearray(stride)
+    gray = []
+    for y in range(height):
+        offset = y * (stride + 1)
+        kind, line = raw[offset], bytearray(raw[offset + 1:offset + 1 + stride])
+        for i in range(stride):
+            left = line[i - channels] if i >= channels else 0
+            up, up_left = prev[i], prev[i - channels] if i >= channels else 0
+            if kind == 1:
+                line[i] = (line[i] + left) & 0xFF
+            elif kind == 2:
+                line[i] = (line[i] + up) & 0xFF
+            elif kind == 3:
+                line[i] = (line[i] + ((left + up) >> 1)) & 0xFF
+            elif kind == 4:
+                line[i] = (line[i] + _paeth(left, up, up_left)) & 0xFF
+        prev = line
+        if channels >= 3:
+            gray.extend((line[i] * 299 + line[i + 1] * 587 + line[i + 2] * 114) // 1000
+                        for i in range(0, stride, channels))
+        else:
+            gray.extend(line[0:stride:channels])
+    return width, height, gray
+
+
+def dhash(width: int, height: int, gray: list) -> int:
+    """把灰度图按区域平均缩小到 9x8，比较相邻像素得到 64 位差异哈希"""
+    cells = []
+    for cy in range(_HASH_H):
+        y0, y1 = cy * height // _HASH_H, max(cy * height // _HASH_H + 1, (cy + 1) * height // _HASH_H)
+        for cx in range(_HASH_W):
+            x0, x1 = cx * width // _HASH_W, max(cx * width // _HASH_W + 1, (cx + 1) * width // _HASH_W)
+            values = [gray[y * width + x] for y in range(y0, min(y1, height)) for x in range(x0, min(x1, width))]
+            cells.append(sum(values) / len(values))
+    bits = 0
+    for cy in range(_HASH_H):
+        for cx in range(_HASH_W - 1):
+            i = cy * _HASH_W + cx
+            bits = (bits << 1) | (cells[i] > cells[i + 1])
+    return bits
+
+
+def thumbnail_hash(tab, region: dict, perceptual: bool = False) -> str:
+    """
+    截取区域的小缩略图并计算哈希。
+
+    返回:
+        str: "s:" 开头的缩略图内容哈希，只能判断完全相同；
+             perceptual 为True时为 "d:" 开头的16进制 dHash，PNG 无法解码时仍退回为内容哈希
+    """
+    scale = min(1.0, THUMBNAIL_WIDTH / max(1.0, region["width"]))
+    r = tab.run_cdp("Page.captureScreenshot", format="png", clip={**region, "scale": scale},
+                    captureBeyondViewport=True, optimizeForSpeed=True)
+    data = base64.b64decode(r["data"])
+    if perceptual:
+        try:
+            return f"d:{dhash(*decode_png_gray(data)):016x}"
+        except Exception:
+            pass
+    return "s:" + hashlib.sha1(data).hexdigest()
+
+
+def hash_distance(a: str, b: str) -> int:
+    """两个哈希的汉明距离，类型不同或内容哈希不同时视为完全不同"""
+    if a[:2] != b[:2]:
+        return 64
+    if a.startswith("d:"):
+        return bin(int(a[2:], 16) ^ int(b[2:], 16)).count("1")
+    return 0 if a == b else 64
+
+
+class ScreenshotCache():
+    """按 capture_id 保存编码后的截图，总大小超过上限时淘汰最久没有使用的截图"""
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self._entries = OrderedDict()
+        # (tab_id, 截图参数) -> 最近一次截图的 capture_id
+        self._latest = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def find_unchanged(self, tab_id: str, key: str, phash: str, max_distance: int = 0) -> dict:
+        """查找该标签页上一次相同参数的截图，画面哈希在阈值之内时返回它，并计为命中"""
+        with self._lock:
+            entry = self._entries.get(self._latest.get((tab_id, key)))
+            if entry is not None and hash_distance(entry["phash"], phash) <= max_distance:
+                self.hits += 1
+                self._entries.move_to_end(entry["capture_id"])
+                return entry
+            self.misses += 1
+            return None
+
+    def put(self, tab_id: str, key: str, phash: str, data: bytes, format: str, info: dict = None) -> dict:
+        """保存截图，返回缓存条目"""
+        with self._lock:
+            capture_id = f"shot-{next(self._ids)}"
+            entry = {"capture_id": capture_id, "tab_id": tab_id, "phash": phash, "format": format,
+                     "data": data, "bytes": len(data), "captured_at": time.time(), **(info or {})}
+            self._entries[capture_id] = entry
+            self._latest[(tab_id, key)] = capture_id
+            self.bytes += len(data)
+            while self.bytes > self.max_bytes and len(self._entries) > 1:
+                _, old = self._entries.popitem(last=False)
+                self.bytes -= old["bytes"]
+                self.evicted += 1
+            return entry
+
+    def get(self, capture_id: str) -> dict:
+        with self._lock:
+            entry = self._entries.get(capture_id)
+            if entry is not None:
+                self._entries.move_to_end(capture_id)
+            return entry
+
+    def forget(self, tab_id: str) -> None:
+        """标签页关闭时删除它的截图"""
+        with self._lock:
+            for capture_id in [k for k, e in self._entries.items() if e["tab_id"] == tab_id]:
+                self.bytes -= self._entries.pop(capture_id)["bytes"]
+            self._latest = {k: v for k, v in self._latest.items() if k[0] != tab_id}
+
+    def list(self) -> list:
+        """返回缓存中截图的信息（不含图片数据），最近使用的在最后"""
+        with self._lock:
+            return [self.describe(e) for e in self._entries.values()]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self.bytes, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses, "evicted": self.evicted}
+
+    @staticmethod
+    def describe(entry: dict) -> dict:
+        return {k: v for k, v in entry.items() if k != "data"}
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python
+
+"""
+标签页CDP事件分发与网络监听器
+
+DrissionPage 的 driver.set_callback 每个事件只能设置一个回调，后设置的会覆盖先设置的。
+TabEventHub 为每个事件只注册一个分发函数，再把事件分发给所有订阅者，
+这样同一个标签页上可以同时运行多个监听器。
+"""
+
+import itertools
+import threading
+from collections import OrderedDict
+
+# 等待 loadingFinished 的请求最多保留的数量，超出时丢弃最早的，避免永远不结束的请求占用内存
+MAX_PENDING_REQUESTS = 10000
+
+
+class TabEventHub():
+    """一个标签页的CDP事件分发器，同一事件可以有多个订阅者"""
+
+    def __init__(self, tab):
+        self.tab = tab
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._tokens = itertools.count(1)
+
+    def subscribe(self, event: str, callback) -> int:
+        """订阅事件，返回用于取消订阅的令牌"""
+        with self._lock:
+            subscribers = self._subscribers.setdefault(event, {})
+            first = not subscribers
+            token = next(self._tokens)
+            subscribers[token] = callback
+        if first:
+            self.tab.driver.set_callback(event, lambda **kwargs: self._dispatch(event, kwargs))
+        return token
+
+    def unsubscribe(self, token: int) -> None:
+        """取消订阅，事件没有订阅者时移除分发函数"""
+        with self._lock:
+            for event, subscribers in self._subscribers.items():
+                if subscribers.pop(token, None) is not None:
+                    break
+            else:
+                return
+            empty = not subscribers
+            if empty:
+                self._subscribers.pop(event)
+        if empty:
+            self.tab.driver.set_callback(event, None)
+
+    def has_subscribers(self, prefix: str = "") -> bool:
+        """是否还有事件名以 prefix 开头的订阅者"""
+        with self._lock:
+            return any(event.startswith(prefix) for event in self._subscribers)
+
+    def _dispatch(self, event: str, kwargs: dict) -> None:
+        with self._lock:
+            callbacks = list(self._subscribers.get(event, {}).values())
+        for callback in callbacks:
+            try:
+                callback(**kwargs)
+            except Exception:
+                # 一个订阅者出错不影响其他订阅者
+                pass
+
+
+class ResponseListener():
+    """
+    命名的网络响应监听器
+
+    在 Network.responseReceived 回调中先用 EventFilter 过滤，匹配的事件才写入缓冲区；
+    有大小条件时等到 Network.loadingFinished 按实际传输大小判断。
+    传入 body_store 时在后台获取匹配响应的响应体。
+    sinks 中的导出器（TrafficExporter）会收到每个匹配的数据包，开启响应体获取时在响应体获取后才收到；
+    有导出器时还记录 Network.requestWillBeSent 中的请求方法、请求头、请求体和开始时间，附在数据包的 request 中。
+    """
+
+    def __init__(self, name: str, hub: TabEventHub, event_filter, buffer, body_store=None):
+        self.name = name
+        self.hub = hub
+        self.filter = event_filter
+        self.buffer = buffer
+        self.body_store = body_store
+        self.matched = 0
+        self.rejected = 0
+        self.sinks = []
+        self.running = False
+        # 本监听器获取过响应体的 (标签页id, requestId)，清空数据时只删除这些响应体
+        self.body_ids = set()
+        self._pending = OrderedDict()
+        self._requests = OrderedDict()
+        self._tokens = []
+
+    @property
+    def tab_id(self) -> str:
+        return self.hub.tab.tab_id
+
+    def start(self) -> None:
+        """开启 Network 域并订阅事件"""
+        if self.body_store is not None:
+            # 加大浏览器的响应体缓冲区，避免响应体在获取之前被清除
+            self.hub.tab.run_cdp("Network.enable", maxTotalBufferSize=200 * 1024 * 1024,
+                                 maxResourceBufferSize=50 * 1024 * 1024)
+        else:
+            self.hub.tab.run_cdp("Network.enable")
+        self.running = True
+        self._tokens.append(self.hub.subscribe("Network.requestWillBeSent", self._on_request))
+        self._tokens.append(self.hub.subscribe("Network.responseReceived", self._on_response))
+        if self.filter.needs_size or self.body_store is not None:
+            self._tokens.append(self.hub.subscribe("Network.loadingFinished", self._on_finished))
+            self._tokens.append(self.hub.subscribe("Network.loadingFailed", self._on_failed))
+
+    def stop(self) -> None:
+        """取消订阅，标签页上没有其他网络监听时关闭 Network 域；缓冲区中的数据保留，仍然可以读取"""
+        self.running = False
+        for token in self._tokens:
+            self.hub.unsubscribe(token)
+        self._tokens.clear()
+        self._pending.clear()
+        self._requests.clear()
+        if not self.hub.has_subscribers("Network."):
+            try:
+                self.hub.tab.run_cdp("Network.disable")
+            except Exception:
+                pass
+
+    def stats(self) -> dict:
+        return {"name": self.name, "tab_id": self.tab_id, "running": self.running, "filter": self.filter.spec,
+                "capture_body": self.body_store is not None, "matched": self.matched,
+                "rejected": self.rejected, "buffer": self.buffer.stats(),
+                "exports": [sink.stats() for sink in self.sinks]}
+
+    def _on_request(self, **event) -> None:
+        # 只有导出时才需要请求信息；重定向时同一个 requestId 会再次发送，保留最后一次
+        if not self.sinks:
+            return
+        request = event.get("request", {})
+        self._requests[event["requestId"]] = {
+            "method": request.get("method", "GET"), "headers": request.get("headers", {}),
+            "postData": request.get("postData"), "wallTime": event.get("wallTime"),
+            "timestamp": event.get("timestamp")}
+        self._requests.move_to_end(event["requestId"])
+        if len(self._requests) > MAX_PENDING_REQUESTS:
+            self._requests.popitem(last=False)
+
+    def _on_response(self, **event) -> None:
+        request = self._requests.pop(event["requestId"], None)
+        if request is not None:
+            event = {**event, "_request": request}
+        if not self.filter.match(event):
+            self.rejected += 1
+            return
+        if self.filter.needs_size:
+            self._park(event["requestId"], event)
+        else:
+            self._accept(event)
+            if self.body_store is not None:
+                self._park(event["requestId"], event)
+
+    def _on_finished(self, **event) -> None:
+        response = self._pending.pop(event["requestId"], None)
+        if response is None:
+            return
+        if self.filter.needs_size:
+            if not self.filter.match_size(event.get("encodedDataLength", 0)):
+                self.rejected += 1
+                return
+            record = self._accept(response, size=event.get("encodedDataLength"))
+        else:
+            record = self._record(response, size=event.get("encodedDataLength"))
+        if self.body_store is not None:
+            # 响应体在 loadingFinished 之后才完整，交给后台线程获取
+            r = response.get("response", {})
+            self.body_ids.add((self.tab_id, event["requestId"]))
+            future = self.body_store.fetch_later(self.hub.tab, event["requestId"],
+                                                 {"url": r.get("url", ""), "mimeType": r.get("mimeType", "")})
+            for sink in self.sinks:
+                sink.write(record, future)
+
+    def _on_failed(self, **event) -> None:
+        self._pending.pop(event["requestId"], None)
+
+    def _park(self, request_id: str, event: dict) -> None:
+        self._pending[request_id] = event
+        if len(self._pending) > MAX_PENDING_REQUESTS:
+            self._pending.popitem(last=False)
+
+    def _record(self, event: dict, size: int = None) -> dict:
+        request = event.get("_request")
+        if request is not None:
+            event = {k: v for k, v in event.items() if k != "_request"}
+        record = {"event_name": "Network.responseReceived", "listener": self.name, "tab_id": self.tab_id,
+                  "event_data": event}
+        if request is not None:
+            record["request"] = request
+        if size is not None:
+            record["size"] = size
+        return record
+
+    def _accept(self, event: dict, size: int = None) -> dict:
+        self.matched += 1
+        record = self._record(event, size)
+        self.buffer.append(record)
+        if self.body_store is None:
+            for sink in self.sinks:
+                sink.write(record)
+        return record
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python
+
+"""
+标签页注册表
+
+缓存按 tab_id 获取的标签页对象，维护当前活动标签页，
+并通过 CDP 的 Target.targetCreated / Target.targetDestroyed 事件更新缓存，
+避免每次操作都用 browser.latest_tab 向浏览器查询标签页列表。
+事件通过注册表自己的 CDP 连接接收，浏览器重连(browser.reconnect)重新设置它的回调时不受影响。
+标签页关闭的回调交给绑定浏览器时的事件循环执行，回调中可以直接修改只在事件循环中使用的状态。
+"""
+
+import asyncio
+import threading
+
+from DrissionPage._base.driver import Driver
+
+
+class TabRegistry():
+    """缓存标签页对象并维护活动标签页指针"""
+
+    def __init__(self):
+        self.browser = None
+        self.active_id = None
+        self._tabs = {}
+        self._lock = threading.RLock()
+        self._close_callbacks = []
+        self._driver = None
+        self._loop = None
+
+    def attach(self, browser) -> None:
+        """
+        绑定浏览器对象，清空缓存并以浏览器最新的标签页作为活动标签页。
+
+        注册表为 Target 事件单独建立一个到浏览器的 CDP 连接（与 DrissionPage 的 Listener 相同的做法），
+        不占用也不替换浏览器自己的事件回调。
+        """
+        self.detach()
+        try:
+            self._loop = asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        with self._lock:
+            self.browser = browser
+            self._tabs.clear()
+            self.active_id = None
+        self._listen()
+        self.activate(browser.latest_tab)
+
+    def detach(self) -> None:
+        """关闭注册表的 CDP 连接"""
+        driver, self._driver = self._driver, None
+        if driver is not None:
+            driver.owner = None
+            driver.stop()
+
+    def _listen(self) -> None:
+        # Driver 是 DrissionPage 的 Listener 使用的 CDP 连接类；连接地址由浏览器的公开属性拼出，
+        # 只在只有 websocket 地址的连接方式下才使用内部属性
+        if self.browser.address:
+            ws_address = f"ws://{self.browser.address}/devtools/browser/{self.browser.id}"
+        else:
+            ws_address = self.browser._ws_address
+        driver = Driver(self.browser.id, ws_address, owner=self)
+        driver.set_callback("Target.targetCreated", self._on_target_created)
+        driver.set_callback("Target.targetDestroyed", self._on_target_destroyed)
+        driver.run("Target.setDiscoverTargets", discover=True)
+        self._driver = driver
+
+    def _on_disconnect(self) -> None:
+        """注册表的连接断开（浏览器重启等）时由 Driver 调用，下次 get 时重新连接"""
+        self._driver = None
+
+    def on_close(self, callback) -> None:
+        """注册标签页关闭时的回调，回调参数为 tab_id；绑定浏览器时在事件循环中的，回调在该事件循环中执行"""
+        self._close_callbacks.append(callback)
+
+    def get(self, tab_id: str = ""):
+        """
+        获取标签页对象。
+
+        参数:
+            tab_id (str): 标签页id，为空时返回活动标签页
+
+        返回:
+            ChromiumTab: 标签页对象
+        """
+        if self._driver is None and self.browser is not None:
+            # 连接断开期间可能错过了关闭事件，重新连接并清空缓存
+            try:
+                self._listen()
+            except Exception:
+                pass
+            else:
+                with self._lock:
+                    self._tabs.clear()
+        with self._lock:
+            tab_id = tab_id or self.active_id
+            if tab_id and tab_id in self._tabs:
+                return self._tabs[tab_id]
+        if tab_id:
+            tab = self.browser.get_tab(tab_id)
+        else:
+            # 活动标签页已关闭，回退到浏览器最新的标签页
+            tab = self.browser.latest_tab
+        with self._lock:
+            self._tabs[tab.tab_id] = tab
+            if not self.active_id:
+                self.active_id = tab.tab_id
+        return tab
+
+    def activate(self, tab):
+        """把标签页对象（或tab_id）设为活动标签页，返回标签页对象"""
+        if isinstance(tab, str):
+            tab = self.get(tab)
+        with self._lock:
+            self._tabs[tab.tab_id] = tab
+            self.active_id = tab.tab_id
+        return tab
+
+    def new_tab(self, url: str = None, activate: bool = True, browser=None, **kwargs):
+        """
+        新建标签页并缓存，activate 为True时设为活动标签页。
+
+        browser 可以指定浏览器池中的其他浏览器，默认为绑定的浏览器；
+        其他浏览器的标签页关闭时不会收到事件，需要调用 forget 清理。
+        """
+        tab = (browser or self.browser).new_tab(url, **kwargs)
+        with self._lock:
+            self._tabs[tab.tab_id] = tab
+            if activate:
+                self.active_id = tab.tab_id
+        return tab
+
+    def tabs(self) -> list:
+        """返回已缓存的标签页信息列表"""
+        with self._lock:
+            tabs = list(self._tabs.values())
+            active_id = self.active_id
+        return [{"tab_id": t.tab_id, "url": t.url, "title": t.title, "active": t.tab_id == active_id} for t in tabs]
+
+    def forget(self, tab_id: str) -> None:
+        """从缓存中删除标签页，并通知关闭回调（可以在任意线程中调用，包括 CDP 连接的事件线程）"""
+        with self._lock:
+            self._tabs.pop(tab_id, None)
+            if self.active_id == tab_id:
+                self.active_id = None
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            self._notify_closed(tab_id)
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._notify_closed(tab_id)
+        else:
+            try:
+                loop.call_soon_threadsafe(self._notify_closed, tab_id)
+            except RuntimeError:
+                # 事件循环已关闭
+                self._notify_closed(tab_id)
+
+    def _notify_closed(self, tab_id: str) -> None:
+        for callback in self._close_callbacks:
+            callback(tab_id)
+
+    def _on_target_created(self, **kwargs) -> None:
+        info = kwargs["targetInfo"]
+        if info["type"] not in ("page", "webview") or info["url"].startswith("devtools://"):
+            return
+        # 页面内打开的新标签页（target=_blank、window.open）成为活动标签页，与 latest_tab 的行为一致；
+        # 通过 new_tab 创建的标签页没有 openerId，由 new_tab 自己决定是否激活
+        if info.get("openerId"):
+            with self._lock:
+                self.active_id = info["targetId"]
+
+    def _on_target_destroyed(self, **kwargs) -> None:
+        self.forget(kwargs["targetId"])
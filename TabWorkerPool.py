@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python
+
+"""
+浏览器操作线程池
+
+DrissionPage 的调用都是阻塞的，直接在事件循环里执行会让一个慢页面卡住所有 MCP 请求。
+这里把阻塞调用放到有上限的线程池执行：同一个标签页的操作按顺序串行，不同标签页之间并行。
+"""
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+
+class TabWorkerPool():
+    """按标签页串行、跨标签页并行地执行阻塞的浏览器操作"""
+
+    def __init__(self, max_workers: int = 8):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="DrissionPageMCP")
+        # 串行锁放在事件循环里等待，排队的操作不会占用线程池的线程
+        self._locks = {}
+
+    async def run(self, key, func, *args, **kwargs):
+        """
+        在线程池中执行 func(*args, **kwargs) 并等待结果。
+
+        参数:
+            key: 串行化的键（通常是 tab_id），相同键的操作依次执行；为空时不做串行
+            func: 阻塞函数
+        """
+        loop = asyncio.get_running_loop()
+        call = functools.partial(func, *args, **kwargs)
+        if not key:
+            return await loop.run_in_executor(self._executor, call)
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            return await loop.run_in_executor(self._executor, call)
+
+    def wrap(self, func, key=None):
+        """
+        把同步函数包装成在线程池中执行的异步函数，保留原函数的签名和文档，便于注册为 MCP 工具。
+
+        参数:
+            func: 同步函数
+            key: 根据调用参数计算串行化键的函数，签名为 key(**kwargs)
+        """
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            return await self.run(key(**kwargs) if key else None, func, *args, **kwargs)
+        return wrapper
+
+    def forget(self, key) -> None:
+        """删除键对应的串行锁（标签页关闭时调用）"""
+        lock = self._locks.get(key)
+        if lock is not None and not lock.locked():
+            self._locks.pop(key, None)
+
+    def shutdown(self) -> None:
+        """关闭线程池"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python
+
+"""
+文本提取
+
+在页面内用一次 run_js 取出可见文本并返回，不需要把整个 tab.html 传回 Python 再解析；
+按文本条件查找元素也在页面内一次完成，只返回匹配元素的句柄和文本。
+正文模式去掉导航、页眉页脚等样板内容；长文本按字符或估算的 token 数分块，块 id 由内容决定，
+页面不变时多次分块得到相同的 id。
+离线的 HTML（保存的网页、SessionPage 取到的源码）用 lxml 提取，lxml 是可选依赖。
+"""
+
+import hashlib
+import json
+import re
+
+from CodeBox import findByText, pageVersion, readableText, visibleText
+
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+# 不包含可见文本的标签
+_SKIP_TAGS = {"script", "style", "noscript", "template", "head", "meta", "link", "svg", "iframe"}
+# 块级标签前后换行，与浏览器 innerText 的行为一致
+_BLOCK_TAGS = {
+    "address", "article", "aside", "blockquote", "br", "dd", "details", "div", "dl", "dt", "fieldset",
+    "figcaption", "figure", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "li",
+    "main", "nav", "ol", "p", "pre", "section", "summary", "table", "tr", "ul", "option", "label",
+}
+_HIDDEN_STYLE = re.compile(r"display\s*:\s*none|visibility\s*:\s*hidden", re.I)
+
+
+def normalize_text(text: str) -> str:
+    """去掉每行首尾空白和空行，行内连续空白合并为一个空格"""
+    lines = (re.sub(r"[ \t\u00a0\u3000]+", " ", line).strip() for line in text.splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def page_text(tab, xpath: str = "", selector: str = "", max_chars: int = 0) -> dict:
+    """
+    在页面内提取可见文本，块级元素之间保留换行。
+
+    参数:
+        xpath (str): 只提取xpath指定的元素
+        selector (str): 只提取CSS选择器指定的元素
+        max_chars (int): 最多返回的字符数，0表示不限制
+
+    返回:
+        dict: text 文本，length 截断前的长度，truncated 是否被截断；根元素不存在时返回 None
+    """
+    options = {"root_xpath": xpath, "root_selector": selector, "max_chars": max_chars}
+    return json.loads(tab.run_js(visibleText, options))
+
+
+def readable_text(tab, max_chars: int = 0) -> dict:
+    """
+    在页面内提取正文，去掉导航、页眉页脚、侧栏、表单和链接占比高的块，标题行以 # 开头。
+
+    返回:
+        dict: title 页面标题，text 正文，length 截断前的长度，truncated 是否被截断
+    """
+    return json.loads(tab.run_js(readableText, {"max_chars": max_chars}))
+
+
+def page_version(tab) -> str:
+    """页面内容的版本号，不读取文本，DOM 变化或文档导航后改变，用于判断缓存的文本是否仍然有效"""
+    return tab.run_js(pageVersion)
+
+
+_CJK = re.compile(r"[\u3000-\u9fff\uac00-\ud7af\uff00-\uffef]")
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数：中日韩字符每个约 1 个 token，其他字符约 4 个一个"""
+    cjk = len(_CJK.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def chunk_text(text: str, max_chars: int = 0, max_tokens: int = 0) -> list:
+    """
+    按段落把文本分块，每块不超过 max_chars 个字符和约 max_tokens 个 token，超长的段落会被切开。
+    块内的段落之间用换行连接；continued 为True的块从上一块的段落中间接着开始，拼接时不加换行，
+    其余的块与上一块之间加一个换行，拼接后与原文相同。
+
+    返回:
+        list: [{"id": 序号和内容的哈希, "index": 序号, "text": 文本, "chars": 字符数, "approx_tokens": 估算的token数,
+                "continued": 是否从段落中间开始}]
+    """
+    def fits(chunk: str) -> bool:
+        return (not max_chars or len(chunk) <= max_chars) and (not max_tokens or estimate_tokens(chunk) <= max_tokens)
+
+    paragraphs = text.split("\n")
+    # 文本末尾的换行不单独成为一个空段落
+    if len(paragraphs) > 1 and not paragraphs[-1]:
+        paragraphs.pop()
+    # (文本, 是否从段落中间开始)
+    pieces = []
+    for paragraph in paragraphs:
+        continued = False
+        # 超长段落按预算切开；token 预算先按这一段每个 token 的平均字符数换算成字符数，再逐步缩短
+        while not fits(paragraph):
+            size = max_chars or len(paragraph)
+            if max_tokens:
+                size = min(size, max_tokens * len(paragraph) // estimate_tokens(paragraph))
+            size = max(1, size)
+            while size > 1 and not fits(paragraph[:size]):
+                size = size * 3 // 4
+            pieces.append((paragraph[:size], continued))
+            paragraph = paragraph[size:]
+            continued = True
+        pieces.append((paragraph, continued))
+
+    chunks, current, current_continued = [], None, False
+    for piece, continued in pieces:
+        if current is not None:
+            candidate = current + ("" if continued else "\n") + piece
+            if fits(candidate):
+                current = candidate
+                continue
+            chunks.append((current, current_continued))
+        current, current_continued = piece, continued
+    chunks.append((current or "", current_continued))
+    return [{"id": hashlib.sha1(f"{i}:{c}".encode("utf-8")).hexdigest()[:12], "index": i, "text": c,
+             "chars": len(c), "approx_tokens": estimate_tokens(c), "continued": continued}
+            for i, (c, continued) in enumerate(chunks)]
+
+
+def find_by_text(tab, rules: list = None, tags: list = None, visible_only: bool = True, innermost: bool = True,
+                 max_results: int = 100, max_text: int = 200, xpath: str = "", selector: str = "",
+                 **rule) -> dict:
+    """
+    按文本条件查找元素，一次 run_js 完成，与元素数量无关。
+
+    参数:
+        rules (list): 条件列表，满足任意一条即匹配，每条条件是包含下列键的字典
+        **rule: 只有一条条件时直接传入 starts_with / contains_any / contains_all / regex / flags
+        tags (list): 只检查这些标签
+        visible_only (bool): 只返回可见元素
+        innermost (bool): 只返回最内层的匹配元素
+        xpath / selector: 在指定元素内查找
+
+    返回:
+        dict: matches 为 [{"handle": "li@12", "text": ...}]，句柄可用于 css:[data-dp-id="12"] 定位，
+              scanned 检查的元素数，truncated 是否超出 max_results；根元素不存在时有 _error
+    """
+    options = {"rules": list(rules or []) + ([rule] if rule else []), "tags": list(tags or []),
+               "visible_only": visible_only, "innermost": innermost, "max_results": max_results,
+               "max_text": max_text, "root_xpath": xpath, "root_selector": selector}
+    return json.loads(tab.run_js(findByText, options))
+
+
+def html_to_text(html: str) -> str:
+    """
+    从离线 HTML 中提取可见文本，跳过 script/style 和行内样式隐藏的元素，块级元素之间保留换行。
+    需要安装 lxml: pip install lxml
+    """
+    if lxml is None:
+        raise ImportError("提取离线HTML的文本需要安装lxml: pip install lxml")
+    root = lxml.html.fromstring(html)
+    parts = []
+
+    def walk(element):
+        tag = element.tag if isinstance(element.tag, str) else ""
+        if (not tag or tag in _SKIP_TAGS or element.get("hidden") is not None
+                or _HIDDEN_STYLE.search(element.get("style", ""))):
+            # 注释、处理指令和隐藏元素只保留其后的文本
+            if element.tail:
+                parts.append(element.tail)
+            return
+        block = tag in _BLOCK_TAGS
+        if block:
+            parts.append("\n")
+        if element.text:
+            parts.append(element.text)
+        for child in element:
+            walk(child)
+        if block:
+            parts.append("\n")
+        if element.tail:
+            parts.append(element.tail)
+
+    walk(root)
+    # 源码中的换行不是可见的换行，先合并为空格，再按块级元素换行
+    text = "".join(re.sub(r"\s*\n\s*", " ", p) if p != "\n" else p for p in parts)
+    return normalize_text(text)
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python
+
+"""
+网络数据包的流式导出
+
+监听器匹配到的数据包放入队列，由后台线程逐条写入 NDJSON 或 HAR 文件，
+文件超过大小上限时轮转到新文件，长时间抓包也不需要把数据都留在内存中。
+开启了响应体获取时，等响应体获取完成后再写入，响应体从 ResponseBodyStore 中读取。
+"""
+
+import json
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+# 写入队列的最大长度，超出时丢弃新数据包并计数，避免磁盘太慢时占满内存
+MAX_QUEUE_SIZE = 10000
+# 等待后台获取响应体的最长时间（秒）
+BODY_WAIT_TIMEOUT = 30
+
+
+def _iso_time(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def _har_headers(headers: dict) -> list:
+    return [{"name": str(k), "value": str(v)} for k, v in (headers or {}).items()]
+
+
+def har_entry(record: dict, body: dict = None, started: float = None) -> dict:
+    """
+    把 Network.responseReceived 记录转换为 HAR 1.2 的 entry。
+
+    请求方法、请求头、请求体和开始时间来自监听器记录的 Network.requestWillBeSent（record["request"]），
+    没有记录时退回为 GET 和放入队列的时间 started。
+    """
+    event = record.get("event_data", {})
+    response = event.get("response", {})
+    request = record.get("request") or {}
+    timing = response.get("timing") or {}
+    # timing 中的时间是相对 requestTime 的毫秒数，-1 表示没有这个阶段
+    wait = max(0.0, timing.get("receiveHeadersEnd", 0) - max(0, timing.get("sendEnd", 0)))
+    url = response.get("url", "")
+    query = url.split("?", 1)[1].split("#", 1)[0] if "?" in url else ""
+    content = {"size": record.get("size") or response.get("encodedDataLength", 0),
+               "mimeType": response.get("mimeType", "")}
+    if body:
+        content["size"] = body["size"]
+        content["text"] = body["data"]
+        if body["encoding"] == "base64":
+            content["encoding"] = "base64"
+        if body.get("next_offset") is not None:
+            content["comment"] = "truncated"
+    request_body = {}
+    if request.get("postData") is not None:
+        request_headers = {k.lower(): v for k, v in (request.get("headers") or {}).items()}
+        request_body = {"postData": {"mimeType": request_headers.get("content-type", ""),
+                                     "text": request["postData"]}}
+    return {
+        "startedDateTime": _iso_time(request.get("wallTime") or started or time.time()),
+        "time": wait,
+        "request": {
+            "method": request.get("method", "GET"),
+            "url": url,
+            "httpVersion": response.get("protocol", ""),
+            "headers": _har_headers(response.get("requestHeaders") or request.get("headers")),
+            "queryString": [{"name": k, "value": v} for k, _, v in
+                            (p.partition("=") for p in query.split("&") if p)],
+            "cookies": [],
+            "headersSize": -1,
+            "bodySize": len(request["postData"].encode("utf-8")) if request.get("postData") is not None else -1,
+            **request_body,
+        },
+        "response": {
+            "status": response.get("status", 0),
+            "statusText": response.get("statusText", ""),
+            "httpVersion": response.get("protocol", ""),
+            "headers": _har_headers(response.get("headers")),
+            "cookies": [],
+            "content": content,
+            "redirectURL": (response.get("headers") or {}).get("location", ""),
+            "headersSize": -1,
+            "bodySize": record.get("size", -1),
+        },
+        "cache": {},
+        "timings": {"send": 0, "wait": wait, "receive": 0},
+        "serverIPAddress": response.get("remoteIPAddress", ""),
+        "_requestId": event.get("requestId", ""),
+        "_resourceType": event.get("type", ""),
+        "_listener": record.get("listener", ""),
+    }
+
+
+class TrafficExporter():
+    """
+    在后台线程中把数据包流式写入 NDJSON 或 HAR 文件，按大小轮转
+
+    NDJSON 每行一个数据包；HAR 文件在写入第一条时写入文件头，轮转或关闭时补全结尾，
+    每个轮转出的文件都是完整的 HAR。
+    """
+
+    def __init__(self, directory: str, name: str = "traffic", format: str = "ndjson",
+                 max_file_bytes: int = 100 * 1024 * 1024, max_files: int = 0,
+                 body_store=None, max_body_bytes: int = 1024 * 1024):
+        if format not in ("ndjson", "har"):
+            raise ValueError(f"不支持的导出格式: {format}")
+        self.directory = Path(directory)
+        self.name = name
+        self.format = format
+        self.max_file_bytes = max_file_bytes
+        self.max_files = max_files
+        self.body_store = body_store
+        self.max_body_bytes = max_body_bytes
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+        self.files = []
+        self._file_count = 0
+        self._file = None
+        self._file_bytes = 0
+        self._file_entries = 0
+        self._queue = queue.Queue(MAX_QUEUE_SIZE)
+        self._thread = threading.Thread(target=self._run, name=f"DrissionPageMCP-export-{name}", daemon=True)
+        self._thread.start()
+
+    def write(self, record: dict, body_future=None) -> None:
+        """
+        放入一个数据包，在CDP事件回调中调用，不等待磁盘写入。
+
+        body_future 为后台获取响应体的任务，写入前等它完成，再从 body_store 读取响应体。
+        """
+        try:
+            self._queue.put_nowait((record, body_future, time.time()))
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self) -> None:
+        """写完队列中剩余的数据包，补全文件结尾并关闭文件"""
+        self._queue.put(None)
+        self._thread.join()
+
+    def stats(self) -> dict:
+        return {"name": self.name, "format": self.format, "directory": str(self.directory),
+                "written": self.written, "queued": self._queue.qsize(), "dropped": self.dropped,
+                "errors": self.errors, "files": [str(f) for f in self.files]}
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            try:
+                self._write_one(*item)
+            except Exception:
+                self.errors += 1
+        self._close_file()
+
+    def _write_one(self, record: dict, body_future, started: float) -> None:
+        body = None
+        if body_future is not None and self.body_store is not None:
+            try:
+                body_future.result(timeout=BODY_WAIT_TIMEOUT)
+            except Exception:
+                pass
+            request_id = record.get("event_data", {}).get("requestId", "")
+            body = self.body_store.get(request_id, 0, self.max_body_bytes, tab_id=record.get("tab_id", ""))
+
+        if self.format == "har":
+            line = json.dumps(har_entry(record, body, started), ensure_ascii=False)
+        else:
+            if body:
+                record = {**record, "body": {k: body[k] for k in ("size", "encoding", "data", "sha256")},
+                          "body_truncated": body.get("next_offset") is not None}
+            line = json.dumps(record, ensure_ascii=False)
+        data = line.encode("utf-8")
+
+        if self._file is None or (self._file_entries and self._file_bytes + len(data) > self.max_file_bytes):
+            self._rotate()
+        if self.format == "har" and self._file_entries:
+            data = b",\n" + data
+        elif self.format == "ndjson":
+            data += b"\n"
+        self._file.write(data)
+        self._file.flush()
+        self._file_bytes += len(data)
+        self._file_entries += 1
+        self.written += 1
+
+    def _rotate(self) -> None:
+        self._close_file()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._file_count += 1
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        path = self.directory / f"{self.name}-{stamp}-{self._file_count:04d}.{self.format}"
+        self._file = open(path, "wb")
+        self._file_bytes = self._file_entries = 0
+        if self.format == "har":
+            header = {"version": "1.2", "creator": {"name": "DrissionPageMCP", "version": "1.0"}}
+            self._file_bytes = self._file.write(json.dumps({"log": header})[:-2].encode() + b', "entries": [\n')
+        self.files.append(path)
+        if self.max_files and len(self.files) > self.max_files:
+            self.files.pop(0).unlink(missing_ok=True)
+
+    def _close_file(self) -> None:
+        if self._file is None:
+            return
+        if self.format == "har":
+            self._file.write(b"\n]}}\n")
+        self._file.close()
+        self._file = None
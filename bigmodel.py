@@ -10,6 +10,11 @@ import base64
 from pathlib import Path
 import os
 
+from PageWait import wait_for
+from TextExtract import find_by_text, page_text
+from LLMDispatcher import dispatch
+from LLMStream import CHOICE_ANSWER, REASONING_CHOICE_ANSWER
+
 # 尝试导入DrissionPage，如果没有则提示安装
 try:
     from DrissionPage import ChromiumOptions, Chromium
@@ -68,10 +73,10 @@ async def wait_for_page_load(tab, timeout=10):
     """等待页面加载完成"""
     print("3. 等待页面加载...")
     try:
-        # 等待页面加载完成
-        await asyncio.sleep(timeout)
-        print("   页面加载完成")
-        return True
+        # 等待网络空闲，页面加载完成时立即返回，最多等待 timeout 秒
+        result = await asyncio.to_thread(wait_for, tab, "network_idle", timeout=timeout)
+        print(f"   页面加载{'完成' if result['ok'] else '超时'}，等待了 {result['waited_ms']} 毫秒")
+        return result["ok"]
     except Exception as e:
         print(f"   等待页面加载时出错: {e}")
         return False
@@ -95,20 +100,8 @@ async def extract_text_content(tab):
     """提取页面文字内容"""
     print("5. 正在提取题目文字内容...")
     try:
-        # 获取页面文本内容
-        text_content = tab.html
-        # 简化内容，只保留文本
-        from bs4 import BeautifulSoup
-        soup = BeautifulSoup(text_content, 'html.parser')
-        # 移除script和style标签
-        for script in soup(["script", "style"]):
-            script.decompose()
-        # 获取纯文本
-        text = soup.get_text()
-        # 清理文本
-        lines = (line.strip() for line in text.splitlines())
-        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-        text = ' '.join(chunk for chunk in chunks if chunk)
+        # 在页面内提取可见文本，不需要传回整个HTML再解析
+        text = page_text(tab)["text"]
         
         print("   提取的题目内容:")
         # 只显示前1000个字符
@@ -126,41 +119,18 @@ async def extract_question_and_options(tab):
         # 提取题目信息
         question_info = {}
         
-        # 使用和test_current_page.py相同的完整页面提取方法
-        # 获取页面HTML
-        html_content = tab.html
-        
-        # 使用BeautifulSoup解析HTML
-        from bs4 import BeautifulSoup
-        soup = BeautifulSoup(html_content, 'html.parser')
-        
-        # 移除script和style标签
-        for script in soup(["script", "style"]):
-            script.decompose()
-        
-        # 获取纯文本
-        text = soup.get_text()
-        
-        # 清理文本
-        lines = (line.strip() for line in text.splitlines())
-        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-        clean_text = ' '.join(chunk for chunk in chunks if chunk)
+        # 在页面内提取可见文本，块级元素之间保留换行
+        clean_text = page_text(tab)["text"]
         
         # 保存完整的题目内容
         question_info['question'] = clean_text
         
-        # 查找选项
-        options = []
-        # 查找所有可能的选项元素
-        option_elements = tab.eles('t:*')
-        for element in option_elements:
-            text = element.text.strip()
-            # 检查是否为A选项（正确/正确答案等）
-            if text.startswith('A') and ('正确' in text or '对' in text):
-                options.append({'text': text, 'element': element})
-            # 检查是否为B选项（错误/错误答案等）
-            elif text.startswith('B') and ('错误' in text or '错' in text):
-                options.append({'text': text, 'element': element})
+        # 查找选项：在页面内一次检查所有元素，只返回匹配的元素
+        # A选项（正确/正确答案等），B选项（错误/错误答案等）
+        found = find_by_text(tab, rules=[{'starts_with': 'A', 'contains_any': ['正确', '对']},
+                                         {'starts_with': 'B', 'contains_any': ['错误', '错']}])
+        # handle 可用 tab.ele(f'css:[data-dp-id="{handle.split("@")[-1]}"]') 定位元素
+        options = [{'text': m['text'], 'handle': m['handle']} for m in found['matches']]
         
         question_info['options'] = options
         
@@ -174,14 +144,10 @@ async def extract_question_and_options(tab):
         return None
 
 
-def call_bigmodel_api(question_text):
+async def call_bigmodel_api(question_text):
     """调用智谱AI BigModel API解答问题"""
     print("6. 正在使用智谱AI解答问题...")
     try:
-        # 配置智谱AI BigModel API
-        api_key = "58c16dcd18a243788f32cafa7928d64f.Cglq3ehd3s7agRBe"
-        client = ZhipuAiClient(api_key=api_key)
-        
         # 构造提示词 - 使用更简洁的格式
         prompt = f"""
 题目：{question_text}
@@ -189,7 +155,8 @@ def call_bigmodel_api(question_text):
         """
         
         # 调用智谱AI API - 尝试使用不同的模型或参数
-        response = client.chat.completions.create(
+        message = await dispatch(
+            "bigmodel",  # 智谱AI BigModel，客户端在多次调用之间复用
             model="glm-4.6",
             messages=[
                 {
@@ -202,19 +169,23 @@ def call_bigmodel_api(question_text):
                 }
             ],
             temperature=0.1,
-            max_tokens=100  # 增加token数量，让模型有更多空间返回答案
+            max_tokens=100,  # 增加token数量，让模型有更多空间返回答案
+            # 流式接收，回答中出现选项字母或推理过程中给出答案后立即结束
+            answer_pattern=CHOICE_ANSWER,
+            reasoning_pattern=REASONING_CHOICE_ANSWER
         )
         
-        # 获取回答 - 优先使用content字段，因为reasoning_content包含推理过程
-        message = response.choices[0].message
-        
-        # 优先使用content字段，因为它应该包含直接答案
-        if message.content and message.content.strip():
-            answer = message.content.strip()
+        # 获取回答 - 优先使用流式接收时匹配到的答案
+        if message['answer']:
+            answer = message['answer']
+            print(f"\n智谱AI {message['answer_source']}字段回答: {answer}")
+        # 其次使用content字段，因为reasoning_content包含推理过程
+        elif message['content'].strip():
+            answer = message['content'].strip()
             print(f"\n智谱AI content字段回答: {answer}")
         # 如果content为空，再尝试使用reasoning_content
-        elif hasattr(message, 'reasoning_content') and message.reasoning_content:
-            answer = message.reasoning_content.strip()
+        elif message['reasoning_content']:
+            answer = message['reasoning_content'].strip()
             print(f"\n智谱AI reasoning_content字段回答: {answer}")
         else:
             answer = ""
@@ -294,8 +265,8 @@ async def auto_solve_exam(browser, tab):
         else:
             input(f"请按回车键开始识别第 {question_count} 题...")
         
-        # 等待页面加载
-        await asyncio.sleep(3)
+        # 等待页面加载，最多 3 秒
+        await asyncio.to_thread(wait_for, tab, "network_idle", timeout=3)
         
         # 提取题目和选项
         question_info = await extract_question_and_options(tab)
@@ -308,7 +279,7 @@ async def auto_solve_exam(browser, tab):
         # 调用智谱AI解答问题
         question_text = question_info.get('question', '')
         print("正在调用智谱AI解答问题...")
-        ai_answer, ai_explanation = call_bigmodel_api(question_text)
+        ai_answer, ai_explanation = await call_bigmodel_api(question_text)
         if ai_answer:
             print(f"智谱AI答案: {ai_answer}")
         else:
@@ -402,10 +373,9 @@ if __name__ == "__main__":
     try:
         import DrissionPage
         from zai import ZhipuAiClient
-        import bs4
     except ImportError as e:
         print("正在安装必要的依赖包...")
-        os.system("uv pip install DrissionPage zai-sdk beautifulsoup4")
+        os.system("uv pip install DrissionPage zai-sdk")
     
     # 运行主程序
     asyncio.run(main())
\ No newline at end of file
@@ -14,6 +14,7 @@ import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from main import DrissionPageMCP
+from LLMClients import complete
 
 def install_openai_package():
     """安装openai包（如果尚未安装）"""
@@ -36,14 +37,6 @@ def get_model_answer_with_modelscope(question_text):
         return "无法安装openai包，请手动安装：pip install openai"
     
     try:
-        from openai import OpenAI
-        
-        # 配置魔搭ModelScope API
-        client = OpenAI(
-            base_url='https://api-inference.modelscope.cn/v1',
-            api_key='ms-0f3fca09-39fd-4b3b-84b8-74243108fe9e'  # 使用您提供的API密钥
-        )
-        
         # 构造消息
         messages = [
             {
@@ -57,7 +50,9 @@ def get_model_answer_with_modelscope(question_text):
         ]
         
         # 调用API
-        response = client.chat.completions.create(
+        # 魔搭ModelScope的客户端在多次调用之间复用
+        response = complete(
+            'modelscope',
             model='Qwen/Qwen3-Coder-30B-A3B-Instruct',  # 使用指定的模型
             messages=messages,
             stream=False,
@@ -66,7 +61,7 @@ def get_model_answer_with_modelscope(question_text):
         )
         
         # 提取回答
-        answer = response.choices[0].message.content
+        answer = response['content']
         return answer
         
     except Exception as e:
@@ -1,67 +1,141 @@
+const HANDLE_ATTR = 'data-dp-id';
+
+const INVISIBLE_TAGS = new Set(['script', 'style', 'meta', 'link', 'template', 'noscript']);
+
 function isVisuallyHidden(node) {
-  if (!(node instanceof Element)) return true;
+  if (INVISIBLE_TAGS.has(node.nodeName.toLowerCase())) return true;
 
-  const invisibleTags = ['script', 'style', 'meta', 'link', 'template', 'noscript'];
-  const tagName = node.nodeName.toLowerCase();
+  if (node.checkVisibility) {
+    if (!node.checkVisibility({ opacityProperty: true, visibilityProperty: true })) return true;
+  } else {
+    const style = getComputedStyle(node);
+    if (style.display === 'none' || style.visibility === 'hidden' || style.opacity === '0') return true;
+  }
 
-  if (invisibleTags.includes(tagName)) return true;
+  return node.offsetWidth === 0 && node.offsetHeight === 0;
+}
 
-  const style = getComputedStyle(node);
-  const hiddenByStyle = (
-    style.display === 'none' ||
-    style.visibility === 'hidden' ||
-    style.opacity === '0'
-  );
+// 只读取足够判断预览长度的文本，避免 textContent 对整棵子树做拼接
+function leafText(node, limit) {
+  const walker = document.createTreeWalker(node, NodeFilter.SHOW_TEXT);
+  let text = '';
+  while (walker.nextNode()) {
+    text = (text + walker.currentNode.nodeValue.slice(0, 256)).replace(/\s+/g, ' ').trimStart();
+    if (text.trimEnd().length > limit) break;
+  }
+  return text.trimEnd();
+}
 
-  const hasNoSize = node.offsetWidth === 0 && node.offsetHeight === 0;
+function nodeName(node) {
+  let name = node.nodeName.toLowerCase();
+  if (node.id) name += `#${node.id}`;
+  if (typeof node.className === 'string') {
+    const classList = node.className.trim().split(/\s+/).join('.');
+    if (classList) name += `.${classList}`;
+  }
+  return name;
+}
 
-  return hiddenByStyle || hasNoSize;
+function nodeLabel(node, textLength) {
+  const text = leafText(node, textLength);
+  const content = text ? ` content='${text.slice(0, textLength)}${text.length > textLength ? "…" : ""}'` : '';
+  return `${nodeName(node)}/` + content;
 }
 
-function domTreeToJson(node = document.body, tagCounters = {}) {
-  const getNodeLabel = (node) => {
-    let name = node.nodeName.toLowerCase();
-    if (node.id) name += `#${node.id}`;
-    if (node.className && typeof node.className === 'string') {
-      const classList = node.className.trim().split(/\s+/).join('.');
-      if (classList) name += `.${classList}`;
-    }
-    const text = node.textContent?.trim().replace(/\s+/g, ' ') || '';
-    const content = text ? ` content='${text.slice(0, 5)}${text.length > 5 ? "…" : ""}'` : '';
-    return `${name}/` + content;
-  };
+function inViewport(node) {
+  const rect = node.getBoundingClientRect();
+  return rect.bottom > 0 && rect.right > 0 && rect.top < innerHeight && rect.left < innerWidth;
+}
 
-  if (isVisuallyHidden(node)) {
-    return {}; // 过滤不可见节点
+function resolveRoot(options) {
+  if (options.root_xpath) {
+    return document.evaluate(options.root_xpath, document, null,
+      XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
   }
+  if (options.root_selector) return document.querySelector(options.root_selector);
+  return document.body;
+}
 
-  const tagName = node.nodeName.toLowerCase();
-  tagCounters[tagName] = (tagCounters[tagName] || 0);
-  const nodeKey = `${tagName}${tagCounters[tagName]++}`;
+function buildDomJsonTree(root = document.body, options = {}) {
+  if (!root) return { _error: 'root_not_found' };
+  const maxDepth = options.max_depth || Infinity;
+  const viewportOnly = !!options.only_in_viewport;
+  const maxNodes = options.max_nodes || Infinity;
+  const maxChars = options.max_chars || Infinity;
+  const deadline = performance.now() + (options.time_budget_ms || Infinity);
+  const textLength = options.text_length || 5;
 
-  const children = Array.from(node.children)
-    .map(child => domTreeToJson(child, tagCounters))
-    .filter(childJson => Object.keys(childJson).length > 0); // 去掉空节点
+  const top = {};
+  const result = { [root.nodeName.toLowerCase()]: top };
+  if (isVisuallyHidden(root) || (viewportOnly && !inViewport(root))) return result;
 
-  if (children.length === 0) {
-    return { [nodeKey]: getNodeLabel(node) };
-  } else {
-    const childJson = {};
-    children.forEach(child => Object.assign(childJson, child));
-    return { [nodeKey]: childJson };
+  const withHandles = options.with_handles !== false;
+  const newHandles = [];
+  const seenHandles = new Set();
+  const tagCounters = {};
+  const containers = new Map();  // 元素 -> 它的子节点对象
+  const depths = new Map([[root, 0]]);
+  const hasChildren = new Set();
+  const entries = [];
+  let chars = 0;
+  let truncated = null;
+
+  const walker = document.createTreeWalker(root, NodeFilter.SHOW_ELEMENT, {
+    // 超出深度、不可见或不在视口内的节点整棵子树跳过，不再访问其后代
+    acceptNode: (node) => {
+      const depth = depths.get(node.parentElement) + 1;
+      if (depth > maxDepth || isVisuallyHidden(node) || (viewportOnly && !inViewport(node))) {
+        return NodeFilter.FILTER_REJECT;
+      }
+      depths.set(node, depth);
+      return NodeFilter.FILTER_ACCEPT;
+    },
+  });
+
+  for (let node = root; node; node = walker.nextNode()) {
+    const parent = node === root ? top : containers.get(node.parentElement);
+    const tagName = node.nodeName.toLowerCase();
+    let nodeKey;
+    if (withHandles) {
+      // cloneNode 复制出来的元素会带着相同的句柄，重新分配
+      let handle = node.getAttribute(HANDLE_ATTR);
+      if (!handle || seenHandles.has(handle)) {
+        handle = String(window.__dpHandleSeq = (window.__dpHandleSeq || 0) + 1);
+        newHandles.push([node, handle]);
+      }
+      seenHandles.add(handle);
+      nodeKey = `${tagName}@${handle}`;
+    } else {
+      const count = tagCounters[tagName] || 0;
+      tagCounters[tagName] = count + 1;
+      nodeKey = `${tagName}${count}`;
+    }
+
+    const children = {};
+    parent[nodeKey] = children;
+    containers.set(node, children);
+    hasChildren.add(node.parentElement);
+    entries.push([parent, nodeKey, node]);
+
+    // 按键名+节点描述+内容预览估算输出大小
+    chars += nodeKey.length + nodeName(node).length + textLength + 16;
+    if (entries.length >= maxNodes) truncated = 'max_nodes';
+    else if (chars >= maxChars) truncated = 'max_chars';
+    else if ((entries.length & 255) === 0 && performance.now() > deadline) truncated = 'time_budget_ms';
+    if (truncated) break;
+  }
+
+  // 没有可见子节点的元素输出为描述字符串
+  for (const [parent, nodeKey, node] of entries) {
+    if (!hasChildren.has(node)) parent[nodeKey] = nodeLabel(node, textLength);
   }
-}
 
-function buildDomJsonTree(root = document.body) {
-  const topTag = root.nodeName.toLowerCase();
-  const result = {};
-  result[topTag] = domTreeToJson(root);
+  // 遍历结束后再写属性，避免在读取布局的过程中使样式失效
+  for (const [node, handle] of newHandles) node.setAttribute(HANDLE_ATTR, handle);
+
+  if (truncated) result._truncated = { reason: truncated, nodes: entries.length };
   return result;
 }
 
-// 用法示例
-const domJson = buildDomJsonTree();
-
-// console.log(domJson)
-//console.log(JSON.stringify(domJson, null, 2));
-return JSON.stringify(domJson, null, 2)
+const options = arguments[0] || {};
+return JSON.stringify(buildDomJsonTree(resolveRoot(options), options));
@@ -23,6 +23,7 @@ from mcp.server.fastmcp import FastMCP,Image,Context
 
 from DrissionPage.items import SessionElement, ChromiumElement, ShadowRoot, NoneElement, ChromiumTab, MixTab, ChromiumFrame
 from DrissionPage.common import Keys
+from BrowserPool import BrowserPool
 
 # from PIL import Image as PILImage
 import io
@@ -37,6 +38,8 @@ DrissionPage MCP  是一个基于 DrissionPage 和 FastMCP 的浏览器自动化
 '''
 
 mcp = FastMCP("DrissionPageMCP", log_level="ERROR",instructions=提示)
+# 按调试端口缓存浏览器连接，避免每次调用都重新连接
+browsers = BrowserPool()
 
 
 
@@ -103,7 +106,7 @@ def get_input_elements(tagname:str) -> list:
 @mcp.resource("browser://{port}/info")
 def browser_info(port:int) -> dict:
     """获取浏览器的信息"""
-    b=Chromium(port)
+    b=browsers.get(port)
     a={'browser_address':b._chromium_options.address,
        "latest_tab_title":b.latest_tab.title,
        "latest_tab_id":b.latest_tab.tab_id,
@@ -532,7 +535,7 @@ def get_current_tab_screenshot_as_file(path:str=".",name:str="screenshot.png") -
 @mcp.tool()
 def get_current_tab_info(debug_port: int) -> int:
     """获取当前标签页的信息,包括url, title,  id"""
-    b=Chromium(debug_port)
+    b=browsers.get(debug_port)
     tab=b.latest_tab
     info={
         "url":tab.url,
@@ -544,7 +547,7 @@ def get_current_tab_info(debug_port: int) -> int:
 @mcp.tool()
 def get_tab_list(debug_port: int) -> list:
     """获取当前浏览器的所有标签页的信息,包括url, title,  id"""
-    b=Chromium(debug_port)
+    b=browsers.get(debug_port)
     tabs=b.get_tabs
     tab_list=[]
     for tab in tabs:
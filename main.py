@@ -9,11 +9,34 @@ from mcp.server.fastmcp import FastMCP,Image,Context
 
 from DrissionPage.items import SessionElement, ChromiumElement, ShadowRoot, NoneElement, ChromiumTab, MixTab, ChromiumFrame
 from DrissionPage.common import Keys
+import json
+import asyncio
+import tempfile
+import hashlib
+
+from DomSnapshot import DomSnapshotStore
+from TabRegistry import TabRegistry
+from TabWorkerPool import TabWorkerPool
+from BrowserPool import BrowserPool
+from EventBuffer import EventRingBuffer
+from BodyStore import ResponseBodyStore
+from EventFilter import EventFilter
+from TabEvents import TabEventHub, ResponseListener
+from TrafficExport import TrafficExporter
+from RequestBlocker import RequestBlocker, BLOCK_PROFILES
+from PageWait import wait_for
+from Screenshot import capture, page_clip
+from ScreenshotCache import ScreenshotCache, thumbnail_hash
+from Screencast import Screencast
+from TextExtract import chunk_text, find_by_text, page_text, page_version, readable_text
+from contextlib import nullcontext
+from CodeBox import HANDLE_ATTR
 
 
 提示='''
 DrissionPage MCP  是一个基于 DrissionPage 和 FastMCP 的浏览器自动化MCP server服务器，它提供了一系列强大的浏览器操作 API，让您能够轻松通过AI实现网页自动化操作。
 点击元素前，需要先获取页面所有可点击元素的信息，使用get_all_clickable_elements()方法。
+getSimplifiedDomTree()返回的节点键名带有句柄(如 div@17)，可以直接用 click_by_handle、input_by_handle 等方法操作该元素。
 输入元素前，需要先获取页面所有可输入元素的信息，使用get_all_input_elements()方法。
 
 '''
@@ -25,11 +48,34 @@ class DrissionPageMCP():
     def __init__(self):
         self.browser = None
         self.session = None
-        self.current_tab = None
-        self.current_frame = None
-        self.current_shadow_root = None
-        self.cdp_event_data = []
-        self.response_listener_data=[]
+        self.tabs = TabRegistry()
+        # 每个CDP事件监听器一个有容量上限的环形缓冲区，键为事件名
+        self.cdp_event_data = {}
+        self.response_listener_data = EventRingBuffer(1000)
+        self.response_bodies = ResponseBodyStore()
+        # 每个标签页一个CDP事件分发器，同一事件可以同时有多个监听器
+        self.event_hubs = {}
+        self.tabs.on_close(lambda tab_id: self.event_hubs.pop(tab_id, None))
+        self._cdp_event_subscriptions = {}
+        # 命名的网络响应监听器，默认监听器 default 使用 response_listener_data 缓冲区
+        self.listeners = {}
+        # 资源屏蔽：全局配置用于之后打开网址的标签页，也可以为单个标签页设置
+        self.block_profile = None
+        self.blockers = {}
+        self.tabs.on_close(lambda tab_id: self.blockers.pop(tab_id, None))
+        self.screenshots = ScreenshotCache()
+        self.tabs.on_close(self.screenshots.forget)
+        self.screencasts = {}
+        # 分块读取的文本缓存，按游标读取后续块时不再重新提取
+        self.text_chunks = {}
+        self.tabs.on_close(lambda tab_id: self.text_chunks.pop(tab_id, None))
+        self.tabs.on_close(lambda tab_id: self.screencasts.pop(tab_id, None))
+        self.dom_snapshots = DomSnapshotStore()
+        self.tabs.on_close(self.dom_snapshots.forget)
+        # 阻塞的浏览器操作在线程池中执行：同一标签页串行，不同标签页并行
+        self.pool = TabWorkerPool(max_workers=8)
+        self.tabs.on_close(self.pool.forget)
+        self.browsers = BrowserPool()
 
     def test(self):
         return "test"
@@ -45,10 +91,15 @@ class DrissionPageMCP():
         """
         用DrissionPage 打开或接管已打开的浏览器，参数通过字典传递。
         必要参数:
-            config (dict): 可选键包括 、debug_port、browser_path、headless
+            config (dict): 可选键包括 、debug_port、browser_path、headless、block_profile
+                block_profile 为资源屏蔽配置，之后 get/new_tab/fetch_urls 打开的页面不加载被屏蔽的资源，
+                可选 ads、media、fast、text 或自定义字典，见 set_block_profile
         返回:
             dict: 浏览器信息
         """
+        return await self.pool.run("browser", self._connect_or_open_browser, config)
+
+    def _connect_or_open_browser(self, config: dict) -> dict:
         co = ChromiumOptions()
         if config.get("debug_port"):
             co.set_local_port(config["debug_port"])
@@ -58,7 +109,11 @@ class DrissionPageMCP():
             co.headless(True)
 
         self.browser = Chromium(co)
-        tab = self.browser.latest_tab        
+        self.browsers.add(int(self.browser.address.rsplit(":", 1)[-1]), self.browser)
+        self.tabs.attach(self.browser)
+        tab = self.tabs.get()
+        if "block_profile" in config:
+            self.set_block_profile(config["block_profile"], apply_to_all=True)
 
         return {
             "browser_address": self.browser._chromium_options.address,
@@ -79,55 +134,243 @@ tab = browser.latest_tab
     
     async def new_tab(self, url: str) -> str:
         """用DrissionPage 控制的浏览器,打开新标签页并 打开一个网址"""    
-        tab = self.browser.new_tab(url)    
-        return {"title": tab.title, "tab_id": tab.tab_id, "url": tab.url,"dom":self.getSimplifiedDomTree(),
+        return await self.pool.run(None, self._new_tab, url)
+
+    def _new_tab(self, url: str) -> dict:
+        if self.block_profile:
+            # 先打开空白页开启拦截，再打开网址，第一次加载就不请求被屏蔽的资源
+            tab = self._apply_blocking(self.tabs.new_tab())
+            tab.get(url)
+        else:
+            tab = self.tabs.new_tab(url)
+        return {"title": tab.title, "tab_id": tab.tab_id, "url": tab.url,"dom":self.getSimplifiedDomTree(tab_id=tab.tab_id),
                "等价Python代码":f'''
 tab = browser.new_tab('{url}')
 ''' }
     
-    def wait(self, a:int) :
+    def wait(self, a:int, tab_id: str = "") :
         """等待a秒"""
-        self.browser.latest_tab.wait(a)
+        self.tabs.get(tab_id).wait(a)
         return {"rsult":f"等待{a}秒成功", "等价Python代码":f"tab.wait({a})"}
+
+    def wait_for(self, condition: Literal["dom_ready", "load", "network_idle", "element_present", "element_visible",
+                                          "element_stable", "url_change", "js"] = "dom_ready",
+                 timeout: float = 10, xpath: str = "", selector: str = "", predicate: str = "", url: str = "",
+                 idle_ms: int = 500, max_inflight: int = 0, stable_ms: int = 300, tab_id: str = "") -> dict:
+        """
+        等待页面满足条件，条件成立时立即返回，比固定秒数的 wait 更快也更可靠。
+
+        Args:
+            condition (str): 等待条件
+                dom_ready: DOMContentLoaded；load: 页面和资源全部加载完成
+                network_idle: 进行中的请求数不超过 max_inflight 并保持 idle_ms 毫秒
+                element_present / element_visible: xpath 或 selector 指定的元素存在 / 可见
+                element_stable: 元素可见且位置大小保持 stable_ms 毫秒不变，适合等待动画结束后再点击
+                url_change: URL 包含 url，url 为空时等待 URL 发生变化
+                js: JS表达式 predicate 为真，如 "document.querySelectorAll('.item').length >= 10"
+            timeout (float): 超时时间(秒)
+            tab_id (str): 标签页id，默认为当前活动标签页
+
+        Returns:
+            dict: ok 条件是否成立(超时为false)，waited_ms 实际等待的毫秒数
+        """
+        tab = self.tabs.get(tab_id)
+        try:
+            return wait_for(tab, condition, timeout=timeout, xpath=xpath, selector=selector, predicate=predicate,
+                            url=url, idle_ms=idle_ms, max_inflight=max_inflight, stable_ms=stable_ms,
+                            hub=self._event_hub(tab))
+        except ValueError as e:
+            return str(e)
     
-    async def get(self,url:str)->str:
-        """在当前标签页打开一个网址"""
+    async def get(self,url:str, tab_id: str = "")->str:
+        """在当前标签页(或tab_id指定的标签页)打开一个网址"""
         if not  self.browser:
             await self.connect_or_open_browser()
             # return "请先打开或者连接浏览器"
-        self.lastest_tab.get(url)
-        tab=self.browser.latest_tab
-        return {"title": tab.title, "tab_id": tab.tab_id, "url": tab.url,"dom":self.getSimplifiedDomTree(),"等价Python代码":f'''tab.get('{url}')'''}
+        return await self.pool.run(tab_id or self.tabs.active_id or "browser", self._get, url, tab_id)
+
+    def _get(self, url: str, tab_id: str = "") -> dict:
+        tab = self._apply_blocking(self.tabs.activate(self.tabs.get(tab_id)))
+        tab.get(url)
+        return {"title": tab.title, "tab_id": tab.tab_id, "url": tab.url,"dom":self.getSimplifiedDomTree(tab_id=tab.tab_id),"等价Python代码":f'''tab.get('{url}')'''}
 
         
     
+    #region 批量抓取
+    async def fetch_urls(self, urls: list[str], concurrency: int = 5, extract: Literal["text", "dom"] = "text",
+                         timeout: float = 30, max_chars: int = 20000, ctx: Context = None) -> list:
+        """
+        并发打开多个网址并提取内容，每个网址在独立的后台标签页中加载，提取后关闭标签页。
+
+        Args:
+            urls (list[str]): 要抓取的网址列表
+            concurrency (int): 同时打开的标签页数量上限，实际并发还受线程池大小限制。
+                用 start_browser_pool 启动了多个浏览器时，页面会分配到负载最小的浏览器上
+            extract (str): text 提取body文本，dom 提取简化DOM树
+            timeout (float): 每个页面等待加载完成的超时时间(秒)
+            max_chars (int): 每个页面返回内容的最大字符数，0表示不限制
+
+        Returns:
+            list: 按完成顺序排列的结果，每项包括 url、tab_id、title、content 或 error。
+                  每个页面完成时会立即通过日志消息和进度通知推送给客户端
+        """
+        if not self.browser:
+            await self.connect_or_open_browser()
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        results = []
+
+        def fetch_one(url: str) -> dict:
+            with self.browsers.lease() if len(self.browsers) else nullcontext(self.browser) as browser:
+                return fetch_in(browser, url)
+
+        def fetch_in(browser, url: str) -> dict:
+            if self.block_profile:
+                tab = self.tabs.new_tab(activate=False, browser=browser, background=True)
+            else:
+                tab = self.tabs.new_tab(url, activate=False, browser=browser, background=True)
+            try:
+                if self.block_profile:
+                    # 先开启拦截再导航，首个请求也会被屏蔽
+                    self._apply_blocking(tab).get(url)
+                tab.wait.doc_loaded(timeout=timeout)
+                if extract == "dom":
+                    # 由页面内的遍历按字符预算截断，返回的仍是合法的JSON
+                    content = self.getSimplifiedDomTree(tab_id=tab.tab_id, max_chars=max_chars or 200000)
+                else:
+                    content = self.get_body_text(tab_id=tab.tab_id)["body_text"]
+                    if max_chars:
+                        content = content[:max_chars]
+                return {"url": url, "tab_id": tab.tab_id, "title": tab.title, "content": content}
+            finally:
+                tab.close()
+                self.tabs.forget(tab.tab_id)
+
+        async def run(url: str) -> None:
+            async with semaphore:
+                try:
+                    result = await self.pool.run(None, fetch_one, url)
+                except Exception as e:
+                    result = {"url": url, "error": str(e)}
+            results.append(result)
+            if ctx:
+                await ctx.report_progress(len(results), len(urls))
+                await ctx.info(json.dumps(result, ensure_ascii=False))
+
+        await asyncio.gather(*(run(url) for url in urls))
+        return results
+
+    #region 资源屏蔽
+    def _apply_blocking(self, tab):
+        """标签页还没有拦截时按全局屏蔽配置开启拦截，返回标签页对象"""
+        if self.block_profile and tab.tab_id not in self.blockers:
+            blocker = RequestBlocker(self._event_hub(tab), self.block_profile, follows_global=True)
+            blocker.start()
+            self.blockers[tab.tab_id] = blocker
+        return tab
+
+    def set_block_profile(self, profile: Any = "fast", tab_id: str = "", apply_to_all: bool = False) -> dict:
+        """
+        设置资源屏蔽配置，被屏蔽的图片、字体、广告等资源不会被下载，页面加载更快。
+
+        Args:
+            profile: 预置配置名称，或自定义字典，"none" 或空表示不屏蔽。预置配置：
+                ads 广告和统计脚本；media 图片、音视频、字体；fast 为 media + ads；text 为 fast + 样式表。
+                自定义字典的键（都可省略）：
+                    extends: 在哪个预置配置的基础上追加条件
+                    resource_types: 资源类型，如 ["Image", "Font", "Media", "Stylesheet", "Script"]
+                    url_patterns: URL通配符，如 ["*://*.example.com/ads/*", "*.gif"]
+                    mime: 响应的 Content-Type 包含的关键字，如 ["video/"]，需要拦截所有响应，开销较大
+            tab_id (str): 只为这个标签页设置，默认为当前活动标签页
+            apply_to_all (bool): 为True时同时作为全局配置，之后 get/new_tab/fetch_urls 打开的页面都按它屏蔽，
+                已经按全局配置拦截的标签页立即改用新配置
+
+        Returns:
+            dict: 标签页的屏蔽统计
+        """
+        if isinstance(profile, str) and profile not in BLOCK_PROFILES:
+            return f"不存在屏蔽配置{profile}，可选: {', '.join(BLOCK_PROFILES)}"
+        if profile == "none":
+            profile = None
+        tab = self.tabs.get(tab_id)
+        if apply_to_all:
+            self.block_profile = profile
+            # 已打开的标签页上按全局配置创建的拦截立即改用新配置，统计数据保留
+            for other_id, blocker in list(self.blockers.items()):
+                if blocker.follows_global and other_id != tab.tab_id:
+                    blocker.update(profile)
+                    if not profile:
+                        self.blockers.pop(other_id, None)
+        old = self.blockers.pop(tab.tab_id, None)
+        if not profile:
+            if old:
+                old.stop()
+            return {"tab_id": tab.tab_id, "profile": None}
+        if old:
+            old.update(profile)
+            old.follows_global = apply_to_all
+            blocker = old
+        else:
+            blocker = RequestBlocker(self._event_hub(tab), profile, follows_global=apply_to_all)
+            blocker.start()
+        self.blockers[tab.tab_id] = blocker
+        return blocker.stats()
+
+    def get_block_stats(self) -> dict:
+        """获取全局屏蔽配置，以及每个标签页屏蔽的请求数、字节数(只统计响应阶段屏蔽的)和按资源类型的数量"""
+        tabs = [blocker.stats() for blocker in self.blockers.values()]
+        return {"profile": self.block_profile, "blocked_requests": sum(t["blocked_requests"] for t in tabs),
+                "blocked_bytes": sum(t["blocked_bytes"] for t in tabs), "tabs": tabs}
+
+    #region 浏览器池
+    def start_browser_pool(self, start_port: int = 9222, count: int = 2, browser_path: str = "",
+                           headless: bool = False) -> list:
+        """
+        在 start_port 开始的 count 个调试端口上启动或接管多个浏览器，组成浏览器池。
+        fetch_urls 等批量操作会把页面分配到负载最小的健康浏览器上。
+        还没有连接浏览器时，第一个浏览器成为当前浏览器。
+
+        Returns:
+            list: 每个浏览器的端口、地址、健康状态和正在执行的任务数
+        """
+        status = self.browsers.start(start_port, count, browser_path=browser_path, headless=headless)
+        if not self.browser:
+            self.browser = self.browsers.get(start_port)
+            self.tabs.attach(self.browser)
+        return status
+
+    def get_browser_pool_status(self) -> list:
+        """获取浏览器池中每个浏览器的端口、地址、健康状态和正在执行的任务数"""
+        return self.browsers.status()
+
     #region 上传和下载
-    def download_file(self, url: str, path: str, rename: str) -> str:
+    def download_file(self, url: str, path: str, rename: str, tab_id: str = "") -> str:
         """控制浏览器下载文件到指定路径
         
         Args:
             url (str): 文件的URL地址
             path (str): 文件保存的路径
             rename (str): 重命名文件名
+            tab_id (str): 标签页id，默认为当前活动标签页
         
         Returns:
             str: 下载结果信息
         """
-        tab = self.lastest_tab
+        tab = self.tabs.get(tab_id)
         result = tab.download(file_url=url, save_path=path, rename=rename)
         return str(result)
     
-    def upload_file(self,  file_path: str) -> str:
+    def upload_file(self,  file_path: str, tab_id: str = "") -> str:
         """点击当网页上的 <input type="file"> 元素触发上传文件的操作，上传file_path文件到当前网页
         
         Args:            
             file_path (str): 要上传的文件路径
+            tab_id (str): 标签页id，默认为当前活动标签页
         
         Returns:
             str: 上传结果信息，如果元素不存在则返回错误信息
         """
         x="//input[@type='file']"
-        t:ChromiumTab=self.lastest_tab
+        t:ChromiumTab=self.tabs.get(tab_id)
         if e:= t(f"xpath:{x}"):
             t.set.upload_files(file_path)
             e.click(by_js=True)
@@ -140,21 +383,40 @@ tab = browser.new_tab('{url}')
 
     @property
     def lastest_tab(self) -> ChromiumTab:
-        """获取最新标签页"""       
-        return self.browser.latest_tab
+        """获取当前活动标签页"""
+        return self.tabs.get()
+
+    #region 标签页管理
+    def list_tabs(self) -> list:
+        """列出已打开过的标签页，包括 tab_id、url、title 以及是否为当前活动标签页"""
+        return self.tabs.tabs()
+
+    def switch_tab(self, tab_id: str) -> dict:
+        """把tab_id指定的标签页设为当前活动标签页，之后不带tab_id的操作都作用在这个标签页上"""
+        tab = self.tabs.activate(tab_id)
+        self.browser.activate_tab(tab)
+        return {"title": tab.title, "tab_id": tab.tab_id, "url": tab.url, "等价Python代码": f"tab = browser.get_tab('{tab_id}')"}
+
+    def close_tab(self, tab_id: str = "") -> str:
+        """关闭tab_id指定的标签页，默认关闭当前活动标签页"""
+        tab = self.tabs.get(tab_id)
+        tab_id = tab.tab_id
+        tab.close()
+        self.tabs.forget(tab_id)
+        return f"标签页{tab_id}已关闭"
     
-    def send_enter(self) -> str:
-        """向当前页面发送 enter 回车键"""
-        tab = self.browser.latest_tab
+    def send_enter(self, tab_id: str = "") -> str:
+        """向当前页面(或tab_id指定的标签页)发送 enter 回车键"""
+        tab = self.tabs.get(tab_id)
         try:
             result = tab.actions.type(Keys.ENTER)
             return {"result":f'{tab.title} 网页发送 enter 回车键成功', "等价Python代码":f"tab.actions.type(Keys.ENTER)"}
         except Exception as e:
             return f"{tab.title} 网页发送 enter 回车键失败"
         
-    def getInputElementsInfo(self) -> list:
-        """获取当前标签页的所有可进行输入操作的元素，对元素进行输入操作前优先使用这个方法"""
-        tab = self.browser.latest_tab
+    def getInputElementsInfo(self, tab_id: str = "") -> list:
+        """获取当前标签页(或tab_id指定的标签页)的所有可进行输入操作的元素，对元素进行输入操作前优先使用这个方法"""
+        tab = self.tabs.get(tab_id)
         js_code='''
         const inputElements = Array.from(document.querySelectorAll('input, select, textarea, button'));
         return inputElements.filter(el => !el.disabled); // 排除禁用的元素
@@ -162,28 +424,30 @@ tab = browser.new_tab('{url}')
         elements = tab.run_js(js_code)
         return elements
     
-    def click_by_xpath(self, xpath: str) -> dict:
+    def click_by_xpath(self, xpath: str, tab_id: str = "") -> dict:
         """通过xpath点击当前标签页中某个元素,最好先获取页面dom信息,再决定Xpath的写法"""
         
         locator = f"xpath:{xpath}"
-        element = self.browser.latest_tab.ele(locator, timeout=3)
+        element = self.tabs.get(tab_id).ele(locator, timeout=3)
         result = {"locator": locator, "element": str(element), "click_result": element.click(), "等价Python代码":f"tab.ele('{locator}', timeout=3).click()"}
         return result
     
-    def click_by_containing_text(self, content: str, index: int = None) :
+    def click_by_containing_text(self, content: str, index: int = None, tab_id: str = "") :
         """
         根据包含指定文本的方式点击网页元素。
         
         参数：
             content: 要查找的文本内容。
             index: 当匹配到多个元素时指定要点击的索引，默认不指定。
+            tab_id: 标签页id，默认为当前活动标签页。
 
         返回：
             点击结果说明，或错误提示。
         """
         
         # 获取包含指定文本的所有元素，等待最多 3 秒
-        elements = self.browser.latest_tab.eles(content, timeout=3)
+        tab = self.tabs.get(tab_id)
+        elements = tab.eles(content, timeout=3)
 
         # 如果没有匹配到任何元素，返回错误提示
         if len(elements) == 0:
@@ -191,7 +455,7 @@ tab = browser.new_tab('{url}')
         
         # 如果只找到一个元素，直接点击它
         if len(elements) == 1:
-            self.lastest_tab(content).click()
+            tab(content).click()
             return f" 点击成功"
         
         # 如果找到多个元素
@@ -206,38 +470,79 @@ tab = browser.new_tab('{url}')
   
         
     
-    def input_by_xapth(self, xpath: str, input_value: str, clear_first: bool = True) :
+    def input_by_xapth(self, xpath: str, input_value: str, clear_first: bool = True, tab_id: str = "") :
         """通过xpath给当前标签页中某个元素输入内容，最好先判断元素是否存在
         
         Args:
             xpath (str): 元素的XPath表达式
             input_value (str): 要输入的内容
             clear_first (bool): 是否先清除已有内容，默认为True
+            tab_id (str): 标签页id，默认为当前活动标签页
         
         Returns:
             Any: 输入操作的结果，如果元素不存在则返回错误信息
         """
         locator = f"xpath:{xpath}"
-        if e := self.browser.latest_tab.ele(locator, timeout=4):
+        if e := self.tabs.get(tab_id).ele(locator, timeout=4):
             result = {"locator": locator, "result": e.input(input_value, clear=clear_first), "等价Python代码":f"tab.ele('{locator}', timeout=4).input({input_value}, clear={clear_first})"}
             return result
         else:
             return f"元素{locator}不存在，需要getInputElementsInfo先获取元素信息"
 
-    def get_body_text(self) -> str:
-        """获取当前标签页的body的文本内容"""
-        
-        tab = self.browser.latest_tab
-        body_text = tab('t:body').text
-        r={"body_text":body_text,"等价Python代码":f"tab('t:body').text"}
-        return r
-    def run_js(self, js_code: str) :
+    def get_body_text(self, tab_id: str = "", mode: Literal["full", "readable"] = "full", max_chars: int = 0,
+                      max_tokens: int = 0, cursor: str = "") -> dict:
+        """
+        获取当前标签页(或tab_id指定的标签页)的body的文本内容
+
+        Args:
+            tab_id (str): 标签页id，默认为当前活动标签页
+            mode (str): full 为全部可见文本；readable 只提取正文，去掉导航、页眉页脚、侧栏等样板内容
+            max_chars (int): 分块返回，每块最多的字符数，0表示不分块
+            max_tokens (int): 分块返回，每块最多的估算token数，0表示不按token分块
+            cursor (str): 上一次返回的 next_cursor，用于读取下一块；页面没有变化时直接从缓存读取，变化后重新提取
+
+        Returns:
+            dict: 不分块时返回 body_text；分块时返回 chunk(id、index、text)、total_chunks、next_cursor(读完时为空)
+        """
+        tab = self.tabs.get(tab_id)
+        if not (max_chars or max_tokens):
+            result = readable_text(tab) if mode == "readable" else page_text(tab)
+            code = f"from TextExtract import {'readable_text' if mode == 'readable' else 'page_text'}\n" \
+                   f"{'readable_text' if mode == 'readable' else 'page_text'}(tab)['text']"
+            return {"body_text": result["text"], "等价Python代码": code}
+
+        cached = self.text_chunks.get(tab.tab_id)
+        doc_id, _, index = cursor.rpartition(":")
+        key = (mode, max_chars, max_tokens)
+        # 先取页面版本再提取文本，提取期间发生的变化留给下一次调用发现
+        version = page_version(tab)
+        if not (cursor and cached and cached["doc_id"] == doc_id and cached["key"] == key
+                and cached["version"] == version):
+            text = (readable_text(tab) if mode == "readable" else page_text(tab))["text"]
+            chunks = chunk_text(text, max_chars=max_chars, max_tokens=max_tokens)
+            new_doc_id = hashlib.sha1(f"{key}:{text}".encode("utf-8")).hexdigest()[:12]
+            cached = self.text_chunks[tab.tab_id] = {"doc_id": new_doc_id, "key": key, "chunks": chunks,
+                                                     "version": version}
+        index = int(index) if cursor and index.isdigit() else 0
+        chunks = cached["chunks"]
+        if index >= len(chunks):
+            return {"error": f"cursor {cursor} 超出范围，共 {len(chunks)} 块", "total_chunks": len(chunks)}
+        return {
+            "chunk": chunks[index],
+            "total_chunks": len(chunks),
+            "next_cursor": f"{cached['doc_id']}:{index + 1}" if index + 1 < len(chunks) else "",
+            # 游标来自页面变化之前的内容时，按新内容的同一序号继续读取
+            "document_changed": bool(cursor) and cached["doc_id"] != doc_id,
+        }
+
+    def run_js(self, js_code: str, tab_id: str = "") :
         """
         在当前标签页中运行JavaScript代码并返回执行结果
         查找网页元素，获取元素信息，操作网页元素优先使用这个方法
         
         Args:
             js_code (str): 要执行的JavaScript代码
+            tab_id (str): 标签页id，默认为当前活动标签页
         
         Returns:
             Any: JavaScript代码执行结果
@@ -251,18 +556,19 @@ tab = browser.new_tab('{url}')
                 return data;
             })("https://www.baidu.com/");
         """
-        tab = self.browser.latest_tab
+        tab = self.tabs.get(tab_id)
         result = tab.run_js(js_code)
         r={"result":result,"等价Python代码":f"r=tab.run_js('{js_code}')"}
         return r
         
     
-    def run_cdp( self,cmd, **cmd_args) :
-        """在当前标签页中运行谷歌CDP协议代码并获取结果
+    def run_cdp( self,cmd, tab_id: str = "", **cmd_args) :
+        """在当前标签页(或tab_id指定的标签页)中运行谷歌CDP协议代码并获取结果
         
         Args:
             
             cmd: CDP协议命令
+            tab_id: 标签页id，默认为当前活动标签页
             **cmd_args: CDP命令参数
         
         Returns:
@@ -272,26 +578,68 @@ tab = browser.new_tab('{url}')
             举例1说明 run_cdp('Page.stopLoading')
             举例2说明 run_cdp('Page.navigate', url='https://example.com')
         """
-        result=self.browser.latest_tab.run_cdp(cmd, **cmd_args)
+        result=self.tabs.get(tab_id).run_cdp(cmd, **cmd_args)
         return result
-    def listen_cdp_event(self,event_name: str) :
+    def _event_hub(self, tab) -> TabEventHub:
+        """获取标签页的CDP事件分发器"""
+        hub = self.event_hubs.get(tab.tab_id)
+        if hub is None:
+            hub = self.event_hubs[tab.tab_id] = TabEventHub(tab)
+        return hub
+
+    def listen_cdp_event(self,event_name: str, capacity: int = 1000, filter: dict = None, tab_id: str = "") :
         """设置监听CDP事件
         
          应该先运行cdp  命令 激活对应的域，比如  Network.enable
+         tab_id: 监听的标签页id，默认为当前活动标签页
+         capacity: 最多保留的事件数，超出后丢弃最旧的事件
+         filter: 过滤条件，不匹配的事件在回调中直接丢弃，不写入缓冲区，
+            如 {"url_glob": "*api*", "status": "2xx", "resource_types": ["XHR"]}，
+            支持的键见 start_response_listener
         """
         # b=Chromium(debug_port)
+        try:
+            event_filter = EventFilter(filter)
+        except Exception as e:
+            return f"过滤条件有误: {e}"
+        buffer = self.cdp_event_data.get(event_name)
+        if buffer is None:
+            buffer = self.cdp_event_data[event_name] = EventRingBuffer(capacity)
+        elif buffer.capacity != capacity:
+            buffer.resize(capacity)
+
         def r(**event):
-            self.cdp_event_data.append({"event_name": event_name, "event_data": event})
+            if event_filter.match(event):
+                buffer.append({"event_name": event_name, "event_data": event})
 
         try:
-            self.browser.latest_tab.driver.set_callback(event_name, r)
+            old = self._cdp_event_subscriptions.pop(event_name, None)
+            if old:
+                old[0].unsubscribe(old[1])
+            hub = self._event_hub(self.tabs.get(tab_id))
+            self._cdp_event_subscriptions[event_name] = (hub, hub.subscribe(event_name, r))
             return f"CDP event callback for '{event_name}' set successfully."
         except Exception as e:
             return e
 
-    def get_cdp_event_data(self) -> list:
-        """获取CDP事件回调函数收集到的数据"""
-        return self.cdp_event_data  
+    def get_cdp_event_data(self, event_name: str = "", since: int = 0, limit: int = 100) -> dict:
+        """获取CDP事件回调函数收集到的数据
+
+        Args:
+            event_name (str): 事件名，为空时返回所有监听器的数据，键为事件名
+            since (int): 只返回序号大于since的事件，传入上一次返回的 next_since 即可只读取新事件
+            limit (int): 最多返回的事件数，0表示不限制
+
+        Returns:
+            dict: events、next_since、missed(因超出容量被丢弃而没有读到的事件数)、remaining，以及缓冲区统计 stats
+        """
+        if event_name:
+            buffer = self.cdp_event_data.get(event_name)
+            if buffer is None:
+                return f"没有监听CDP事件{event_name}，需要先调用listen_cdp_event"
+            return {**buffer.read(since, limit), "stats": buffer.stats()}
+        return {name: {**buffer.read(since, limit), "stats": buffer.stats()}
+                for name, buffer in self.cdp_event_data.items()}
 
 
 
@@ -332,77 +680,336 @@ tab = browser.new_tab('{url}')
             "video/webm",
             "video/ogg"
         ],
-        url_include: str = "."        
+        url_include: str = ".",
+        capacity: int = 1000,
+        capture_body: bool = False
     ) :
         '''
         开启一个新的标签页，设置监听，访问tab_url,
         tab_url: 被监听的标签页的url
         mimeType: 需要监听的接收的数据包的mimeType类型
         url_include: 需要监听的接收的数据包的url包含的关键字
+        capacity: 最多保留的数据包数，超出后丢弃最旧的数据包
+        capture_body: 是否在后台获取匹配数据包的响应体，用 get_response_body 分页读取，
+            小的响应体保存在内存中，大的保存到磁盘
         refresh: 是否刷新页面,
         '''
-        t = self.browser.new_tab(tab_url)      
-
-        t.run_cdp("Network.enable")
-
-        def r(**event):
-            _url = event.get("response", {}).get("url", "")
-            _mimeType = event.get("response", {}).get("mimeType", "")
-            
-            if mimeType in _mimeType and url_include in _url:
-                self.response_listener_data.append({
-                    "event_name": "Network.responseReceived",
-                    "event_data": event
-                })
-        
-        t.driver.set_callback("Network.responseReceived", r)
+        t = self.tabs.new_tab(tab_url)
+        self.start_response_listener(name="default", filter={"mime": mimeType, "url_include": url_include},
+                                     tab_id=t.tab_id, capacity=capacity, capture_body=capture_body)
         t.get(tab_url)
         
         return f"开启监听{tab_url}, 数据包url包含关键字：{url_include}，mimeType：{mimeType}"
-    
 
+    def start_response_listener(self, name: str, filter: dict = None, tab_id: str = "", url: str = "",
+                                capacity: int = 1000, capture_body: bool = False) -> dict:
+        """
+        在标签页上开启一个命名的网络响应监听器，同一个标签页可以同时有多个监听器。
+        过滤条件在CDP事件回调中、写入缓冲区之前判断，不匹配的数据包直接丢弃。
+
+        Args:
+            name (str): 监听器名称，已存在同名监听器时先关闭旧的
+            filter (dict): 过滤条件，都可省略，多个键之间是"并且"，同一个键的多个值之间是"或者"：
+                url_regex / url_glob / url_include / exclude_url_regex: URL条件，字符串或列表
+                status: 状态码，如 200、"200-299"、"2xx" 或它们的列表
+                resource_types: 资源类型，如 ["XHR", "Fetch", "Document"]
+                mime: mimeType包含的关键字
+                headers: 响应头条件，如 {"content-type": "json"}，值为正则表达式，空字符串表示只要求存在
+                min_size / max_size: 响应的实际传输大小(字节)范围
+            tab_id (str): 标签页id，默认为当前活动标签页
+            url (str): 开启监听后在该标签页打开的网址，为空时不跳转
+            capacity (int): 最多保留的数据包数，超出后丢弃最旧的数据包
+            capture_body (bool): 是否在后台获取匹配数据包的响应体，用 get_response_body 读取
+
+        Returns:
+            dict: 监听器信息
+        """
+        try:
+            event_filter = EventFilter(filter)
+        except Exception as e:
+            return f"过滤条件有误: {e}"
+        sinks = []
+        if name in self.listeners:
+            old = self.listeners.pop(name)
+            old.stop()
+            # 重新开启同名监听器时，正在进行的导出继续写入
+            sinks = old.sinks
+        if name == "default":
+            buffer = self.response_listener_data
+            if buffer.capacity != capacity:
+                buffer.resize(capacity)
+        else:
+            buffer = EventRingBuffer(capacity)
+
+        tab = self.tabs.get(tab_id)
+        listener = ResponseListener(name, self._event_hub(tab), event_filter, buffer,
+                                    self.response_bodies if capture_body else None)
+        listener.sinks = sinks
+        listener.start()
+        self.listeners[name] = listener
+        if url:
+            tab.get(url)
+        return listener.stats()
+
+    def list_response_listeners(self) -> list:
+        """列出所有网络响应监听器的名称、标签页、过滤条件、匹配和丢弃的数量"""
+        return [listener.stats() for listener in self.listeners.values()]
     
-    def response_listener_stop(self,clear_data:bool=False) -> str:
-        """关闭监听网页发送的数据包"""
-        t=self.browser.latest_tab
-        t.run_cdp("Network.disable")
+    def response_listener_stop(self,clear_data:bool=False, name: str = "default") -> str:
+        """
+        关闭监听网页发送的数据包，name 为监听器名称，标签页上没有其他网络监听时关闭 Network 域。
+        不清空数据时关闭后仍可用 get_response_listener_data 读取已监听到的数据包；
+        清空数据时删除该监听器的数据包和它获取的响应体，监听器随之删除。
+        """
+        listener = self.listeners.get(name)
+        if listener is None:
+            return f"监听器{name}不存在"
+        listener.stop()
+        sinks, listener.sinks = listener.sinks, []
+        for sink in sinks:
+            sink.close()
         if clear_data:
-            self.response_listener_data = []
+            self.listeners.pop(name, None)
+            listener.buffer.clear()
+            # 同一个标签页上的其他监听器可能也引用了同一个响应体
+            shared = set().union(*(other.body_ids for other in self.listeners.values()))
+            self.response_bodies.discard(listener.body_ids - shared)
+            listener.body_ids.clear()
         return f"监听网页发送的数据包关闭成功 ,是否清空数据: {clear_data}"
 
     
-    def get_response_listener_data(self) -> list:
-        """获取监听到的数据,返回数据列表"""
-        return self.response_listener_data
+    def get_response_listener_data(self, since: int = 0, limit: int = 100, name: str = "default") -> dict:
+        """获取监听到的数据
 
-    def get_current_tab_screenshot(self) -> bytes:
+        Args:
+            since (int): 只返回序号大于since的数据包，传入上一次返回的 next_since 即可只读取新数据
+            limit (int): 最多返回的数据包数，0表示不限制
+            name (str): 监听器名称，默认为 get_url_with_response_listener 开启的监听器
+
+        Returns:
+            dict: events、next_since、missed(因超出容量被丢弃而没有读到的数量)、remaining，以及缓冲区统计 stats
         """
-        获取当前标签页的网页截图   
-        
+        listener = self.listeners.get(name)
+        buffer = listener.buffer if listener else self.response_listener_data if name == "default" else None
+        if buffer is None:
+            return f"监听器{name}不存在"
+        return {**buffer.read(since, limit), "stats": buffer.stats()}
+
+    def start_traffic_export(self, name: str = "default", format: Literal["ndjson", "har"] = "ndjson",
+                             directory: str = "", max_file_mb: int = 100, max_files: int = 0,
+                             max_body_bytes: int = 1024 * 1024) -> dict:
+        """
+        把监听器之后匹配到的数据包在后台流式写入文件，长时间抓包不占用内存，便于离线分析
+
+        Args:
+            name (str): 监听器名称
+            format (str): ndjson 每行一个数据包；har 为标准HAR 1.2，可以导入浏览器开发者工具
+            directory (str): 保存目录，默认为系统临时目录下的 DrissionPageMCP/exports
+            max_file_mb (int): 单个文件的大小上限(MB)，超过后轮转到新文件
+            max_files (int): 最多保留的文件数，超出时删除最早的文件，0表示不限制
+            max_body_bytes (int): 每个响应体最多写入的字节数，监听器开启了 capture_body 时才写入响应体
+
+        Returns:
+            dict: 导出状态，files 为已写入的文件
+        """
+        listener = self.listeners.get(name)
+        if listener is None:
+            return f"监听器{name}不存在，需要先调用 start_response_listener"
+        directory = directory or str(Path(tempfile.gettempdir()) / "DrissionPageMCP" / "exports")
+        exporter = TrafficExporter(directory, name=name, format=format, max_file_bytes=max_file_mb * 1024 * 1024,
+                                   max_files=max_files, body_store=listener.body_store, max_body_bytes=max_body_bytes)
+        listener.sinks.append(exporter)
+        return exporter.stats()
+
+    def stop_traffic_export(self, name: str = "default") -> list:
+        """停止监听器的所有导出，写完队列中的数据包并补全文件结尾，返回每个导出写入的文件"""
+        listener = self.listeners.get(name)
+        if listener is None:
+            return f"监听器{name}不存在"
+        sinks, listener.sinks = listener.sinks, []
+        for sink in sinks:
+            sink.close()
+        return [sink.stats() for sink in sinks]
+
+    def get_response_body(self, request_id: str = "", offset: int = 0, length: int = 65536, tab_id: str = "") -> dict:
+        """获取 get_url_with_response_listener(capture_body=True) 在后台保存的响应体，按字节偏移分页读取
+
+        Args:
+            request_id (str): 数据包的 requestId(在 get_response_listener_data 返回的 event_data 中)，
+                为空时返回所有已保存响应体的列表和统计
+            offset (int): 读取的起始字节偏移，传入上一次返回的 next_offset 读取下一页
+            length (int): 每页最多读取的字节数
+            tab_id (str): 数据包所在的标签页id(数据包的 tab_id)，requestId 只在同一个标签页内唯一；
+                为空时读取最近保存的同名 requestId 的响应体
+
         Returns:
-            bytes: 截图的二进制数据
+            dict: 文本类型的响应体 encoding 为 utf-8，其他类型为 base64；读完时 next_offset 为 None
+        """
+        if not request_id:
+            return {"bodies": self.response_bodies.list(), "stats": self.response_bodies.stats()}
+        body = self.response_bodies.get(request_id, offset, length, tab_id=tab_id)
+        if body is None:
+            return f"没有保存requestId为{request_id}的响应体，可能还在获取中或没有开启capture_body"
+        return body
+
+    def get_current_tab_screenshot(self, xpath: str = "", selector: str = "", clip: dict = None,
+                                   full_page: bool = False, scale: float = 1.0,
+                                   format: Literal["jpeg", "webp", "png"] = "jpeg", quality: int = 80,
+                                   max_bytes: int = 500 * 1024, dedupe: bool = True, max_distance: int = 0,
+                                   on_unchanged: Literal["reference", "image"] = "reference", tab_id: str = ""):
         """
-        t:ChromiumTab=self.browser.latest_tab
-        screenshot=t.get_screenshot(as_bytes='jpeg')
-        return screenshot
+        获取当前标签页(或tab_id指定的标签页)的网页截图，默认为当前视口
+
+        Args:
+            xpath (str): 只截取xpath指定的元素
+            selector (str): 只截取CSS选择器指定的元素
+            clip (dict): 只截取页面上的矩形区域 {"x", "y", "width", "height"}，CSS像素
+            full_page (bool): 截取整个页面，而不是当前视口
+            scale (float): 缩放比例，小于1可以减小图片
+            format (str): 图片格式，webp 在相同质量下通常最小
+            quality (int): jpeg/webp 的质量 1-100
+            max_bytes (int): 图片大小上限(字节)，超出时自动降低质量和缩小尺寸，0表示不限制
+            dedupe (bool): 截图与该标签页上一次相同参数的截图完全相同时，不再返回图片，只返回 capture_id
+            max_distance (int): 0 表示按截图内容判断，只有完全相同才认为没有变化；
+                大于0时先比较小缩略图的感知哈希距离(1-64)，距离不超过它时不再截图。这是近似判断，
+                忽略光标闪烁等细小变化，也可能忽略单个字符、单选框、复选框等小的变化
+            on_unchanged (str): 画面没有变化时，reference 只返回上一次截图的 capture_id，image 返回缓存的图片
+
+        Returns:
+            截图信息(capture_id 等)和截图；画面没有变化时返回 unchanged 和上一次截图的 capture_id
+        """
+        t:ChromiumTab=self.tabs.get(tab_id)
+        try:
+            region = page_clip(t, xpath=xpath, selector=selector, clip=clip, full_page=full_page)
+            if region is None:
+                return f"元素{xpath or selector}不存在"
+            key = json.dumps([xpath, selector, clip, full_page, scale, format, quality, max_bytes, max_distance > 0])
+            approximate = dedupe and max_distance > 0
+            # 近似判断：缩略图的感知哈希足够接近时不再截图
+            phash = thumbnail_hash(t, region, perceptual=True) if approximate else ""
+            cached = self.screenshots.find_unchanged(t.tab_id, key, phash, max_distance) if approximate else None
+            shot = None
+            if not approximate:
+                shot = capture(t, scale=scale, format=format, quality=quality, max_bytes=max_bytes, region=region)
+                # 精确判断：比较截图本身的哈希，只有完全相同才认为没有变化，省去传输图片
+                phash = "s:" + hashlib.sha1(shot["data"]).hexdigest()
+                cached = self.screenshots.find_unchanged(t.tab_id, key, phash) if dedupe else None
+            if cached:
+                info = json.dumps({"unchanged": True, **self.screenshots.describe(cached)}, ensure_ascii=False)
+                if on_unchanged == "image":
+                    return [info, Image(data=cached["data"], format=cached["format"])]
+                return f"{info}\n画面与截图 {cached['capture_id']} 相同，没有返回图片"
+            if shot is None:
+                shot = capture(t, scale=scale, format=format, quality=quality, max_bytes=max_bytes, region=region)
+        except ValueError as e:
+            return str(e)
+        data = shot.pop("data")
+        entry = self.screenshots.put(t.tab_id, key, phash, data, format, shot)
+        return [json.dumps(self.screenshots.describe(entry), ensure_ascii=False), Image(data=data, format=format)]
+
+    def get_cached_screenshot(self, capture_id: str = ""):
+        """
+        按 capture_id 取回缓存的截图；capture_id 为空时返回缓存统计(命中、未命中、内存占用)和缓存中的截图列表
+        """
+        if not capture_id:
+            return {"stats": self.screenshots.stats(), "screenshots": self.screenshots.list()}
+        entry = self.screenshots.get(capture_id)
+        if entry is None:
+            return f"截图{capture_id}不在缓存中"
+        return [json.dumps(self.screenshots.describe(entry), ensure_ascii=False),
+                Image(data=entry["data"], format=entry["format"])]
     
-    def get_current_tab_screenshot_as_file(self,path:str=".",name:str="screenshot.png") -> str:
+    def start_screencast(self, fps: float = 5, format: Literal["jpeg", "png"] = "jpeg", quality: int = 60,
+                         max_width: int = 1280, max_height: int = 800, tab_id: str = "") -> dict:
+        """
+        开启标签页的连续画面流，浏览器在画面变化时推送帧，只在内存中保留最新一帧。
+        需要持续观察页面时，用 get_screencast_frame 取帧比反复截图快得多。
+
+        Args:
+            fps (float): 最高帧率，浏览器在确认上一帧后才发送下一帧，0表示不限制
+            format (str): 帧的图片格式
+            quality (int): jpeg 质量 1-100
+            max_width (int): 帧的最大宽度(像素)
+            max_height (int): 帧的最大高度(像素)
+            tab_id (str): 标签页id，默认为当前活动标签页
+
+        Returns:
+            dict: 画面流状态
+        """
+        tab = self.tabs.get(tab_id)
+        old = self.screencasts.pop(tab.tab_id, None)
+        if old:
+            old.stop()
+        cast = Screencast(self._event_hub(tab), fps=fps, format=format, quality=quality,
+                          max_width=max_width, max_height=max_height)
+        cast.start()
+        self.screencasts[tab.tab_id] = cast
+        return cast.stats()
+
+    def get_screencast_frame(self, tab_id: str = ""):
+        """立即返回画面流的最新一帧及其帧序号和时间，需要先调用 start_screencast"""
+        cast = self.screencasts.get(tab_id or self.tabs.active_id)
+        if cast is None:
+            return "标签页没有开启画面流，需要先调用 start_screencast"
+        frame = cast.latest_frame()
+        if frame is None:
+            return "还没有收到画面，页面没有变化时浏览器不会推送新帧"
+        data = frame.pop("data")
+        return [json.dumps(frame, ensure_ascii=False), Image(data=data, format=frame["format"])]
+
+    def record_screencast(self, directory: str = "", max_frames: int = 100, tab_id: str = "") -> dict:
+        """
+        把画面流之后的帧依次保存为文件，保存 max_frames 帧或调用 stop_screencast 后停止
+
+        Args:
+            directory (str): 保存目录，默认为系统临时目录下的 DrissionPageMCP/screencast/标签页id
+            max_frames (int): 最多保存的帧数
+        """
+        cast = self.screencasts.get(tab_id or self.tabs.active_id)
+        if cast is None:
+            return "标签页没有开启画面流，需要先调用 start_screencast"
+        directory = directory or str(Path(tempfile.gettempdir()) / "DrissionPageMCP" / "screencast" / cast.tab_id)
+        return cast.start_recording(directory, max_frames)
+
+    def stop_screencast(self, tab_id: str = "") -> dict:
+        """停止画面流和录制，返回收到的帧数和录制结果"""
+        cast = self.screencasts.pop(tab_id or self.tabs.active_id, None)
+        if cast is None:
+            return "标签页没有开启画面流"
+        return cast.stop()
+
+    def get_current_tab_screenshot_as_file(self,path:str=".",name:str="screenshot.png", xpath: str = "",
+                                           selector: str = "", clip: dict = None, full_page: bool = False,
+                                           scale: float = 1.0, quality: int = 80, max_bytes: int = 0,
+                                           tab_id: str = "") -> dict:
         """
         获取当前标签页的屏幕截图并保存为文件
         
         Args:
             path (str): 截图保存路径，默认为当前目录
+            name (str): 文件名，按后缀 .png/.jpg/.jpeg/.webp 决定图片格式
+            其他参数与 get_current_tab_screenshot 相同，max_bytes 默认不限制
         
         Returns:
-            str: 截图的文件路径
+            dict: 截图的文件路径、像素大小、缩放比例和字节数
         """ 
-
-        screenshot=self.browser.latest_tab.get_screenshot(path=path,name=name)
-        return screenshot 
+        suffix = Path(name).suffix.lower().lstrip(".")
+        format = {"jpg": "jpeg", "jpeg": "jpeg", "webp": "webp"}.get(suffix, "png")
+        try:
+            shot = capture(self.tabs.get(tab_id), xpath=xpath, selector=selector, clip=clip, full_page=full_page,
+                           scale=scale, format=format, quality=quality, max_bytes=max_bytes)
+        except ValueError as e:
+            return str(e)
+        if shot is None:
+            return f"元素{xpath or selector}不存在"
+        file = Path(path) / name
+        file.parent.mkdir(parents=True, exist_ok=True)
+        file.write_bytes(shot.pop("data"))
+        return {"path": str(file.resolve()), **shot}
     
-    def get_current_tab_info(self) -> dict:
-        """获取当前标签页的信息,包括url, title,  id"""
-        tab =self.browser.latest_tab
+    def get_current_tab_info(self, tab_id: str = "") -> dict:
+        """获取当前标签页(或tab_id指定的标签页)的信息,包括url, title,  id"""
+        tab =self.tabs.get(tab_id)
         info = {
             "url": tab.url,
             "title": tab.title,          
@@ -410,9 +1017,9 @@ tab = browser.new_tab('{url}')
         }
         return info
     
-    def send_key(self, key: Literal["Enter, Backspace, HOME, END, PAGE_UP, PAGE_DOWN, DOWN, UP, LEFT, RIGHT, ESC, Ctrl+C, Ctrl+V, Ctrl+A, Delete"]) -> str:
-        """向当前标签页发送特殊按键"""
-        tab = self.browser.latest_tab
+    def send_key(self, key: Literal["Enter, Backspace, HOME, END, PAGE_UP, PAGE_DOWN, DOWN, UP, LEFT, RIGHT, ESC, Ctrl+C, Ctrl+V, Ctrl+A, Delete"], tab_id: str = "") -> str:
+        """向当前标签页(或tab_id指定的标签页)发送特殊按键"""
+        tab = self.tabs.get(tab_id)
         k={"Enter": Keys.ENTER,
            "Backspace": Keys.BACKSPACE,
            "HOME": Keys.HOME,
@@ -434,18 +1041,50 @@ tab = browser.new_tab('{url}')
         except Exception as e:
             return f"{tab.title} 网页发送 {key} 键失败"
     
-    def getSimplifiedDomTree(self) -> dict:
-        """获取当前标签页的简化版DOM树"""
-        from CodeBox import domTreeToJson
-        tab = self.browser.latest_tab
-        dom_tree = tab.run_js(domTreeToJson)
-        return dom_tree
+    def getSimplifiedDomTree(self, diff: bool = False, max_nodes: int = 5000, max_chars: int = 200000,
+                             time_budget_ms: int = 3000, max_depth: int = 0, root_selector: str = "",
+                             root_xpath: str = "", only_in_viewport: bool = False,
+                             with_handles: bool = True, tab_id: str = "") -> dict:
+        """获取当前标签页的简化版DOM树
+
+        Args:
+            diff (bool): 为True时只返回与该标签页上一次快照相比的结构差异，
+                页面没有变化时返回 mode=unchanged，页面导航后自动返回完整的树(mode=full)
+            max_nodes (int): 最多输出的节点数，0表示不限制
+            max_chars (int): 输出JSON的近似字符数上限，0表示不限制
+            time_budget_ms (int): 页面内遍历的耗时上限(毫秒)，0表示不限制
+            max_depth (int): 相对根节点的最大深度，0表示不限制
+            root_selector (str): 只获取该CSS选择器匹配的第一个元素的子树
+            root_xpath (str): 只获取该xpath匹配的第一个元素的子树，优先于root_selector
+            only_in_viewport (bool): 只获取与当前视口相交的元素
+            with_handles (bool): 节点键名使用稳定句柄(如 div@17)，句柄可直接传给
+                click_by_handle、input_by_handle、hover_by_handle、drag_by_handle，无需再写xpath
+            tab_id (str): 标签页id，默认为当前活动标签页
+
+        Note:
+            所有过滤都在页面内遍历时完成，被过滤的子树不会被访问。
+            超出预算时返回截断但结构完整的树，顶层附带 _truncated 字段说明截断原因
+        """
+        from CodeBox import domSnapshot
+        tab = self.tabs.get(tab_id)
+        options = {"max_nodes": max_nodes, "max_chars": max_chars, "time_budget_ms": time_budget_ms,
+                   "max_depth": max_depth, "root_selector": root_selector, "root_xpath": root_xpath,
+                   "only_in_viewport": only_in_viewport, "with_handles": with_handles}
+        scope = json.dumps(options, sort_keys=True)
+        options["doc_id"] = self.dom_snapshots.doc_id(tab.tab_id, scope) if diff else ""
+        result = self.dom_snapshots.update(tab.tab_id, tab.run_js(domSnapshot, options), scope)
+        if "_error" in result.get("tree", {}):
+            self.dom_snapshots.forget(tab.tab_id)
+            return f"根元素{root_xpath or root_selector}不存在"
+        if diff:
+            return result
+        return json.dumps(result["tree"], ensure_ascii=False, separators=(",", ":"))
  
     #region 拖动
 
-    def move_to(self,xpath:str) -> dict:
-        """鼠标移动悬停到指定xpath的元素上"""
-        tab = self.browser.latest_tab
+    def move_to(self,xpath:str, tab_id: str = "") -> dict:
+        """鼠标移动悬停到当前标签页(或tab_id指定的标签页)中指定xpath的元素上"""
+        tab = self.tabs.get(tab_id)
         locator = f"xpath:{xpath}"
         element = tab.ele(locator, timeout=3)
         if element:
@@ -454,7 +1093,7 @@ tab = browser.new_tab('{url}')
             return result
         else:
             return f"元素{locator}不存在，需要getSimplifiedDomTree先获取元素信息"
-    def drag(self,xpath:str, offset_x: int, offset_y: int, duration: int = 1000) -> dict:
+    def drag(self,xpath:str, offset_x: int, offset_y: int, duration: int = 1000, tab_id: str = "") -> dict:
     
         """
         将元素拖动到指定偏移位置
@@ -464,6 +1103,7 @@ tab = browser.new_tab('{url}')
             offset_x: x轴偏移量(像素)
             offset_y: y轴偏移量(像素)
             duration: 拖动持续时间(毫秒)，默认为1000
+            tab_id: 标签页id，默认为当前活动标签页
         
         Returns:
             dict: 包含偏移量和持续时间的字典，格式为{"offset_x": int, "offset_y": int, "duration": int}
@@ -472,7 +1112,7 @@ tab = browser.new_tab('{url}')
         Raises:
             无显式抛出异常，但内部可能因元素不存在而返回错误信息
         """
-        tab = self.browser.latest_tab
+        tab = self.tabs.get(tab_id)
         if e:=tab.ele(f'xpath:{xpath}', timeout=3):
             tab.actions.move_to(e).wait(0.5).hold().move(offset_x, offset_y).release()
             result = {"offset_x": offset_x, "offset_y": offset_y, "duration": duration}
@@ -480,39 +1120,160 @@ tab = browser.new_tab('{url}')
         else:
             return f"元素{xpath}不存在，需要getSimplifiedDomTree先获取元素信息"
 
+    #region 句柄操作
+
+    def _ele_by_handle(self, handle: str, tab_id: str = ""):
+        """根据getSimplifiedDomTree返回的句柄直接获取元素，不等待元素出现"""
+        handle = str(handle).rsplit("@", 1)[-1]
+        locator = f'css:[{HANDLE_ATTR}="{handle}"]'
+        return locator, self.tabs.get(tab_id).ele(locator, timeout=0)
+
+    def find_elements_by_text(self, starts_with: Any = None, contains_any: list[str] = None,
+                              contains_all: list[str] = None, regex: str = "", rules: list[dict] = None,
+                              tags: list[str] = None, visible_only: bool = True, innermost: bool = True,
+                              max_results: int = 50, root_xpath: str = "", tab_id: str = "") -> dict:
+        """
+        按文本条件查找元素，在页面内一次完成，返回匹配元素的句柄和文本，句柄可直接用于 click_by_handle 等工具。
+        比逐个读取元素文本快得多，适合查找选项、按钮、链接等。
+
+        Args:
+            starts_with: 文本以其中任意一个开头，字符串或列表，如 ["A", "B"]
+            contains_any (list[str]): 文本包含其中任意一个
+            contains_all (list[str]): 文本包含其中所有
+            regex (str): 文本匹配的正则表达式(JavaScript语法)
+            rules (list[dict]): 多条条件，满足任意一条即匹配，每条用上面的键，
+                如 [{"starts_with": "A", "contains_any": ["正确"]}, {"starts_with": "B", "contains_any": ["错误"]}]
+            tags (list[str]): 只检查这些标签，如 ["button", "a", "li"]
+            visible_only (bool): 只返回可见元素
+            innermost (bool): 只返回最内层的匹配元素，不返回包含它的父元素
+            max_results (int): 最多返回的元素数
+            root_xpath (str): 只在xpath指定的元素内查找
+            tab_id (str): 标签页id，默认为当前活动标签页
+
+        Returns:
+            dict: matches 为 [{"handle", "text"}]，scanned 检查的元素数，truncated 是否超出 max_results
+        """
+        rule = {k: v for k, v in {"starts_with": starts_with, "contains_any": contains_any,
+                                  "contains_all": contains_all, "regex": regex}.items() if v}
+        if not rule and not rules:
+            return "需要至少一个文本条件"
+        result = find_by_text(self.tabs.get(tab_id), rules=rules, tags=tags, visible_only=visible_only,
+                              innermost=innermost, max_results=max_results, xpath=root_xpath, **rule)
+        if result.get("_error") == "root_not_found":
+            return f"根元素{root_xpath}不存在"
+        return result
+
+    def click_by_handle(self, handle: str, tab_id: str = "") -> dict:
+        """通过getSimplifiedDomTree返回的句柄(如 div@17 或 17)点击当前标签页(或tab_id指定的标签页)中的元素"""
+        locator, element = self._ele_by_handle(handle, tab_id)
+        if not element:
+            return f"句柄{handle}对应的元素不存在，需要getSimplifiedDomTree重新获取元素信息"
+        return {"locator": locator, "element": str(element), "click_result": element.click(),
+                "等价Python代码": f"tab.ele('{locator}', timeout=0).click()"}
+
+    def input_by_handle(self, handle: str, input_value: str, clear_first: bool = True, tab_id: str = "") -> dict:
+        """通过getSimplifiedDomTree返回的句柄给当前标签页中的元素输入内容
+
+        Args:
+            handle (str): 元素句柄，如 input@23 或 23
+            input_value (str): 要输入的内容
+            clear_first (bool): 是否先清除已有内容，默认为True
+            tab_id (str): 标签页id，默认为当前活动标签页
+        """
+        locator, element = self._ele_by_handle(handle, tab_id)
+        if not element:
+            return f"句柄{handle}对应的元素不存在，需要getSimplifiedDomTree重新获取元素信息"
+        return {"locator": locator, "result": element.input(input_value, clear=clear_first),
+                "等价Python代码": f"tab.ele('{locator}', timeout=0).input({input_value}, clear={clear_first})"}
+
+    def hover_by_handle(self, handle: str, tab_id: str = "") -> dict:
+        """鼠标移动悬停到getSimplifiedDomTree返回的句柄对应的元素上(默认为当前标签页，或tab_id指定的标签页)"""
+        locator, element = self._ele_by_handle(handle, tab_id)
+        if not element:
+            return f"句柄{handle}对应的元素不存在，需要getSimplifiedDomTree重新获取元素信息"
+        element.hover()
+        return {"locator": locator, "element": str(element), "等价Python代码": f"tab.ele('{locator}', timeout=0).hover()"}
+
+    def drag_by_handle(self, handle: str, offset_x: int, offset_y: int, duration: int = 1000,
+                       tab_id: str = "") -> dict:
+        """
+        将getSimplifiedDomTree返回的句柄对应的元素拖动到指定偏移位置
+
+        Args:
+            handle: 元素句柄，如 div@17 或 17
+            offset_x: x轴偏移量(像素)
+            offset_y: y轴偏移量(像素)
+            duration: 拖动持续时间(毫秒)，默认为1000
+            tab_id: 标签页id，默认为当前活动标签页
+        """
+        locator, element = self._ele_by_handle(handle, tab_id)
+        if not element:
+            return f"句柄{handle}对应的元素不存在，需要getSimplifiedDomTree重新获取元素信息"
+        self.tabs.get(tab_id).actions.move_to(element).wait(0.5).hold().move(offset_x, offset_y).release()
+        return {"offset_x": offset_x, "offset_y": offset_y, "duration": duration}
+
 #region 初始化mcp
 mcp = FastMCP("DrissionPageMCP", log_level="ERROR",instructions=提示)
 b=DrissionPageMCP()
 
+def add_browser_tool(fn):
+    """注册同步的浏览器工具：在线程池中执行，按tab_id(默认为活动标签页)串行"""
+    mcp.add_tool(b.pool.wrap(fn, key=lambda **kwargs: kwargs.get("tab_id") or b.tabs.active_id or "browser"))
+
 mcp.add_tool(b.get_version)
 mcp.add_tool(b.get_DrissionPage_code_guide)
 mcp.add_tool(b.connect_or_open_browser)
 mcp.add_tool(b.new_tab)
-mcp.add_tool(b.wait)
+add_browser_tool(b.wait)
+add_browser_tool(b.wait_for)
 mcp.add_tool(b.get)
-mcp.add_tool(b.download_file)
-mcp.add_tool(b.upload_file)
-mcp.add_tool(b.send_enter)
-mcp.add_tool(b.getInputElementsInfo)
-mcp.add_tool(b.click_by_xpath)
-mcp.add_tool(b.click_by_containing_text)
-mcp.add_tool(b.input_by_xapth)
-mcp.add_tool(b.get_body_text)
-mcp.add_tool(b.run_js)
-mcp.add_tool(b.run_cdp)
-mcp.add_tool(b.listen_cdp_event)
+mcp.add_tool(b.fetch_urls)
+add_browser_tool(b.list_tabs)
+add_browser_tool(b.start_browser_pool)
+add_browser_tool(b.get_browser_pool_status)
+add_browser_tool(b.set_block_profile)
+mcp.add_tool(b.get_block_stats)
+add_browser_tool(b.switch_tab)
+add_browser_tool(b.close_tab)
+add_browser_tool(b.download_file)
+add_browser_tool(b.upload_file)
+add_browser_tool(b.send_enter)
+add_browser_tool(b.getInputElementsInfo)
+add_browser_tool(b.click_by_xpath)
+add_browser_tool(b.click_by_containing_text)
+add_browser_tool(b.input_by_xapth)
+add_browser_tool(b.get_body_text)
+add_browser_tool(b.run_js)
+add_browser_tool(b.run_cdp)
+add_browser_tool(b.listen_cdp_event)
 mcp.add_tool(b.get_cdp_event_data)
-mcp.add_tool(b.get_url_with_response_listener)
-mcp.add_tool(b.response_listener_stop)
+add_browser_tool(b.get_url_with_response_listener)
+add_browser_tool(b.start_response_listener)
+mcp.add_tool(b.list_response_listeners)
+add_browser_tool(b.response_listener_stop)
+mcp.add_tool(b.start_traffic_export)
+add_browser_tool(b.stop_traffic_export)
 mcp.add_tool(b.get_response_listener_data)
-mcp.add_tool(b.get_current_tab_screenshot)
-mcp.add_tool(b.get_current_tab_screenshot_as_file)
-mcp.add_tool(b.get_current_tab_info) 
-mcp.add_tool(b.send_key)
-mcp.add_tool(b.getSimplifiedDomTree) 
-
-mcp.add_tool(b.move_to)
-mcp.add_tool(b.drag)
+mcp.add_tool(b.get_response_body)
+add_browser_tool(b.get_current_tab_screenshot)
+mcp.add_tool(b.get_cached_screenshot)
+add_browser_tool(b.start_screencast)
+mcp.add_tool(b.get_screencast_frame)
+add_browser_tool(b.record_screencast)
+add_browser_tool(b.stop_screencast)
+add_browser_tool(b.get_current_tab_screenshot_as_file)
+add_browser_tool(b.get_current_tab_info)
+add_browser_tool(b.send_key)
+add_browser_tool(b.getSimplifiedDomTree)
+
+add_browser_tool(b.move_to)
+add_browser_tool(b.drag)
+add_browser_tool(b.find_elements_by_text)
+add_browser_tool(b.click_by_handle)
+add_browser_tool(b.input_by_handle)
+add_browser_tool(b.hover_by_handle)
+add_browser_tool(b.drag_by_handle)
+
 
 #region 保存数据到sqlite
 from ToolBox import save_dict_to_sqlite
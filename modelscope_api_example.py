@@ -13,6 +13,8 @@ import os
 # 添加当前目录到 Python 路径
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+from LLMClients import complete
+
 def install_openai_package():
     """安装openai包（如果尚未安装）"""
     try:
@@ -37,14 +39,6 @@ def get_model_answer_with_modelscope(question_text):
         return "无法安装openai包，请手动安装：pip install openai"
     
     try:
-        from openai import OpenAI
-        
-        # 配置魔搭ModelScope API
-        client = OpenAI(
-            base_url='https://api-inference.modelscope.cn/v1',
-            api_key='ms-0f3fca09-39fd-4b3b-84b8-74243108fe9e'  # 这里使用您提供的API密钥
-        )
-        
         # 构造消息
         messages = [
             {
@@ -60,14 +54,16 @@ def get_model_answer_with_modelscope(question_text):
         print("正在调用魔搭ModelScope API...")
         
         # 调用API
-        response = client.chat.completions.create(
+        # 魔搭ModelScope的客户端在多次调用之间复用
+        response = complete(
+            'modelscope',
             model='Qwen/Qwen3-Coder-30B-A3B-Instruct',  # 使用您指定的模型
             messages=messages,
             stream=False  # 不使用流式输出以简化处理
         )
         
         # 提取回答
-        answer = response.choices[0].message.content
+        answer = response['content']
         return answer
         
     except Exception as e: